@@ -41,9 +41,12 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "web",
 ]
 
 MIDDLEWARE = [
+    "web.profiler.ProfilerMiddleware",  # primo: campiona anche i middleware sotto
+    "web.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -51,6 +54,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "web.hitlog.HitLogMiddleware",
+    "web.shedding.LoadShedMiddleware",
 ]
 
 ROOT_URLCONF = "sitoweb.urls"
@@ -65,6 +70,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "web.follows.followed_events",
             ],
         },
     },
@@ -121,8 +127,225 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "web" / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
+# bundle JS generati da `manage.py build_assets` (se manca il manifest si usano i file sorgente)
+ASSETS_USE_BUNDLES = True
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 # --- TEMPLATES ---
 TEMPLATES[0]["DIRS"] = [BASE_DIR / "web" / "templates"]
+# loader espliciti: in produzione i template compilati restano in memoria
+# (cached loader), in DEBUG vengono riletti a ogni richiesta
+TEMPLATES[0]["APP_DIRS"] = False
+_TEMPLATE_LOADERS = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+TEMPLATES[0]["OPTIONS"]["loaders"] = (
+    _TEMPLATE_LOADERS if DEBUG
+    else [("django.template.loaders.cached.Loader", _TEMPLATE_LOADERS)]
+)
+
+# --- CACHE ---
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tixy-default",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+# sessioni: cache condivisa dai worker del nodo (file) o Redis se configurato
+if os.environ.get("REDIS_URL"):
+    CACHES["sessions"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ["REDIS_URL"],
+    }
+else:
+    CACHES["sessions"] = {
+        # FileBasedCache con add atomico e cull periodico (vedi web.session_backend)
+        "BACKEND": "web.session_backend.FileSessionCache",
+        "LOCATION": os.environ.get("SESSION_CACHE_DIR", str(BASE_DIR / "var" / "cache" / "sessions")),
+        "OPTIONS": {"MAX_ENTRIES": 100000, "CULL_INTERVAL": 300},
+    }
+# cache delle GET di catalogo verso il backend (web.services.tixy_api):
+# entro API_CACHE_TTL la copia è servita così com'è, poi rivalidata con
+# ETag/Last-Modified; una copia rivalidabile resta in cache API_CACHE_STALE_TTL
+API_CACHE_ALIAS = "default"
+API_CACHE_TTL = 30
+API_CACHE_STALE_TTL = 600
+# decoder delle risposte JSON: "auto" (orjson se installato), "orjson", "json" o dotted path
+API_JSON_DECODER = "auto"
+# retry del client API: GET sempre, scritture solo con Idempotency-Key;
+# errori di connessione e 502/503/504, backoff esponenziale con jitter.
+# Budget per processo: ogni richiesta accumula RATIO retry (+ MIN_PER_SEC al secondo)
+API_RETRY_MAX = 2
+API_RETRY_BASE_DELAY = 0.1
+API_RETRY_MAX_DELAY = 1.0
+API_RETRY_BUDGET_RATIO = 0.1
+API_RETRY_BUDGET_MIN_PER_SEC = 1.0
+API_RETRY_BUDGET_MAX = 20
+# hedging delle letture critiche (get_performance / get_performance_listings):
+# seconda richiesta se la prima supera il p90 dell'endpoint, max RATIO del traffico
+API_HEDGE_ENABLED = True
+API_HEDGE_RATIO = 0.05
+API_HEDGE_BURST = 5
+API_HEDGE_WINDOW = 200
+API_HEDGE_MIN_SAMPLES = 20
+API_HEDGE_MIN_DELAY = 0.02
+API_HEDGE_WORKERS = 16
+# fixture registrate del backend per i test in replay (web.services.api_fixtures)
+API_FIXTURES_DIR = BASE_DIR / "web" / "api_fixtures"
+# hit log delle pagine pubbliche (web.hitlog) e cache warmer (manage.py warm_cache)
+HITLOG_PATH = BASE_DIR / "var" / "hitlog.jsonl"
+HITLOG_FLUSH_SECONDS = 60
+HITLOG_WINDOW_HOURS = 24
+HITLOG_MAX_BYTES = 5_000_000
+WARMUP_MAX_PAGES = 30
+WARMUP_CONCURRENCY = 4
+WARMUP_TIMEOUT = 30
+# host delle richieste di warm-up in-process (vuoto = primo di ALLOWED_HOSTS)
+WARMUP_HOST = os.environ.get("WARMUP_HOST", "")
+# thread per processo del server applicativo (es. gunicorn --threads): base dei
+# limiti per ciò che tiene occupato un thread (load shedding, long-poll live)
+WORKER_THREADS = int(os.environ.get("WORKER_THREADS", 32))
+# avvio del worker (web.startup, da wsgi.py / asgi.py): passi views, templates,
+# backend, catalog, warm_pages; /healthz/ready = 503 finché non è finito
+STARTUP_ENABLED = True
+STARTUP_BLOCKING = False
+STARTUP_SKIP_STEPS = ()
+STARTUP_WARM_PAGES = True
+STARTUP_BACKEND_CONNECTIONS = 4
+STARTUP_BACKEND_TIMEOUT = 3
+API_POOL_MAXSIZE = 20
+# fragment cache delle card catalogo ({% cardcache %})
+FRAGMENT_CACHE_ALIAS = "default"
+FRAGMENT_CACHE_TTL = 600
+# eventi seguiti dall'utente (web.follows), in sessione
+FOLLOW_SET_TTL = 300
+# preview prezzi del backend (listings/<id>/preview/) per (listing, qty, fee)
+PRICING_CACHE_ALIAS = "default"
+PRICING_PREVIEW_TTL = 30
+# ordine nel flusso pagamento / conferma / riepilogo: in sessione solo id e
+# importi, il summary del backend in cache per ORDER_SNAPSHOT_TTL secondi
+ORDER_SNAPSHOT_CACHE_ALIAS = "default"
+ORDER_SNAPSHOT_TTL = 120
+# feed live biglietti per performance (web.live_listings): un poller per
+# performance e per processo, condiviso da tutti i client. Default long-poll
+# breve: chi aspetta tiene un thread, quindi al massimo LIVE_BLOCKING_SHARE dei
+# WORKER_THREADS; oltre si risponde subito e il client riprova dopo
+# LIVE_POLL_INTERVAL. SSE solo se servito via ASGI e LIVE_SSE_ENABLED
+LIVE_POLL_INTERVAL = 3
+LIVE_IDLE_SECONDS = 30
+LIVE_HISTORY_SIZE = 100  # stati recenti da cui un cursore può riprendere
+LIVE_BLOCKING_SHARE = 0.25
+LIVE_LONGPOLL_TIMEOUT = 10
+LIVE_MAX_CLIENTS = 200  # client live per processo (stream SSE compresi)
+LIVE_SSE_ENABLED = os.environ.get("LIVE_SSE_ENABLED", "0") == "1"
+LIVE_SSE_MAX_SECONDS = 300
+LIVE_KEEPALIVE_SECONDS = 15
+# snapshot in-process del catalogo (web.services.catalog): alimenta gli indici
+# locali (autocomplete, calendario, ...); refresh in background ogni N secondi
+CATALOG_REFRESH_INTERVAL = 300
+CATALOG_PAGE_SIZE = 200
+CATALOG_MAX_PAGES = 50
+CATALOG_BACKGROUND_REFRESH = True
+# snapshot persistito su disco e mappato dai worker (web.services.catalog_store)
+CATALOG_STORE_ENABLED = True
+CATALOG_STORE_DIR = BASE_DIR / "var" / "catalog"
+# cache pagine risultato di /search (web.services.search_cache), chiave = query canonica
+SEARCH_CACHE_ALIAS = "default"
+SEARCH_CACHE_TTL = 60
+# prime pagine delle query più cercate: TTL lungo + pre-warm a ogni refresh catalogo
+SEARCH_POPULAR_TTL = 300
+SEARCH_POPULAR_SIZE = 20
+SEARCH_POPULAR_MIN_HITS = 3
+SEARCH_TRACK_MAX = 1000
+# "Città" e "citta" sono la stessa ricerca (il backend riceve la forma senza accenti)
+SEARCH_FOLD_ACCENTS = True
+# job in background (web.jobs): attivazione PRO, upload rivendita, ticket supporto.
+# JOBS_IN_PROCESS=False -> nessun worker nei processi web, solo `manage.py run_jobs`
+JOBS_IN_PROCESS = True
+JOBS_WORKERS = 2
+JOBS_POLL_INTERVAL = 1.0
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BASE_SECONDS = 2
+JOBS_STALE_SECONDS = 600
+JOBS_FILES_DIR = BASE_DIR / "var" / "jobs"
+# token API dei job fuori dal DB: nella cache delle sessioni (condivisa con `run_jobs`)
+JOBS_TOKEN_CACHE_ALIAS = "sessions"
+JOBS_TOKEN_TTL = 3600
+# bus di invalidazione delle cache fra worker (web.invalidation):
+# "unix" (stesso nodo), "db" (più nodi, tabella web_invalidation), "file", "local"
+INVALIDATION_TRANSPORT = os.environ.get("INVALIDATION_TRANSPORT", "unix")
+INVALIDATION_SOCKET_DIR = BASE_DIR / "var" / "invalidation"
+INVALIDATION_FILE = BASE_DIR / "var" / "invalidation.jsonl"
+INVALIDATION_POLL_SECONDS = 1.0
+INVALIDATION_HORIZON_SECONDS = 3600
+# load shedding per processo (web.shedding): classi critical / default / browse,
+# limiti per route, risposte degradate (copia stale o 503 + Retry-After)
+SHED_ENABLED = True
+SHED_MAX_CONCURRENCY = WORKER_THREADS
+SHED_CLASSES = {
+    "critical": {"share": 1.0, "max_wait": 10.0, "max_queue": 64},
+    "default": {"share": 0.8, "max_wait": 2.0, "max_queue": 16},
+    "browse": {"share": 0.5, "max_wait": 0.5, "max_queue": 4},
+}
+SHED_ROUTE_LIMITS = {"events_index": 4, "event_dates": 4, "event_dates_from_perf": 4, "search": 6}
+SHED_TARGET_WAIT = 0.05
+SHED_MIN_FACTOR = 0.2
+SHED_RETRY_AFTER = 5
+SHED_STALE_TTL = 600
+SHED_STALE_REFRESH = 60
+# rate limit (web.ratelimit): "N/periodo" per IP e per sessione/utente.
+# Bucket nella cache "sessions": condivisi dai worker del nodo (cache su file),
+# fra tutti i nodi con REDIS_URL. Una cache in memoria ("default") darebbe a
+# ogni worker il budget intero.
+RATE_LIMIT_ENABLED = True
+RATE_LIMIT_CACHE_ALIAS = "sessions"
+RATE_LIMIT_PROXY_COUNT = int(os.environ.get("RATE_LIMIT_PROXY_COUNT", 0))  # proxy fidati (X-Forwarded-For)
+RATE_LIMIT_LEASE = 0.1  # scorta massima per worker (quota della capacità), parte da 1 token
+RATE_LIMITS = {
+    "search": {"ip": "120/m", "session": "40/m"},
+    "event_listings": {"ip": "240/m", "session": "90/m"},
+    "events_index": {"ip": "120/m", "session": "40/m"},
+    "otp_resend": {"ip": "10/h", "session": "3/10m"},
+    "password_forgot": {"ip": "10/h", "session": "3/10m"},
+}
+# profiler a campionamento (web.profiler, manage.py profile_report): opt-in.
+# Una richiesta è profilata con l'header PROFILER_HEADER = PROFILER_HEADER_TOKEN,
+# se la view è in PROFILER_URL_NAMES o con probabilità PROFILER_SAMPLE_RATE
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "0") == "1"
+PROFILER_HEADER = "X-Tixy-Profile"
+PROFILER_HEADER_TOKEN = os.environ.get("PROFILER_HEADER_TOKEN", "")  # vuoto = header ignorato
+PROFILER_SAMPLE_RATE = float(os.environ.get("PROFILER_SAMPLE_RATE", 0.0))
+PROFILER_URL_NAMES = ()
+PROFILER_INTERVAL_MS = 5
+PROFILER_PATH = BASE_DIR / "var" / "profiles.jsonl"
+PROFILER_FLUSH_SECONDS = 60
+PROFILER_MAX_BYTES = 50_000_000
+# metriche Prometheus (web.metrics, /metrics): un file per worker in METRICS_DIR,
+# sommati a ogni scrape. La directory deve essere condivisa dai worker del nodo
+METRICS_ENABLED = True
+METRICS_DIR = os.environ.get("METRICS_DIR", str(BASE_DIR / "var" / "metrics"))
+METRICS_FLUSH_SECONDS = 5
+METRICS_STALE_SECONDS = 600  # snapshot non aggiornato da più tempo = processo terminato
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")  # vuoto = /metrics solo da METRICS_ALLOWED_IPS
+METRICS_ALLOWED_IPS = ("127.0.0.1", "::1")  # IP del client come per il rate limit (RATE_LIMIT_PROXY_COUNT)
+# moduli view importati all'avvio (web.lazy_views); gli altri (account, PRO,
+# rivendita, supporto, recensioni) si caricano alla prima richiesta
+LAZY_VIEWS_PRELOAD = ("web.views",)
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# --- SESSIONI ---
+# SESSION_BACKEND:
+#   "cache"  -> web.session_backend: cache + scrittura differita su SQLite (default)
+#   "cookie" -> cookie firmato e compresso, nessun accesso a DB/cache.
+#               NB: il contenuto è firmato ma NON cifrato (leggibile dal client).
+#   "db"     -> backend Django standard (una riga SQLite per richiesta)
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "cache")
+SESSION_ENGINE = {
+    "cache": "web.session_backend",
+    "cookie": "django.contrib.sessions.backends.signed_cookies",
+    "db": "django.contrib.sessions.backends.db",
+}[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = "sessions"
+SESSION_WRITE_BEHIND_DELAY = 2.0  # secondi fra due flush verso il DB
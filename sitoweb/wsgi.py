@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "sitoweb.settings")
 
 application = get_wsgi_application()
+
+# warm-up del worker (views, template, connessioni backend, catalogo, pagine
+# calde) in background; /healthz/ready risponde 200 solo a warm-up finito
+from web import startup  # noqa: E402
+
+startup.begin(application)
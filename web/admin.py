@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "attempts", "run_after", "created_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("created_at", "updated_at")
+    exclude = ("payload",)  # contiene il token API dell'utente
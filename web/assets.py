@@ -0,0 +1,174 @@
+# web/assets.py
+# -----------------------------------------------------------------------------
+# Bundle JS/CSS del frontend.
+# - BUNDLES: "core" (sempre), chunk per pagina dichiarati dai template, "app"
+#   (main.js, sempre per ultimo perché inizializza i plugin caricati prima).
+# - build_bundles(): concatena + minifica e scrive file con hash + manifest.json
+#   (usato da `manage.py build_assets`).
+# - bundle_urls(): URL da includere nel template; se il manifest non esiste
+#   ripiega sui singoli file sorgente (dev / build non ancora eseguita).
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+
+DIST_SUBDIR = "assets/dist"
+MANIFEST_NAME = "manifest.json"
+
+# Ordine dei file = ordine di esecuzione (gli script sono tutti `defer`).
+BUNDLES: dict[str, list[str]] = {
+    "core": [
+        "assets/js/jquery-3.7.1.min.js",
+        "assets/js/bootstrap.bundle.min.js",
+    ],
+    # owl carousel: home (hero + slider eventi)
+    "carousel": [
+        "assets/js/owl.carousel.min.js",
+    ],
+    # animazioni wow + contatori: vantaggi, funziona
+    "effects": [
+        "assets/js/jquery.easing.min.js",
+        "assets/js/jquery.appear.min.js",
+        "assets/js/counter-up.js",
+        "assets/js/wow.min.js",
+    ],
+    # gallerie / filtri (oggi nessun template li usa)
+    "gallery": [
+        "assets/js/imagesloaded.pkgd.min.js",
+        "assets/js/isotope.pkgd.min.js",
+        "assets/js/jquery.magnific-popup.min.js",
+    ],
+    "app": [
+        "assets/js/main.js",
+    ],
+}
+
+# Bundle sempre presenti: core in testa, app in coda.
+HEAD_BUNDLES = ("core",)
+TAIL_BUNDLES = ("app",)
+
+CRITICAL_CSS = "assets/css/critical.css"
+
+
+def _static_root() -> Path:
+    """Directory sorgente degli statici (la prima di STATICFILES_DIRS)."""
+    return Path(settings.STATICFILES_DIRS[0])
+
+
+def _dist_dir() -> Path:
+    return _static_root() / DIST_SUBDIR
+
+
+def minify_js(source: str) -> str:
+    """
+    Minificazione conservativa: rimuove righe vuote, commenti su riga intera
+    e spazi a inizio/fine riga. Non tocca il contenuto delle istruzioni, quindi
+    è sicura anche senza un parser JS (i file *.min.js passano invariati).
+    """
+    out = []
+    in_block = False
+    for line in source.splitlines():
+        s = line.strip()
+        if in_block:
+            if "*/" in s:
+                in_block = False
+            continue
+        if not s or s.startswith("//"):
+            continue
+        if s.startswith("/*") and not s.startswith("/*!"):
+            if "*/" not in s:
+                in_block = True
+            continue
+        out.append(s)
+    return "\n".join(out)
+
+
+def build_bundles(*, minify: bool = True) -> dict[str, str]:
+    """
+    Genera i bundle in <static>/assets/dist/<nome>.<hash>.js e il manifest.
+    Ritorna il manifest {nome: path statico}.
+    """
+    src_root = _static_root()
+    dist = _dist_dir()
+    dist.mkdir(parents=True, exist_ok=True)
+
+    # rimuove i bundle della build precedente (il manifest li rimpiazza tutti)
+    for old in dist.glob("*.js"):
+        old.unlink()
+
+    manifest: dict[str, str] = {}
+    for name, files in BUNDLES.items():
+        parts = []
+        for rel in files:
+            code = (src_root / rel).read_text(encoding="utf-8")
+            if minify and not rel.endswith(".min.js"):
+                code = minify_js(code)
+            parts.append(f"/* {rel} */\n{code}")
+        # ";" di sicurezza tra file che non terminano con punto e virgola
+        body = "\n;\n".join(parts) + "\n"
+        digest = hashlib.md5(body.encode("utf-8")).hexdigest()[:10]
+        filename = f"{name}.{digest}.js"
+        (dist / filename).write_text(body, encoding="utf-8")
+        manifest[name] = f"{DIST_SUBDIR}/{filename}"
+
+    (dist / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    load_manifest.cache_clear()
+    return manifest
+
+
+@lru_cache(maxsize=1)
+def load_manifest() -> dict[str, str]:
+    """Manifest della build (vuoto se `build_assets` non è stato eseguito)."""
+    if not getattr(settings, "ASSETS_USE_BUNDLES", True):
+        return {}
+    try:
+        return json.loads((_dist_dir() / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def resolve_bundle_names(chunks) -> list[str]:
+    """core + chunk richiesti (senza duplicati, ordine stabile) + app."""
+    names = list(HEAD_BUNDLES)
+    for c in chunks:
+        c = (c or "").strip()
+        if not c:
+            continue
+        if c not in BUNDLES:
+            raise ValueError(f"Bundle JS sconosciuto: {c!r}")
+        if c not in names and c not in TAIL_BUNDLES:
+            names.append(c)
+    names.extend(TAIL_BUNDLES)
+    return names
+
+
+def bundle_urls(chunks) -> list[str]:
+    """Path statici (relativi a STATIC_URL) da includere per i chunk richiesti."""
+    manifest = load_manifest()
+    paths: list[str] = []
+    for name in resolve_bundle_names(chunks):
+        if name in manifest:
+            paths.append(manifest[name])
+        else:
+            paths.extend(BUNDLES[name])
+    return paths
+
+
+@lru_cache(maxsize=1)
+def critical_css() -> str:
+    """CSS above-the-fold da inlineare nel <head> (preloader, variabili tema)."""
+    try:
+        css = (_static_root() / CRITICAL_CSS).read_text(encoding="utf-8")
+    except OSError:
+        return ""
+    # compatta: niente commenti / righe vuote / indentazione
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    return " ".join(s.strip() for s in css.splitlines() if s.strip())
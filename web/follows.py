@@ -0,0 +1,68 @@
+# web/follows.py
+# -----------------------------------------------------------------------------
+# Eventi seguiti dall'utente (alert gratuiti), letti in blocco una volta e
+# tenuti in sessione per FOLLOW_SET_TTL secondi.
+# - is_following(): risposta O(1) per qualunque card / pagina evento; gli
+#   alert in pausa non contano come seguiti.
+# - invalidate(): da chiamare dopo ogni modifica (attiva / pausa / riprendi /
+#   elimina alert) così la pagina successiva rilegge lo stato dal backend.
+# - Nei template: `{% if p.evento in followed_events %}` (context processor,
+#   la lettura parte solo se il template usa davvero la variabile).
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .services import tixy_api
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY = "follow_set"
+TOKEN_SESSION_KEY = "api_access"  # = views.SESSION_TOKEN_KEY
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "FOLLOW_SET_TTL", 300))
+
+
+def follow_set(request) -> dict[int, bool]:
+    """{event_id: active} dell'utente loggato ({} se anonimo o backend KO)."""
+    token = request.session.get(TOKEN_SESSION_KEY)
+    if not token:
+        return {}
+    entry = request.session.get(SESSION_KEY)
+    if entry and time.time() - entry["at"] < _ttl():
+        follows = {int(k): v for k, v in entry["events"].items()}
+    else:
+        try:
+            follows = tixy_api.api_event_follow_set(token)
+        except Exception:
+            logger.warning("Lettura eventi seguiti fallita", exc_info=True)
+            return {}
+        request.session[SESSION_KEY] = {"at": time.time(), "events": {str(k): v for k, v in follows.items()}}
+    # lo stato follow entra nell'ETag delle pagine che lo mostrano
+    raw = ",".join(f"{k}:{int(v)}" for k, v in sorted(follows.items()))
+    tixy_api.record_version("follows:" + hashlib.blake2b(raw.encode(), digest_size=8).hexdigest())
+    return follows
+
+
+def is_following(request, event_id) -> bool:
+    try:
+        return bool(follow_set(request).get(int(event_id)))
+    except (TypeError, ValueError):
+        return False
+
+
+def invalidate(request) -> None:
+    request.session.pop(SESSION_KEY, None)
+
+
+def followed_events(request) -> dict:
+    """Context processor: `followed_events` = insieme lazy degli event_id seguiti (alert attivi)."""
+    return {"followed_events": SimpleLazyObject(lambda: frozenset(k for k, v in follow_set(request).items() if v))}
@@ -0,0 +1,62 @@
+# web/fragments.py
+# -----------------------------------------------------------------------------
+# Fragment cache per le card di catalogo (listing / performance).
+# - La chiave è <tipo>:<id>:<versione>[:vary]; la versione è un hash di tutta
+#   la riga, dati annidati compresi (venditore, badge, rating): `updated_at`
+#   da solo non basta, perché cambia solo con la riga e non con i dati uniti.
+#   Una card cambia chiave appena cambia un qualunque campo che la compone.
+# - Le parti per-utente (es. stato follow) restano fuori dal blocco cachato.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+
+def _cache():
+    return caches[getattr(settings, "FRAGMENT_CACHE_ALIAS", "default")]
+
+
+def fragment_ttl() -> int:
+    return int(getattr(settings, "FRAGMENT_CACHE_TTL", 600))
+
+
+def row_id(obj) -> str:
+    if not isinstance(obj, dict):
+        return str(obj or "")
+    return str(obj.get("id") or obj.get("perf_id") or obj.get("pk") or "")
+
+
+def row_version(obj) -> str:
+    """Versione di una riga API (o di un dict già normalizzato per il template)."""
+    if not isinstance(obj, dict):
+        return ""
+    raw = json.dumps(obj, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def card_key(kind: str, obj, *vary) -> str:
+    parts = [kind, row_id(obj), row_version(obj)]
+    if vary:
+        extra = "|".join(str(v) for v in vary)
+        parts.append(hashlib.blake2b(extra.encode("utf-8"), digest_size=6).hexdigest())
+    return "frag:" + ":".join(parts)
+
+
+def get_or_render(key: str, render) -> str:
+    """Ritorna il frammento dalla cache o lo renderizza e lo salva."""
+    cache = _cache()
+    html = cache.get(key)
+    if html is None:
+        metrics.cache_access("fragment", "miss")
+        html = render()
+        cache.set(key, html, fragment_ttl())
+    else:
+        metrics.cache_access("fragment", "hit")
+    return html
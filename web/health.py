@@ -0,0 +1,49 @@
+# web/health.py
+# -----------------------------------------------------------------------------
+# Probe per orchestratore / bilanciatore.
+# - /healthz/live:  il processo risponde (nessun accesso a backend o DB).
+# - /healthz/ready: 200 solo a warm-up finito (web.startup), altrimenti 503;
+#   il body riporta i tempi dei passi di avvio e degli import dei moduli view
+#   (web.lazy_views).
+# - /healthz/load:  contatori del load shedding (web.shedding) e del rate
+#   limit (web.ratelimit) del processo.
+# - /metrics:       metriche Prometheus di tutti i worker del nodo (web.metrics);
+#   con METRICS_TOKEN impostato serve "Authorization: Bearer <token>",
+#   altrimenti solo dagli IP in METRICS_ALLOWED_IPS (default: loopback).
+# -----------------------------------------------------------------------------
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.cache import never_cache
+
+from . import lazy_views, metrics, ratelimit, shedding, startup
+
+
+@never_cache
+def live(request):
+    return JsonResponse({"status": "ok"})
+
+
+@never_cache
+def ready(request):
+    ok = startup.is_ready()
+    return JsonResponse({"status": "ready" if ok else "starting", **startup.state.report(),
+                         "view_modules": lazy_views.stats()},
+                        status=200 if ok else 503)
+
+
+@never_cache
+def load(request):
+    return JsonResponse({**shedding.stats(), "rate_limits": ratelimit.stats()})
+
+
+@never_cache
+def prometheus(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        if request.headers.get("Authorization") != f"Bearer {token}":
+            return HttpResponse(status=403)
+    elif ratelimit.client_ip(request) not in getattr(settings, "METRICS_ALLOWED_IPS", ("127.0.0.1", "::1")):
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.render(metrics.collect()),
+                        content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,113 @@
+# web/hitlog.py
+# -----------------------------------------------------------------------------
+# Log delle pagine pubbliche più richieste (sorgente del cache warmer).
+# - HitLogMiddleware conta in memoria le GET 200 delle view in
+#   HITLOG_URL_NAMES (solo path, niente query string) e ogni
+#   HITLOG_FLUSH_SECONDS aggiunge una riga JSON {"t": ..., "hits": {...}} a
+#   HITLOG_PATH (append: più worker scrivono sullo stesso file).
+# - Oltre HITLOG_MAX_BYTES il file viene ruotato in <file>.1.
+# - top_paths() somma le righe delle ultime HITLOG_WINDOW_HOURS ore.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+from .warmup import is_warmup
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL_NAMES = ("home", "events_index", "top", "rivendita", "event-listings", "event_dates")
+
+
+def log_path() -> Path:
+    return Path(getattr(settings, "HITLOG_PATH", Path(settings.BASE_DIR) / "var" / "hitlog.jsonl"))
+
+
+class _Hits:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Counter = Counter()
+        self.last_flush = time.time()
+
+    def add(self, path: str):
+        with self.lock:
+            self.counts[path] += 1
+            due = time.time() - self.last_flush >= float(getattr(settings, "HITLOG_FLUSH_SECONDS", 60))
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.last_flush = time.time()
+        if not counts:
+            return
+        line = json.dumps({"t": int(time.time()), "hits": dict(counts)}, separators=(",", ":")) + "\n"
+        path = log_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists() and path.stat().st_size > int(getattr(settings, "HITLOG_MAX_BYTES", 5_000_000)):
+                os.replace(path, path.with_name(path.name + ".1"))
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write(line)
+        except OSError:
+            logger.warning("Hit log non scritto (%s)", path, exc_info=True)
+
+
+_hits = _Hits()
+atexit.register(_hits.flush)
+
+
+class HitLogMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.url_names = frozenset(getattr(settings, "HITLOG_URL_NAMES", DEFAULT_URL_NAMES))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        if (
+            request.method == "GET"
+            and response.status_code == 200
+            and match is not None
+            and match.url_name in self.url_names
+            and not is_warmup(request)
+        ):
+            _hits.add(request.path)
+        return response
+
+
+def _read_lines(path: Path, since: float, totals: Counter):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get("t", 0) >= since:
+                    totals.update(row.get("hits") or {})
+    except FileNotFoundError:
+        pass
+
+
+def top_paths(limit: int = 50, window_hours: float | None = None) -> list[tuple[str, int]]:
+    """[(path, hits)] più richiesti nella finestra (file corrente + rotazione)."""
+    if window_hours is None:
+        window_hours = float(getattr(settings, "HITLOG_WINDOW_HOURS", 24))
+    since = time.time() - window_hours * 3600
+    totals: Counter = Counter()
+    path = log_path()
+    for p in (path.with_name(path.name + ".1"), path):
+        _read_lines(p, since, totals)
+    return totals.most_common(limit)
@@ -0,0 +1,75 @@
+# web/http_cache.py
+# -----------------------------------------------------------------------------
+# GET condizionali per le pagine pubbliche.
+# L'ETag di una pagina è calcolato dalle versioni delle risposte API che ha
+# usato (tixy_api.collect_versions), dall'URL completo e dallo stato utente
+# (anonimo / hash del token). Se coincide con If-None-Match si risponde 304:
+# browser e reverse proxy non riscaricano il body.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+from functools import wraps
+
+from django.contrib import messages
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+from .services import tixy_api
+
+SESSION_TOKEN_KEY = "api_access"
+
+
+def _user_state(request) -> str:
+    token = request.session.get(SESSION_TOKEN_KEY) if hasattr(request, "session") else None
+    if not token:
+        return "anon"
+    return hashlib.blake2b(str(token).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def compute_etag(view_name: str, request, versions) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in (view_name, request.get_full_path(), _user_state(request), *versions):
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return f'W/"{h.hexdigest()}"'
+
+
+def snapshot_etag(view):
+    """
+    Decorator per view GET pubbliche: ETag dalle versioni dei dati renderizzati
+    + 304 se il client ha già quella versione.
+    Non applica l'ETag se la pagina ha mostrato messaggi flash (contenuto una tantum).
+    """
+    @wraps(view)
+    def _wrapped(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+
+        with tixy_api.collect_versions() as versions:
+            response = view(request, *args, **kwargs)
+
+        if response.status_code != 200 or response.streaming:
+            return response
+        if getattr(messages.get_messages(request), "used", False):
+            return response
+
+        etag = compute_etag(view.__name__, request, versions)
+        token_user = _user_state(request) != "anon"
+        patch_cache_control(response, no_cache=True, **({"private": True} if token_user else {}))
+
+        client_etags = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in client_etags or etag.removeprefix("W/") in client_etags:
+            not_modified = HttpResponseNotModified()
+            not_modified["ETag"] = etag
+            for header in ("Cache-Control", "Vary"):
+                if header in response:
+                    not_modified[header] = response[header]
+            return not_modified
+
+        response["ETag"] = etag
+        return response
+
+    return _wrapped
@@ -0,0 +1,299 @@
+# web/invalidation.py
+# -----------------------------------------------------------------------------
+# Bus di invalidazione fra worker (e nodi) per le cache dei dati del backend.
+# - publish("listing:12", "perf:34"): dopo una modifica (TOP, nuovo annuncio,
+#   follow) i tag vengono applicati subito nel processo corrente e spediti
+#   agli altri con il trasporto INVALIDATION_TRANSPORT:
+#     "unix"  -> socket datagram in INVALIDATION_SOCKET_DIR, uno per processo
+#                (tutti i worker dello stesso nodo)
+#     "db"    -> tabella web.Invalidation letta ogni INVALIDATION_POLL_SECONDS
+#                (più nodi sullo stesso database)
+#     "file"  -> file JSON lines condiviso, letto in polling (test / sviluppo)
+#     "local" -> solo il processo corrente
+#   oppure il dotted path di una classe con start(deliver) e send(message).
+# - Ogni processo ricorda quando ha ricevuto ciascun tag: stale(tags, fetched)
+#   dice se una copia in cache (salvata a `fetched`) è precedente a
+#   un'invalidazione di uno dei suoi tag, e allora va riletta dal backend.
+# - on_invalidate(): per le cache che devono reagire subito (feed live, ...).
+# Tag in uso: listing:<id>, perf:<id>, event:<id>, "listings" (elenchi annunci).
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def listing(listing_id) -> str:
+    return f"listing:{int(listing_id)}"
+
+
+def perf(perf_id) -> str:
+    return f"perf:{int(perf_id)}"
+
+
+def event(event_id) -> str:
+    return f"event:{int(event_id)}"
+
+
+def _horizon() -> float:
+    """Per quanto ricordare un tag invalidato (>= TTL più lungo delle cache)."""
+    return float(getattr(settings, "INVALIDATION_HORIZON_SECONDS", 3600))
+
+
+def _poll_interval() -> float:
+    return float(getattr(settings, "INVALIDATION_POLL_SECONDS", 1.0))
+
+
+def _origin() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ---------------------------
+# Trasporti
+# ---------------------------
+
+class LocalTransport:
+    """Nessun altro processo: basta l'applicazione locale fatta da publish()."""
+
+    def start(self, deliver):
+        pass
+
+    def send(self, message: dict):
+        pass
+
+
+class UnixSocketTransport:
+    """Un socket datagram per processo; send() scrive su tutti quelli della directory."""
+
+    def __init__(self):
+        self.dir = Path(getattr(settings, "INVALIDATION_SOCKET_DIR", Path(settings.BASE_DIR) / "var" / "invalidation"))
+        self.sock: socket.socket | None = None
+        self.path: Path | None = None
+
+    def start(self, deliver):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.dir / f"{os.getpid()}.sock"
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(str(self.path))
+        atexit.register(self.path.unlink, missing_ok=True)
+        threading.Thread(target=self._recv, args=(deliver,), name="invalidation-recv", daemon=True).start()
+
+    def _recv(self, deliver):
+        while True:
+            try:
+                deliver(json.loads(self.sock.recv(65536)))
+            except ValueError:
+                continue
+            except OSError:
+                logger.warning("Bus invalidazione: socket chiuso", exc_info=True)
+                return
+
+    def send(self, message: dict):
+        data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+        out = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        out.setblocking(False)
+        try:
+            for path in self.dir.glob("*.sock"):
+                if path == self.path:
+                    continue
+                try:
+                    out.sendto(data, str(path))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # processo terminato senza ripulire
+                    path.unlink(missing_ok=True)
+                except BlockingIOError:
+                    logger.warning("Bus invalidazione: coda piena per %s, messaggio perso", path.name)
+        finally:
+            out.close()
+
+
+class DatabaseTransport:
+    """Righe web.Invalidation: un thread per processo legge quelle nuove."""
+
+    def start(self, deliver):
+        threading.Thread(target=self._poll, args=(deliver,), name="invalidation-poll", daemon=True).start()
+
+    def _poll(self, deliver):
+        from .models import Invalidation
+
+        last_id = None
+        while True:
+            try:
+                if last_id is None:
+                    # all'avvio applichiamo l'orizzonte recente: le cache condivise
+                    # possono ancora avere copie di prima dell'avvio
+                    since = time.time() - _horizon()
+                    rows = list(Invalidation.objects.order_by("id").values("id", "tags", "origin", "created_at"))
+                    last_id = rows[-1]["id"] if rows else 0
+                    rows = [r for r in rows if r["created_at"].timestamp() >= since]
+                else:
+                    rows = list(Invalidation.objects.filter(id__gt=last_id).values("id", "tags", "origin"))
+                for row in rows:
+                    last_id = max(last_id, row["id"])
+                    deliver({"tags": row["tags"], "origin": row["origin"]})
+            except Exception:
+                logger.warning("Bus invalidazione: lettura tabella fallita", exc_info=True)
+            finally:
+                close_old_connections()
+            time.sleep(_poll_interval())
+
+    def send(self, message: dict):
+        from .models import Invalidation
+
+        row = Invalidation.objects.create(tags=message["tags"], origin=message["origin"])
+        if row.id % 100 == 0:
+            cutoff = timezone.now() - timedelta(seconds=_horizon())
+            Invalidation.objects.filter(created_at__lt=cutoff).delete()
+
+
+class FileTransport:
+    """File JSON lines in append; ogni processo lo legge dalla posizione in cui era."""
+
+    def __init__(self):
+        self.path = Path(getattr(settings, "INVALIDATION_FILE", Path(settings.BASE_DIR) / "var" / "invalidation.jsonl"))
+
+    def start(self, deliver):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch()
+        offset = self.path.stat().st_size
+        threading.Thread(target=self._tail, args=(deliver, offset), name="invalidation-tail", daemon=True).start()
+
+    def _tail(self, deliver, offset: int):
+        while True:
+            try:
+                if self.path.stat().st_size < offset:
+                    offset = 0  # file troncato / ricreato
+                with open(self.path, "rb") as fh:
+                    fh.seek(offset)
+                    for line in fh:
+                        if not line.endswith(b"\n"):
+                            break  # riga ancora in scrittura
+                        offset += len(line)
+                        try:
+                            deliver(json.loads(line))
+                        except ValueError:
+                            continue
+            except OSError:
+                logger.warning("Bus invalidazione: lettura %s fallita", self.path, exc_info=True)
+            time.sleep(_poll_interval())
+
+    def send(self, message: dict):
+        line = json.dumps(message, separators=(",", ":")) + "\n"
+        # una sola write in O_APPEND: le righe di processi diversi non si mescolano
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+
+TRANSPORTS = {
+    "local": LocalTransport,
+    "unix": UnixSocketTransport,
+    "db": DatabaseTransport,
+    "file": FileTransport,
+}
+
+
+# ---------------------------
+# Bus
+# ---------------------------
+
+_lock = threading.Lock()
+_invalidated: dict[str, float] = {}
+_subscribers: list[Callable[[frozenset], None]] = []
+_transport = None
+_pid: int | None = None
+
+
+def _ensure_started():
+    global _transport, _pid
+    if _pid == os.getpid():
+        return
+    with _lock:
+        # dopo un fork il thread di ricezione del padre non esiste più
+        if _pid == os.getpid():
+            return
+        _pid = os.getpid()
+        name = getattr(settings, "INVALIDATION_TRANSPORT", "unix")
+        cls = TRANSPORTS.get(name) or import_string(name)
+        _transport = cls()
+    try:
+        _transport.start(_deliver)
+    except Exception:
+        logger.warning("Bus invalidazione %r non avviato: solo invalidazioni locali", name, exc_info=True)
+        _transport = LocalTransport()
+
+
+def _apply(tags: frozenset) -> None:
+    now = time.time()
+    with _lock:
+        for tag in tags:
+            _invalidated[tag] = now
+        if len(_invalidated) > int(getattr(settings, "INVALIDATION_MAX_TAGS", 10000)):
+            cutoff = now - _horizon()
+            for tag in [t for t, at in _invalidated.items() if at < cutoff]:
+                del _invalidated[tag]
+        subscribers = list(_subscribers)
+    for cb in subscribers:
+        try:
+            cb(tags)
+        except Exception:
+            logger.exception("Invalidazione non applicata (%s)", getattr(cb, "__name__", cb))
+
+
+def _deliver(message: dict) -> None:
+    if message.get("origin") == _origin():
+        return
+    tags = frozenset(str(t) for t in message.get("tags") or ())
+    if tags:
+        _apply(tags)
+
+
+def publish(*tags: str) -> None:
+    """Invalida `tags` in questo processo e li spedisce agli altri worker."""
+    tags = frozenset(t for t in tags if t)
+    if not tags:
+        return
+    _ensure_started()
+    _apply(tags)
+    try:
+        _transport.send({"tags": sorted(tags), "origin": _origin()})
+    except Exception:
+        # la modifica è già avvenuta: gli altri worker vedranno il dato nuovo allo scadere del TTL
+        logger.warning("Bus invalidazione: invio fallito %s", sorted(tags), exc_info=True)
+
+
+def stale(tags: Iterable[str] | None, fetched: float) -> bool:
+    """True se uno dei `tags` è stato invalidato dopo `fetched` (time.time())."""
+    _ensure_started()
+    if not tags or not _invalidated:
+        return False
+    return any(_invalidated.get(t, 0) >= fetched for t in tags)
+
+
+def on_invalidate(callback: Callable[[frozenset], None]) -> Callable[[frozenset], None]:
+    """Registra una cache che reagisce ai tag ricevuti (chiamata fuori dalla richiesta)."""
+    with _lock:
+        _subscribers.append(callback)
+    return callback
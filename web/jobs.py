@@ -0,0 +1,354 @@
+# web/jobs.py
+# -----------------------------------------------------------------------------
+# Coda job su SQLite (modello web.models.Job) per le scritture lente verso il
+# backend: attivazione PRO, upload biglietti in rivendita, ticket di supporto.
+# - enqueue(): salva il job (idempotency_key unica: un doppio submit ritorna
+#   il job già esistente) e sveglia i worker; la view reindirizza subito alla
+#   pagina di stato (job_status) che fa polling. Gli allegati si copiano su
+#   disco solo se il job è nuovo (la chiave usa lo sha256 del contenuto).
+# - Il token API dell'utente non entra nel payload (resta in chiaro nel DB):
+#   sta nella cache delle sessioni (JOBS_TOKEN_CACHE_ALIAS), dove si trova già
+#   la sessione stessa, per JOBS_TOKEN_TTL secondi e si cancella a fine job.
+# - Worker: JOBS_WORKERS thread per processo (avviati al primo enqueue; con
+#   JOBS_IN_PROCESS=False si usa solo `manage.py run_jobs`). Il claim è un
+#   UPDATE condizionato, quindi più processi possono lavorare sulla stessa coda.
+# - Errori: 4xx del backend = definitivo; il resto si ritenta con backoff
+#   esponenziale fino a max_attempts.
+# - Gli handler salvano i passi già fatti con checkpoint(): un retry non
+#   ripete le scritture già andate a buon fine.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from . import invalidation
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY = "jobs"
+
+
+class PermanentJobError(Exception):
+    """Errore che non ha senso ritentare (dati rifiutati dal backend, ...)."""
+
+
+_handlers: dict[str, Callable[[Job], dict]] = {}
+
+
+def handler(kind: str):
+    """Registra la funzione che esegue i job di tipo `kind` (ritorna il result)."""
+    def deco(fn):
+        _handlers[kind] = fn
+        return fn
+    return deco
+
+
+# ---------------------------
+# Enqueue
+# ---------------------------
+
+def make_key(kind: str, *parts) -> str:
+    raw = json.dumps([kind, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def files_dir() -> Path:
+    return Path(getattr(settings, "JOBS_FILES_DIR", Path(settings.BASE_DIR) / "var" / "jobs"))
+
+
+def upload_digest(uploaded) -> str:
+    """sha256 del contenuto di un UploadedFile (per la chiave di idempotenza)."""
+    digest = hashlib.sha256()
+    for chunk in uploaded.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_upload(key: str, uploaded) -> dict:
+    """Copia un UploadedFile su disco per il worker: {path, name, content_type, sha256}."""
+    folder = files_dir() / key
+    folder.mkdir(parents=True, exist_ok=True)
+    target = folder / os.path.basename(uploaded.name or "file")
+    digest = hashlib.sha256()
+    with open(target, "wb") as out:
+        for chunk in uploaded.chunks():
+            digest.update(chunk)
+            out.write(chunk)
+    return {"path": str(target), "name": uploaded.name, "content_type": uploaded.content_type,
+            "sha256": digest.hexdigest()}
+
+
+def _token_cache():
+    return caches[getattr(settings, "JOBS_TOKEN_CACHE_ALIAS", "default")]
+
+
+def _token_key(job_key: str) -> str:
+    return f"jobs:token:{job_key}"
+
+
+def job_token(job: Job) -> str:
+    """Token API con cui eseguire il job (PermanentJobError se è scaduto)."""
+    token = _token_cache().get(_token_key(job.idempotency_key)) or (job.payload or {}).get("token")
+    if not token:
+        raise PermanentJobError("Sessione scaduta: ripeti l'operazione.")
+    return token
+
+
+def enqueue(request, kind: str, payload: dict, *, key: str, token: str | None = None,
+            uploads=(), max_attempts: int | None = None) -> Job:
+    """
+    Crea il job (o ritorna quello con la stessa chiave, se non è fallito) e lo
+    associa alla sessione per la pagina di stato. `uploads` (UploadedFile)
+    finiscono su disco, in payload["files"], solo per un job nuovo.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Job sconosciuto: {kind!r}")
+    job = Job.objects.filter(idempotency_key=key).first()
+    if job is not None and job.status == Job.FAILED:
+        # stesso submit dopo un fallimento definitivo: si riparte da capo
+        job.delete()
+        job = None
+    if job is None:
+        try:
+            # il job è visibile ai worker solo a commit avvenuto, con gli allegati già su disco
+            with transaction.atomic():
+                job = Job.objects.create(
+                    kind=kind,
+                    idempotency_key=key,
+                    payload=payload,
+                    run_after=timezone.now(),
+                    max_attempts=max_attempts or int(getattr(settings, "JOBS_MAX_ATTEMPTS", 5)),
+                )
+                if uploads:
+                    try:
+                        job.payload = {**payload, "files": [store_upload(key, f) for f in uploads]}
+                    except Exception:
+                        shutil.rmtree(files_dir() / key, ignore_errors=True)
+                        raise
+                    job.save(update_fields=["payload"])
+        except IntegrityError:
+            job = Job.objects.get(idempotency_key=key)
+    if token and job.status in (Job.QUEUED, Job.RUNNING):
+        _token_cache().set(_token_key(key), token, int(getattr(settings, "JOBS_TOKEN_TTL", 3600)))
+
+    owned = request.session.get(SESSION_KEY) or []
+    if str(job.id) not in owned:
+        request.session[SESSION_KEY] = (owned + [str(job.id)])[-20:]
+    _pool.wake()
+    return job
+
+
+def owns(request, job_id) -> bool:
+    return str(job_id) in (request.session.get(SESSION_KEY) or [])
+
+
+# ---------------------------
+# Esecuzione
+# ---------------------------
+
+def _http_status(exc: BaseException) -> int | None:
+    for e in (exc, exc.__cause__):
+        resp = getattr(e, "response", None)
+        if resp is not None:
+            return resp.status_code
+    return None
+
+
+def _claim() -> Job | None:
+    now = timezone.now()
+    for job_id in Job.objects.filter(status=Job.QUEUED, run_after__lte=now).values_list("id", flat=True)[:5]:
+        if Job.objects.filter(id=job_id, status=Job.QUEUED).update(status=Job.RUNNING, updated_at=now):
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def _finish(job: Job):
+    """Job concluso: via gli allegati su disco e il token (cache e payload)."""
+    shutil.rmtree(files_dir() / job.idempotency_key, ignore_errors=True)
+    _token_cache().delete(_token_key(job.idempotency_key))
+    job.payload = {k: v for k, v in (job.payload or {}).items() if k != "token"}
+
+
+def run_job(job: Job) -> None:
+    fn = _handlers[job.kind]
+    job.attempts += 1
+    try:
+        result = fn(job) or {}
+    except Exception as e:
+        status = _http_status(e)
+        permanent = isinstance(e, PermanentJobError) or (status is not None and 400 <= status < 500)
+        job.error = str(e)[:2000]
+        if permanent or job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            _finish(job)
+            logger.warning("Job %s %s fallito: %s", job.kind, job.id, e)
+        else:
+            base = float(getattr(settings, "JOBS_RETRY_BASE_SECONDS", 2))
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=base * 2 ** (job.attempts - 1))
+            logger.info("Job %s %s: tentativo %s fallito, ritento", job.kind, job.id, job.attempts)
+    else:
+        job.result = {**job.result, **result}
+        job.status = Job.DONE
+        job.error = ""
+        _finish(job)
+    job.save()
+
+
+def checkpoint(job: Job, **values) -> None:
+    """Salva subito un passo completato (letto dai tentativi successivi in job.result)."""
+    job.result = {**job.result, **values}
+    Job.objects.filter(id=job.id).update(result=job.result)
+
+
+def run_pending(limit: int | None = None) -> int:
+    """Esegue i job pronti (sincrono). Ritorna quanti ne ha eseguiti."""
+    done = 0
+    while limit is None or done < limit:
+        job = _claim()
+        if job is None:
+            break
+        try:
+            run_job(job)
+        finally:
+            close_old_connections()
+        done += 1
+    return done
+
+
+def requeue_stale(older_than: float | None = None) -> int:
+    """Job rimasti RUNNING (worker morto a metà): tornano in coda."""
+    if older_than is None:
+        older_than = float(getattr(settings, "JOBS_STALE_SECONDS", 600))
+    limit = timezone.now() - timedelta(seconds=older_than)
+    return Job.objects.filter(status=Job.RUNNING, updated_at__lt=limit).update(status=Job.QUEUED)
+
+
+class _Pool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._pid: int | None = None
+
+    def wake(self):
+        if not getattr(settings, "JOBS_IN_PROCESS", True):
+            return
+        self._ensure_started()
+        self._wake.set()
+
+    def _ensure_started(self):
+        with self._lock:
+            # dopo un fork i thread del padre non esistono più
+            if self._pid == os.getpid() and all(t.is_alive() for t in self._threads):
+                return
+            self._pid = os.getpid()
+            self._threads = []
+            requeue_stale()
+            for i in range(int(getattr(settings, "JOBS_WORKERS", 2))):
+                t = threading.Thread(target=self._run, name=f"jobs-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _run(self):
+        poll = float(getattr(settings, "JOBS_POLL_INTERVAL", 1.0))
+        while True:
+            try:
+                if run_pending() == 0:
+                    self._wake.wait(poll)
+                    self._wake.clear()
+            except Exception:
+                logger.exception("Worker job: errore inatteso")
+                close_old_connections()
+                time.sleep(poll)
+
+
+_pool = _Pool()
+
+
+# ---------------------------
+# Handler
+# ---------------------------
+
+@handler("pro_activation")
+def _pro_activation(job: Job) -> dict:
+    from .services import tixy_api
+
+    p = job.payload
+    token = job_token(job)
+    abb_id = job.result.get("abbonamento_id")
+    if not abb_id:
+        abb = tixy_api.api_abbonamento_create(token, plan_id=p["plan_id"], prezzo=p["prezzo"],
+                                              durata_giorni=p["giorni"],
+                                              idempotency_key=f"{job.idempotency_key}:abbonamento")
+        abb_id = abb["id"]
+        checkpoint(job, abbonamento_id=abb_id)
+    tixy_api.api_monitoraggio_create(token, abbonamento_id=abb_id, event_id=p["event_id"],
+                                     idempotency_key=f"{job.idempotency_key}:monitoraggio")
+    if p.get("event_id"):
+        invalidation.publish(invalidation.event(p["event_id"]))
+    return {"message": "✅ Abbonamento PRO attivato! Monitoraggio creato.", "redirect": p["redirect"]}
+
+
+def _open_files(specs: list[dict], field: str):
+    return [(field, (f["name"], Path(f["path"]).read_bytes(), f["content_type"] or "application/octet-stream"))
+            for f in specs]
+
+
+@handler("resale_upload")
+def _resale_upload(job: Job) -> dict:
+    from .services import tixy_api
+
+    p = job.payload
+    files = _open_files(p.get("files") or [], "ticket_file") or None
+    tixy_api.api_ticket_upload(job_token(job), p["data"], files=files, idempotency_key=job.idempotency_key)
+    return {"message": "✅ Caricamento avviato. Verificheremo il PDF/QR e i prezzi.", "redirect": p["redirect"]}
+
+
+@handler("support_ticket")
+def _support_ticket(job: Job) -> dict:
+    from django.urls import reverse
+    from .services import tixy_api
+
+    p = job.payload
+    files = _open_files(p.get("files") or [], "attachments")
+    res = tixy_api.api_support_ticket_create(job_token(job), p["fields"], files=files,
+                                             idempotency_key=job.idempotency_key)
+    if not (isinstance(res, dict) and res.get("id")):
+        msg = (res.get("detail") if isinstance(res, dict) else None) or "Impossibile creare il ticket."
+        raise PermanentJobError(msg)
+    return {"message": "✅ Ticket creato correttamente.",
+            "redirect": reverse("account_support_detail", args=[res["id"]])}
+
+
+def describe_error(job: Job) -> str:
+    """Messaggio d'errore leggibile (il body del backend se è JSON)."""
+    text = job.error or ""
+    _, sep, body = text.partition("| body=")
+    if sep:
+        try:
+            err = json.loads(body)
+        except ValueError:
+            return text
+        if isinstance(err, dict):
+            parts = []
+            for v in err.values():
+                parts.extend(str(x) for x in (v if isinstance(v, list) else [v]))
+            return " ".join(parts) or text
+    return text
@@ -0,0 +1,111 @@
+# web/lazy_views.py
+# -----------------------------------------------------------------------------
+# View caricate al primo uso: i moduli dei flussi rari (account, PRO,
+# rivendita, supporto, recensioni) non vengono importati da ogni worker.
+# - urls.py usa module("web.views_support").account_support_list: l'oggetto
+#   LazyView espone __module__ / __name__ senza importare nulla, quindi
+#   resolver, reverse() e system check non caricano il modulo.
+# - Il modulo si importa alla prima richiesta sulla view (o al primo accesso
+#   a un attributo messo da un decorator, es. csrf_exempt letto dal
+#   middleware CSRF subito prima della chiamata).
+# - Ogni import è cronometrato: stats() -> {modulo: {ms, view, at}}, esposto
+#   su /healthz/ready e nelle metriche (tixy_view_module_import_*).
+# - preload(): moduli importati comunque all'avvio (LAZY_VIEWS_PRELOAD, di
+#   default web.views con le pagine più richieste), nel passo "views" di
+#   web.startup.
+# Solo view funzione: le class-based view vanno in urls.py con .as_view().
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import importlib
+import logging
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_imports: dict[str, dict] = {}
+
+
+def load_module(name: str, view: str | None = None):
+    """Importa `name` (se non è già caricato) registrando quanto ci ha messo."""
+    module = sys.modules.get(name)
+    # un modulo che un'altra richiesta sta ancora importando è incompleto:
+    # import_module aspetta che finisca
+    if module is not None and not getattr(getattr(module, "__spec__", None), "_initializing", False):
+        return module
+    t0 = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed = time.perf_counter() - t0
+    with _lock:
+        if name in _imports:
+            return module  # importato in parallelo da un'altra richiesta
+        _imports[name] = {"ms": round(elapsed * 1000, 1), "view": view, "at": time.time()}
+    logger.info("Modulo view %s importato in %.1f ms (%s)", name, elapsed * 1000, view or "preload")
+    return module
+
+
+def preload() -> None:
+    for name in getattr(settings, "LAZY_VIEWS_PRELOAD", ("web.views",)):
+        load_module(name)
+
+
+def stats() -> dict:
+    with _lock:
+        return {name: dict(info) for name, info in _imports.items()}
+
+
+class LazyView:
+    def __init__(self, module: str, name: str):
+        self.__module__ = module
+        self.__name__ = name
+        self.__qualname__ = name
+        self._view = None
+
+    def resolve(self):
+        view = self._view
+        if view is None:
+            view = self._view = getattr(load_module(self.__module__, self.__name__), self.__name__)
+        return view
+
+    def __call__(self, request, *args, **kwargs):
+        return self.resolve()(request, *args, **kwargs)
+
+    def __getattr__(self, attr):
+        # "view_class" è sondato da resolver/ResolverMatch: non deve importare il modulo
+        if attr.startswith("__") or attr in ("view_class", "_view"):
+            raise AttributeError(attr)
+        return getattr(self.resolve(), attr)
+
+    def __repr__(self):
+        return f"<LazyView {self.__module__}.{self.__name__}>"
+
+
+class LazyModule:
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr) -> LazyView:
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return LazyView(self._name, attr)
+
+
+def module(name: str) -> LazyModule:
+    """module("web.views_pro").pro_cart -> LazyView di web.views_pro.pro_cart."""
+    return LazyModule(name)
+
+
+@metrics.collector
+def _import_metrics():
+    # contatori: sommati fra i worker danno numero di import e tempo totale
+    for name, info in stats().items():
+        yield metrics.COUNTER, "tixy_view_module_imports_total", {"module": name}, 1
+        yield metrics.COUNTER, "tixy_view_module_import_seconds_total", {"module": name}, info["ms"] / 1000
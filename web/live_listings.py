@@ -0,0 +1,341 @@
+# web/live_listings.py
+# -----------------------------------------------------------------------------
+# Feed live della disponibilità biglietti di una performance.
+# - Un solo poller per performance e per processo interroga
+#   performances/<id>/listings/ ogni LIVE_POLL_INTERVAL secondi, fuori dalla
+#   cache API (rivalidando con il proprio ETag: se nulla cambia il backend
+#   risponde 304) e calcola le differenze fra stati: new / sold / price / qty.
+# - Il cursore dei client è la versione dello stato (hash delle listing), non
+#   un contatore del processo: worker diversi che vedono gli stessi dati
+#   calcolano la stessa versione, quindi una richiesta (o una riconnessione)
+#   che arriva su un altro worker riprende da dove era. Ogni feed tiene gli
+#   ultimi LIVE_HISTORY_SIZE stati; da un cursore sconosciuto (troppo vecchio)
+#   il client riceve un evento "reset" (= ricarica la pagina).
+# - Trasporto:
+#     long-poll JSON (default): chi aspetta tiene un thread del worker, quindi
+#       al massimo LIVE_BLOCKING_SHARE dei WORKER_THREADS per processo e solo
+#       con server multi-thread; oltre, risposta immediata e il client riprova
+#       dopo LIVE_POLL_INTERVAL;
+#     SSE: solo sotto ASGI con LIVE_SSE_ENABLED (generatore asincrono, nessun
+#       thread occupato), al massimo LIVE_MAX_CLIENTS stream per processo.
+# - Il poller si ferma da solo dopo LIVE_IDLE_SECONDS senza client.
+# - Un'invalidazione perf:<id> o listing:<id> (web.invalidation) fa ripartire
+#   subito il poll della performance invece di aspettare il giro successivo.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from . import invalidation
+from .services import tixy_api
+
+logger = logging.getLogger(__name__)
+
+RESET = {"type": "reset"}
+
+_cursor_re = re.compile(r"[0-9a-f]{16}")
+
+
+class LiveBusy(Exception):
+    """Troppi client live su questo processo (LIVE_MAX_CLIENTS / quota thread)."""
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _interval() -> float:
+    return float(_setting("LIVE_POLL_INTERVAL", 3))
+
+
+def _listing_state(row: dict) -> tuple:
+    return (str(row.get("price_each") or ""), str(row.get("total_price") or ""), row.get("qty"))
+
+
+def state_version(state: dict) -> str:
+    raw = json.dumps(sorted(state.items()), separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def parse_cursor(value: str | None) -> str:
+    value = (value or "").strip()
+    return value if _cursor_re.fullmatch(value) else ""
+
+
+def diff_listings(old: dict, new: dict) -> list[dict]:
+    """Eventi tra due stati {listing_id: (price_each, total_price, qty)}."""
+    events = []
+    for lid, state in new.items():
+        prev = old.get(lid)
+        payload = {"listing": lid, "price_each": state[0], "total_price": state[1], "qty": state[2]}
+        if prev is None:
+            events.append({"type": "new", **payload})
+        elif prev[:2] != state[:2]:
+            events.append({"type": "price", **payload})
+        elif prev[2] != state[2]:
+            events.append({"type": "qty", **payload})
+    for lid in old.keys() - new.keys():
+        events.append({"type": "sold", "listing": lid})
+    return events
+
+
+class _Feed:
+    def __init__(self, perf_id: int):
+        self.perf_id = perf_id
+        self.cond = threading.Condition()
+        self.state: dict | None = None
+        self.version = ""
+        self.history: OrderedDict[str, dict] = OrderedDict()
+        self.polls = 0
+        self.etag: str | None = None
+        self.unknown: OrderedDict[str, float] = OrderedDict()
+        self.clients = 0
+        self.idle_since = time.time()
+        self.thread: threading.Thread | None = None
+        self.wake = threading.Event()
+
+    # --- poller (un thread per feed) ---
+    def _poll_once(self):
+        data, self.etag = tixy_api.poll_performance_listings(self.perf_id, self.etag)
+        with self.cond:
+            self.polls += 1
+            if data is not None or self.state is None:
+                data = data or {}
+                rows = data.get("results", data if isinstance(data, list) else []) or []
+                state = {int(r["id"]): _listing_state(r) for r in rows if isinstance(r, dict) and r.get("id")}
+                version = state_version(state)
+                if version != self.version:
+                    self.state, self.version = state, version
+                    self.history[version] = state
+                    self.history.move_to_end(version)
+                    while len(self.history) > int(_setting("LIVE_HISTORY_SIZE", 100)):
+                        self.history.popitem(last=False)
+            self.cond.notify_all()
+
+    def _run(self):
+        idle = float(_setting("LIVE_IDLE_SECONDS", 30))
+        while True:
+            try:
+                self._poll_once()
+            except Exception:
+                logger.warning("Poll listings perf=%s fallito", self.perf_id, exc_info=True)
+                with self.cond:
+                    self.polls += 1  # chi aspetta questo giro non resta appeso
+                    self.cond.notify_all()
+            self.wake.wait(_interval())
+            self.wake.clear()
+            with _registry_lock:
+                if self.clients == 0 and time.time() - self.idle_since > idle:
+                    _feeds.pop(self.perf_id, None)
+                    return
+
+    # --- lettori ---
+    def check(self, cursor: str) -> tuple[str, list[dict]] | None:
+        """Senza attesa: (versione corrente, eventi da `cursor`); None = cursore sconosciuto."""
+        with self.cond:
+            if not cursor or cursor == self.version:
+                return self.version, []
+            old = self.history.get(cursor)
+            if old is None:
+                return None
+            return self.version, diff_listings(old, self.state)
+
+    def wait(self, cursor: str, timeout: float) -> tuple[str, list[dict]] | None:
+        """
+        Come check(), ma se non è cambiato nulla attende fino a `timeout`.
+        Cursore vuoto: solo la versione corrente (dopo il primo poll). Un
+        cursore sconosciuto può essere più nuovo del nostro ultimo poll: si
+        fa subito un giro e lo si riconosce se il backend è allo stesso stato.
+        """
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            if not cursor:
+                self.cond.wait_for(lambda: self.state is not None, timeout)
+                return self.version, []
+            if cursor != self.version and cursor not in self.history:
+                polls = self.polls
+                self.wake.set()
+                self.cond.wait_for(lambda: self.polls > polls, timeout)
+            start = self.version
+            if cursor == start:
+                self.cond.wait_for(lambda: self.version != start, max(0.0, deadline - time.monotonic()))
+        return self.check(cursor)
+
+    def give_up(self, cursor: str) -> bool:
+        """
+        Cursore sconosciuto senza attesa: si sveglia il poller e lo si
+        considera perso (reset) solo se resta sconosciuto per due giri.
+        """
+        self.wake.set()
+        now = time.monotonic()
+        with self.cond:
+            first = self.unknown.setdefault(cursor, now)
+            while len(self.unknown) > int(_setting("LIVE_HISTORY_SIZE", 100)):
+                self.unknown.popitem(last=False)
+        return now - first > 2 * _interval()
+
+
+_registry_lock = threading.Lock()
+_feeds: dict[int, _Feed] = {}
+_clients = 0
+_blocking = 0
+
+
+@invalidation.on_invalidate
+def _on_invalidate(tags: frozenset) -> None:
+    with _registry_lock:
+        feeds = list(_feeds.values())
+    for feed in feeds:
+        listings = feed.state or {}
+        if f"perf:{feed.perf_id}" in tags or any(f"listing:{lid}" in tags for lid in listings):
+            feed.wake.set()
+
+
+def blocking_limit() -> int:
+    """Client che possono aspettare su un thread del processo (long-poll)."""
+    threads = int(_setting("WORKER_THREADS", 32))
+    return int(threads * float(_setting("LIVE_BLOCKING_SHARE", 0.25)))
+
+
+def sse_available(request) -> bool:
+    """SSE solo sotto ASGI: sotto WSGI ogni stream terrebbe un thread per minuti."""
+    from django.core.handlers.asgi import ASGIRequest
+
+    return bool(_setting("LIVE_SSE_ENABLED", False)) and isinstance(request, ASGIRequest)
+
+
+def _reserve(perf_id: int, blocking: bool) -> _Feed:
+    """Occupa un posto client (LiveBusy se non c'è) e ritorna il feed, avviando il poller se serve."""
+    global _clients, _blocking
+    with _registry_lock:
+        if _clients >= int(_setting("LIVE_MAX_CLIENTS", 200)):
+            raise LiveBusy()
+        if blocking and _blocking >= blocking_limit():
+            raise LiveBusy()
+        feed = _feeds.get(perf_id)
+        if feed is None:
+            feed = _feeds[perf_id] = _Feed(perf_id)
+        if feed.thread is None or not feed.thread.is_alive():
+            feed.thread = threading.Thread(target=feed._run, name=f"live-listings-{perf_id}", daemon=True)
+            feed.thread.start()
+        feed.clients += 1
+        _clients += 1
+        _blocking += blocking
+    return feed
+
+
+def _release(feed: _Feed, blocking: bool) -> None:
+    global _clients, _blocking
+    with _registry_lock:
+        feed.clients -= 1
+        _clients -= 1
+        _blocking -= blocking
+        feed.idle_since = time.time()
+
+
+@contextmanager
+def subscribe(perf_id: int, *, blocking: bool = False):
+    """Feed condiviso della performance per la durata del blocco."""
+    feed = _reserve(perf_id, blocking)
+    try:
+        yield feed
+    finally:
+        _release(feed, blocking)
+
+
+def long_poll(perf_id: int, cursor: str, *, may_block: bool) -> dict:
+    """
+    Risposta long-poll {"cursor", "events", "retry"} (retry = ms prima della
+    prossima richiesta). Senza posto fra i client in attesa (o con server
+    single-thread) risponde subito. Solleva LiveBusy oltre LIVE_MAX_CLIENTS.
+    """
+    interval_ms = int(_interval() * 1000)
+    if may_block:
+        try:
+            with subscribe(perf_id, blocking=True) as feed:
+                result = feed.wait(cursor, float(_setting("LIVE_LONGPOLL_TIMEOUT", 10)))
+            if result is None:
+                return {"cursor": cursor, "events": [RESET], "retry": 0}
+            version, events = result
+            return {"cursor": version, "events": events, "retry": 0 if events else interval_ms}
+        except LiveBusy:
+            pass
+    with subscribe(perf_id) as feed:
+        result = feed.check(cursor)
+        if result is None and feed.give_up(cursor):
+            return {"cursor": cursor, "events": [RESET], "retry": 0}
+    if result is None:
+        # forse un altro worker è un giro avanti: stesso cursore alla prossima
+        return {"cursor": cursor, "events": [], "retry": interval_ms}
+    version, events = result
+    return {"cursor": version or cursor, "events": events, "retry": interval_ms}
+
+
+def _sse(version: str, event: dict) -> str:
+    return f"id: {version}\nevent: listing\ndata: {json.dumps(event)}\n\n"
+
+
+class SSEStream:
+    """
+    Stream text/event-stream (ASGI); chiude dopo LIVE_SSE_MAX_SECONDS (il
+    browser si riconnette). Il posto client si prende alla creazione, quindi
+    LiveBusy arriva alla view prima della risposta; si libera a fine stream
+    o in close() (chiamata da StreamingHttpResponse anche se lo stream non
+    è mai partito).
+    """
+
+    def __init__(self, perf_id: int, cursor: str):
+        self.feed = _reserve(perf_id, False)
+        self.cursor = cursor
+        self._released = False
+
+    def close(self) -> None:
+        if not self._released:
+            self._released = True
+            _release(self.feed, False)
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        feed, cursor = self.feed, self.cursor
+        tick = min(0.5, _interval())
+        keepalive = float(_setting("LIVE_KEEPALIVE_SECONDS", 15))
+        now = time.monotonic()
+        deadline = now + float(_setting("LIVE_SSE_MAX_SECONDS", 300))
+        grace = now + 2 * _interval()  # tempo per riconoscere un cursore di un altro worker
+        last_sent = now
+        try:
+            yield "retry: 3000\n\n"
+            if cursor and feed.check(cursor) is None:
+                feed.wake.set()
+            while time.monotonic() < deadline:
+                result = feed.check(cursor)
+                now = time.monotonic()
+                if result is None and now >= grace:
+                    yield _sse(feed.version, RESET)
+                    return
+                if result is not None:
+                    version, events = result
+                    for ev in events:
+                        yield _sse(version, ev)
+                    if events:
+                        last_sent = now
+                    cursor = version or cursor
+                if now - last_sent >= keepalive:
+                    yield ": keepalive\n\n"
+                    last_sent = now
+                await asyncio.sleep(tick)
+        finally:
+            self.close()
@@ -0,0 +1,101 @@
+import gzip
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from web.services import tixy_api
+
+try:
+    import brotli
+except ImportError:  # opzionale
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # opzionale
+    orjson = None
+
+
+# campi usati da events_index (vedi views.events_index)
+EVENTS_INDEX_FIELDS = ("id", "performance", "evento_nome", "luogo_nome", "starts_at_utc", "performance_info")
+
+
+def _synthetic_rows(n: int) -> dict:
+    """Pagina simile a search/performances/ (righe con campi annidati e descrizioni)."""
+    rows = []
+    for i in range(n):
+        rows.append({
+            "id": i + 1,
+            "evento": 1000 + i % 40,
+            "evento_nome": f"Concerto {i % 40} - Tour 2026",
+            "luogo": 200 + i % 12,
+            "luogo_nome": f"Arena {i % 12}",
+            "citta": ["Roma", "Milano", "Napoli", "Torino"][i % 4],
+            "indirizzo": f"Via del Teatro {i}, 00100",
+            "starts_at_utc": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}T21:00:00Z",
+            "doors_open_at": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}T19:30:00Z",
+            "prezzo_min": f"{20 + i % 30}.00",
+            "prezzo_max": f"{80 + i % 50}.00",
+            "valuta": "EUR",
+            "descrizione": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 6,
+            "immagine_url": f"https://cdn.example.org/img/{i}.jpg",
+            "categorie": ["musica", "live", "pop"],
+            "mappings_evento": [
+                {"piattaforma": {"id": p, "nome": f"Piattaforma {p}"}, "url": f"https://example.org/{i}/{p}"}
+                for p in range(3)
+            ],
+            "created_at": "2025-09-01T10:00:00Z",
+            "updated_at": "2025-10-01T10:00:00Z",
+        })
+    return {"count": n, "next": None, "previous": None, "results": rows}
+
+
+def _timeit(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+class Command(BaseCommand):
+    help = "Benchmark decodifica JSON / proiezione campi / compressione su pagine di catalogo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200, help="Righe della pagina sintetica.")
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--path", help="Usa una risposta reale del backend (es. search/performances/).")
+        parser.add_argument("--limit", type=int, default=200, help="limit per --path.")
+
+    def handle(self, *args, **opts):
+        repeat = opts["repeat"]
+        if opts["path"]:
+            data = tixy_api._api_request("GET", opts["path"], params={"limit": opts["limit"]})
+        else:
+            data = _synthetic_rows(opts["rows"])
+
+        full = json.dumps(data).encode("utf-8")
+        slim = json.dumps(tixy_api.project_fields(data, EVENTS_INDEX_FIELDS)).encode("utf-8")
+
+        self.stdout.write(f"righe: {len(data.get('results', data) if isinstance(data, dict) else data)}")
+        self.stdout.write("\n== Trasferimento (byte) ==")
+        self.stdout.write(f"{'payload':<12}{'raw':>12}{'gzip':>12}{'brotli':>12}")
+        for label, payload in (("completo", full), ("fields=", slim)):
+            gz = len(gzip.compress(payload, 6))
+            br = len(brotli.compress(payload, quality=5)) if brotli else "-"
+            self.stdout.write(f"{label:<12}{len(payload):>12}{gz:>12}{br:>12}")
+
+        self.stdout.write("\n== Decodifica (ms, mediana) ==")
+        self.stdout.write(f"{'payload':<12}{'json':>12}{'orjson':>12}")
+        for label, payload in (("completo", full), ("fields=", slim)):
+            t_json = _timeit(lambda: json.loads(payload), repeat)
+            t_or = f"{_timeit(lambda: orjson.loads(payload), repeat):.3f}" if orjson else "-"
+            self.stdout.write(f"{label:<12}{t_json:>12.3f}{t_or:>12}")
+
+        if not orjson:
+            self.stdout.write(self.style.WARNING("orjson non installato: API_JSON_DECODER='auto' usa json."))
+        if not brotli:
+            self.stdout.write(self.style.WARNING("brotli non installato: il client negozia solo gzip/deflate."))
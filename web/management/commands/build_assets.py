@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from web import assets
+
+
+class Command(BaseCommand):
+    help = "Genera i bundle JS (core + chunk per pagina) minificati con hash nel nome."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--no-minify", action="store_true", help="Concatena senza minificare.")
+
+    def handle(self, *args, **opts):
+        manifest = assets.build_bundles(minify=not opts["no_minify"])
+        for name, path in manifest.items():
+            self.stdout.write(f"{name:10s} -> {path}")
+        self.stdout.write(self.style.SUCCESS(f"{len(manifest)} bundle generati."))
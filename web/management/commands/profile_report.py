@@ -0,0 +1,73 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from web import profiler
+
+_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def _window(value: str) -> float:
+    try:
+        if value[-1] in _UNITS:
+            return float(value[:-1]) * _UNITS[value[-1]]
+        return float(value) * 60
+    except (ValueError, IndexError):
+        raise CommandError(f"Finestra non valida: {value!r} (es. 30m, 6h, 2d)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Unisce i campioni del profiler (PROFILER_PATH) di una finestra temporale: "
+        "report hotspot per view oppure export collapsed / speedscope per i flame graph."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", default="1h", help="Finestra: 30m, 6h, 2d (default 1h).")
+        parser.add_argument("--view", default=None, help="Solo questa view (url_name).")
+        parser.add_argument("--top", type=int, default=15, help="Frame per classifica (default 15).")
+        parser.add_argument("--format", choices=("report", "collapsed", "speedscope"), default="report")
+        parser.add_argument("--output", "-o", default=None, help="File di uscita (default: stdout).")
+
+    def handle(self, *args, **opts):
+        profiler.flush()  # campioni di questo processo (se ce ne sono)
+        profiles = profiler.read(time.time() - _window(opts["since"]), opts["view"])
+        if not profiles:
+            raise CommandError(f"Nessun campione in {profiler.log_path()} per la finestra richiesta.")
+
+        if opts["format"] == "collapsed":
+            text = "\n".join(profiler.collapsed_lines(profiles)) + "\n"
+        elif opts["format"] == "speedscope":
+            text = json.dumps(profiler.speedscope(profiles), separators=(",", ":"))
+        else:
+            text = self._report(profiles, opts["top"])
+
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fh:
+                fh.write(text)
+            self.stdout.write(self.style.SUCCESS(f"{len(profiles)} view scritte in {opts['output']}."))
+        else:
+            self.stdout.write(text, ending="")
+
+    @staticmethod
+    def _report(profiles: dict, top: int) -> str:
+        out = []
+        by_time = sorted(profiles.items(), key=lambda kv: kv[1]["ms"], reverse=True)
+        for view, agg in by_time:
+            samples = agg["samples"] or 1
+            per_req = agg["ms"] / agg["requests"] if agg["requests"] else 0.0
+            out.append(
+                f"== {view}: {agg['requests']} richieste, {agg['samples']} campioni, "
+                f"~{agg['ms']:.0f} ms campionati (~{per_req:.1f} ms/richiesta)"
+            )
+            spots = profiler.hotspots(agg, top)
+            out.append("  categorie:")
+            for name, n in spots["categories"]:
+                out.append(f"    {100 * n / samples:5.1f}%  {name}")
+            for title, key in (("self (foglia)", "self"), ("total (inclusivo)", "total")):
+                out.append(f"  {title}:")
+                for label, n in spots[key]:
+                    out.append(f"    {100 * n / samples:5.1f}%  {n:6d}  {label}")
+            out.append("")
+        return "\n".join(out) + "\n"
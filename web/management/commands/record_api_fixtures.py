@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from web.services import api_fixtures, catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Registra le chiamate al backend fatte dalle pagine indicate in "
+        "web/api_fixtures/<nome>.json (per i test di regressione in replay)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", help="Nome della fixture (senza .json).")
+        parser.add_argument("urls", nargs="+", help="Path da visitare, es. / /eventi/ /evento/1/")
+
+    def handle(self, *args, **opts):
+        path = api_fixtures.fixture_path(opts["name"])
+        api_fixtures.clear_api_caches()
+        # tutto sincrono e senza cache: ogni chiamata necessaria finisce nel file
+        with override_settings(ALLOWED_HOSTS=["*"], CATALOG_BACKGROUND_REFRESH=False,
+                               API_HEDGE_ENABLED=False, API_RETRY_MAX=0):
+            with api_fixtures.record(path) as recorder:
+                catalog.refresh()
+                client = Client()
+                for url in opts["urls"]:
+                    r = client.get(url)
+                    self.stdout.write(f"{r.status_code} {url}")
+        calls = sum(len(v) for v in recorder.entries.values())
+        self.stdout.write(self.style.SUCCESS(f"{calls} chiamate registrate in {path}"))
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from web import jobs
+
+
+class Command(BaseCommand):
+    help = "Esegue i job in background (processo dedicato, con JOBS_IN_PROCESS=False)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Esegue i job pronti ed esce.")
+
+    def handle(self, *args, **opts):
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f"{requeued} job rimessi in coda.")
+        poll = float(getattr(settings, "JOBS_POLL_INTERVAL", 1.0))
+        while True:
+            done = jobs.run_pending()
+            if opts["once"]:
+                self.stdout.write(self.style.SUCCESS(f"{done} job eseguiti."))
+                return
+            if not done:
+                time.sleep(poll)
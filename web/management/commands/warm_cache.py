@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from web import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-renderizza le pagine più richieste (hit log) o gli eventi più vicini "
+        "(snapshot catalogo) per scaldare cache API e fragment cache dopo un deploy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", choices=("auto", "hits", "catalog"), default="auto",
+                            help="Da dove prendere le pagine (default: hit log, altrimenti catalogo).")
+        parser.add_argument("--limit", type=int, default=None, help="Numero massimo di pagine.")
+        parser.add_argument("--concurrency", type=int, default=None, help="Richieste in parallelo.")
+        parser.add_argument("--base-url", default=None,
+                            help="Scalda un'istanza avviata via HTTP (es. http://127.0.0.1:8000).")
+
+    def handle(self, *args, **opts):
+        default_cache = settings.CACHES.get("default", {}).get("BACKEND", "")
+        if not opts["base_url"] and default_cache.endswith("LocMemCache"):
+            self.stderr.write(self.style.WARNING(
+                "Cache 'default' in memoria di processo: il warm-up in-process non raggiunge "
+                "i worker. Usa --base-url oppure il warm-up all'avvio del worker."
+            ))
+
+        paths = warmup.select_paths(opts["source"], opts["limit"])
+        t0 = time.perf_counter()
+        results = warmup.warm(paths, concurrency=opts["concurrency"], base_url=opts["base_url"])
+        for r in results:
+            line = f"{r.status:3d} {r.ms:8.1f} ms  {r.path}"
+            self.stdout.write(line + (f"  {r.error}" if r.error else ""))
+        failed = sum(1 for r in results if r.status != 200)
+        total = (time.perf_counter() - t0) * 1000
+        msg = f"{len(results)} pagine in {total:.0f} ms ({failed} non riuscite)."
+        self.stdout.write(self.style.SUCCESS(msg) if not failed else self.style.WARNING(msg))
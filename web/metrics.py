@@ -0,0 +1,442 @@
+# web/metrics.py
+# -----------------------------------------------------------------------------
+# Metriche in formato Prometheus (testo) aggregate fra i worker del nodo.
+# - Registro per processo: contatori, gauge e istogrammi con etichette
+#   (inc / gauge_add / observe). Le metriche note sono descritte in METRICS.
+# - Ogni processo scrive il proprio stato completo in METRICS_DIR/<pid>.json
+#   (scrittura atomica) ogni METRICS_FLUSH_SECONDS, da un thread avviato alla
+#   prima richiesta dopo il fork.
+# - /metrics (health.prometheus) somma i file di tutti i processi:
+#     contatori / istogrammi -> somma (quelli di processi terminati vengono
+#                               spostati in archive.json: i totali non calano)
+#     gauge                  -> somma dei soli processi vivi e aggiornati
+#   I valori degli altri worker possono essere indietro di un flush. Ogni
+#   scrape riscrive lo snapshot del worker che risponde (una scrittura su
+#   disco); il flock su archive.lock si prende solo se c'è da archiviare.
+# - Metriche raccolte al momento dello snapshot (collector): retry / hedging
+#   e pool di connessioni verso il backend, load shedding, rate limit,
+#   readiness dei worker.
+# Non usa prometheus_client: il formato testo è sufficiente ed evita una
+# dipendenza in più (e il suo modo multiprocesso basato su variabili d'ambiente).
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Iterable
+
+from django.conf import settings
+
+from .warmup import is_warmup
+
+try:
+    import fcntl
+except ImportError:  # non POSIX: archiviazione senza lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+COUNTER, GAUGE, HISTOGRAM = "counter", "gauge", "histogram"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# nome -> (tipo, descrizione); gli istogrammi usano LATENCY_BUCKETS
+METRICS = {
+    "tixy_http_requests_total": (COUNTER, "Richieste HTTP per view (url_name), metodo e classe di status."),
+    "tixy_http_request_duration_seconds": (HISTOGRAM, "Durata delle richieste HTTP per view (url_name)."),
+    "tixy_http_requests_in_flight": (GAUGE, "Richieste HTTP in corso."),
+    "tixy_backend_requests_total": (COUNTER, "Chiamate al backend per funzione tixy_api ed esito (ok, 4xx, 5xx, error)."),
+    "tixy_backend_request_duration_seconds": (HISTOGRAM, "Durata delle chiamate al backend (retry compresi) per funzione tixy_api."),
+    "tixy_backend_retries_total": (COUNTER, "Retry verso il backend."),
+    "tixy_backend_retry_budget_exhausted_total": (COUNTER, "Retry negati dal budget."),
+    "tixy_backend_hedge_total": (COUNTER, "Hedging per endpoint: requests, hedged, hedge_wins, budget_denied."),
+    "tixy_backend_pool_connections": (GAUGE, "Connessioni verso il backend per host: in_use, idle, max."),
+    "tixy_cache_requests_total": (COUNTER, "Letture per livello di cache ed esito (hit, miss, revalidated, local)."),
+    "tixy_shed_requests_total": (COUNTER, "Load shedding per route: admitted, queued, shed."),
+    "tixy_shed_in_flight": (GAUGE, "Richieste con uno slot del load shedding."),
+    "tixy_ratelimit_requests_total": (COUNTER, "Controlli di rate limit per nome ed esito (allowed, limited)."),
+    "tixy_view_module_imports_total": (COUNTER, "Import di moduli view caricati al primo uso (web.lazy_views)."),
+    "tixy_view_module_import_seconds_total": (COUNTER, "Tempo speso a importare moduli view al primo uso."),
+    "tixy_workers": (GAUGE, "Processi worker che espongono metriche."),
+    "tixy_workers_ready": (GAUGE, "Worker con warm-up completato."),
+}
+
+
+def metrics_dir() -> Path:
+    return Path(getattr(settings, "METRICS_DIR", Path(settings.BASE_DIR) / "var" / "metrics"))
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+# ---------------------------
+# Registro del processo
+# ---------------------------
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.counters: dict[tuple, float] = {}
+        self.gauges: dict[tuple, float] = {}
+        self.histograms: dict[tuple, list] = {}  # key -> [conteggi per bucket (+Inf in fondo), somma]
+
+    def _check_fork(self):
+        # chiamata con self.lock acquisito: i valori del padre non sono di questo processo
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def inc(self, name: str, amount: float, labels: dict):
+        key = (name, _labels(labels))
+        with self.lock:
+            self._check_fork()
+            self.counters[key] = self.counters.get(key, 0.0) + amount
+
+    def gauge_add(self, name: str, delta: float, labels: dict):
+        key = (name, _labels(labels))
+        with self.lock:
+            self._check_fork()
+            self.gauges[key] = self.gauges.get(key, 0.0) + delta
+
+    def observe(self, name: str, value: float, labels: dict):
+        key = (name, _labels(labels))
+        i = bisect_left(LATENCY_BUCKETS, value)
+        with self.lock:
+            self._check_fork()
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0]
+            h[0][i] += 1
+            h[1] += value
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            self._check_fork()
+            return {
+                "counters": [[n, list(l), v] for (n, l), v in self.counters.items()],
+                "gauges": [[n, list(l), v] for (n, l), v in self.gauges.items()],
+                "histograms": [[n, list(l), list(h[0]), h[1]] for (n, l), h in self.histograms.items()],
+            }
+
+
+_registry = _Registry()
+_collectors: list[Callable[[], Iterable[tuple]]] = []
+
+
+def inc(name: str, amount: float = 1, **labels):
+    _registry.inc(name, amount, labels)
+
+
+def gauge_add(name: str, delta: float, **labels):
+    _registry.gauge_add(name, delta, labels)
+
+
+def observe(name: str, value: float, **labels):
+    _registry.observe(name, value, labels)
+
+
+def cache_access(layer: str, result: str):
+    """Esito di una lettura di cache: result = hit / miss / revalidated / local."""
+    _registry.inc("tixy_cache_requests_total", 1, {"layer": layer, "result": result})
+
+
+def collector(fn: Callable[[], Iterable[tuple]]) -> Callable[[], Iterable[tuple]]:
+    """Registra una funzione che produce (tipo, nome, etichette, valore) a ogni snapshot."""
+    _collectors.append(fn)
+    return fn
+
+
+def _process_snapshot() -> dict:
+    snap = _registry.snapshot()
+    for fn in _collectors:
+        try:
+            for kind, name, labels, value in fn():
+                target = "counters" if kind == COUNTER else "gauges"
+                snap[target].append([name, list(_labels(labels)), float(value)])
+        except Exception:
+            logger.warning("Metriche: collector %s fallito", getattr(fn, "__name__", fn), exc_info=True)
+    snap["pid"] = os.getpid()
+    snap["t"] = time.time()
+    return snap
+
+
+# ---------------------------
+# File per processo
+# ---------------------------
+
+def _write_json(path: Path, data: dict):
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.stem}-", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, separators=(",", ":"))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_snapshot(exiting: bool = False):
+    path = metrics_dir() / f"{os.getpid()}.json"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        snap = _process_snapshot()
+        snap["exited"] = exiting
+        _write_json(path, snap)
+    except Exception:
+        logger.warning("Metriche: snapshot non scritto (%s)", path, exc_info=True)
+
+
+_writer_lock = threading.Lock()
+_writer_pid: int | None = None
+
+
+def _writer():
+    while True:
+        time.sleep(float(getattr(settings, "METRICS_FLUSH_SECONDS", 5)))
+        write_snapshot()
+
+
+def ensure_started():
+    """Avvia (una volta per processo, anche dopo un fork) il thread che scrive lo snapshot."""
+    global _writer_pid
+    if _writer_pid == os.getpid():
+        return
+    with _writer_lock:
+        if _writer_pid == os.getpid():
+            return
+        _writer_pid = os.getpid()
+        threading.Thread(target=_writer, name="metrics-writer", daemon=True).start()
+        atexit.register(write_snapshot, exiting=True)
+
+
+# ---------------------------
+# Aggregazione fra processi
+# ---------------------------
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _add(into: dict, snap: dict, with_gauges: bool):
+    for name, labels, value in snap.get("counters", ()):
+        key = (name, tuple(map(tuple, labels)))
+        into["counters"][key] = into["counters"].get(key, 0.0) + value
+    for name, labels, buckets, total in snap.get("histograms", ()):
+        if len(buckets) != len(LATENCY_BUCKETS) + 1:
+            continue  # bucket di una versione precedente
+        key = (name, tuple(map(tuple, labels)))
+        h = into["histograms"].setdefault(key, [[0] * len(buckets), 0.0])
+        h[0] = [a + b for a, b in zip(h[0], buckets)]
+        h[1] += total
+    if with_gauges:
+        for name, labels, value in snap.get("gauges", ()):
+            key = (name, tuple(map(tuple, labels)))
+            into["gauges"][key] = into["gauges"].get(key, 0.0) + value
+
+
+def _to_snapshot(agg: dict) -> dict:
+    return {
+        "counters": [[n, [list(p) for p in l], v] for (n, l), v in agg["counters"].items()],
+        "histograms": [[n, [list(p) for p in l], h[0], h[1]] for (n, l), h in agg["histograms"].items()],
+    }
+
+
+def _read(path: Path) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def collect() -> dict:
+    """Somma gli snapshot di tutti i processi; archivia quelli di processi terminati."""
+    write_snapshot()
+    directory = metrics_dir()
+    agg = {"counters": {}, "gauges": {}, "histograms": {}}
+    stale_after = float(getattr(settings, "METRICS_STALE_SECONDS", 600))
+    now = time.time()
+    dead: list[tuple[Path, dict]] = []
+    workers = 0
+    for path in directory.glob("[0-9]*.json"):
+        snap = _read(path)
+        if snap is None:
+            continue
+        pid = int(snap.get("pid", 0))
+        if snap.get("exited") or not _alive(pid) or now - snap.get("t", 0) > stale_after:
+            dead.append((path, snap))
+            continue
+        workers += 1
+        _add(agg, snap, with_gauges=True)
+
+    archive_path = directory / "archive.json"
+    archived = {"counters": {}, "gauges": {}, "histograms": {}}
+    if not dead:
+        # archive.json si sostituisce atomicamente: si legge senza lock
+        _add(archived, _read(archive_path) or {}, with_gauges=False)
+    else:
+        with _archive_lock(directory):
+            _add(archived, _read(archive_path) or {}, with_gauges=False)
+            claimed = []
+            for path, _ in dead:
+                # rename = claim: un'altra scrape che l'ha già archiviato l'ha anche tolto
+                target = path.with_name(path.name + ".claimed")
+                try:
+                    path.rename(target)
+                except FileNotFoundError:
+                    continue
+                claimed.append(target)
+                _add(archived, _read(target) or {}, with_gauges=False)
+            if claimed:
+                _write_json(archive_path, _to_snapshot(archived))
+                for target in claimed:
+                    target.unlink(missing_ok=True)
+    _add(agg, _to_snapshot(archived), with_gauges=False)
+    agg["gauges"][("tixy_workers", ())] = float(workers)
+    return agg
+
+
+class _archive_lock:
+    """flock su METRICS_DIR/archive.lock (più worker possono servire /metrics insieme)."""
+
+    def __init__(self, directory: Path):
+        self.path = directory / "archive.lock"
+
+    def __enter__(self):
+        self.fh = open(self.path, "a")
+        if fcntl is not None:
+            fcntl.flock(self.fh.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.fh.fileno(), fcntl.LOCK_UN)
+        self.fh.close()
+
+
+# ---------------------------
+# Formato testo Prometheus
+# ---------------------------
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labels: Iterable[tuple], extra: tuple | None = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(agg: dict) -> str:
+    by_name: dict[str, list] = {}
+    for kind in ("counters", "gauges", "histograms"):
+        for (name, labels), value in agg[kind].items():
+            by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text = METRICS.get(name, (None, ""))
+        if kind is None:
+            kind = HISTOGRAM if isinstance(by_name[name][0][1], list) else GAUGE
+        lines.append(f"# HELP {name} {help_text}".rstrip())
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name[name]):
+            if kind != HISTOGRAM:
+                lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+                continue
+            buckets, total = value
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + (float("inf"),), buckets):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', le))} {cumulative}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(total)}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------
+# Middleware
+# ---------------------------
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "METRICS_ENABLED", True) or is_warmup(request):
+            return self.get_response(request)
+        ensure_started()
+        gauge_add("tixy_http_requests_in_flight", 1)
+        t0 = time.perf_counter()
+        status = "5xx"
+        try:
+            response = self.get_response(request)
+            status = f"{response.status_code // 100}xx"
+            return response
+        finally:
+            elapsed = time.perf_counter() - t0
+            gauge_add("tixy_http_requests_in_flight", -1)
+            match = getattr(request, "resolver_match", None)
+            view = (match.url_name or match.view_name) if match is not None else "unresolved"
+            inc("tixy_http_requests_total", view=view, method=request.method, status=status)
+            observe("tixy_http_request_duration_seconds", elapsed, view=view)
+
+
+# ---------------------------
+# Collector dei moduli esistenti
+# ---------------------------
+
+@collector
+def _backend_stats():
+    from .services import tixy_api
+
+    yield COUNTER, "tixy_backend_retries_total", {}, tixy_api.retry_stats["retries"]
+    yield COUNTER, "tixy_backend_retry_budget_exhausted_total", {}, tixy_api.retry_stats["budget_exhausted"]
+    for endpoint, stats in list(tixy_api.hedge_stats.items()):
+        for event, n in stats.items():
+            yield COUNTER, "tixy_backend_hedge_total", {"endpoint": endpoint, "event": event}, n
+    for pool in tixy_api.pool_stats():
+        for state in ("in_use", "idle", "max"):
+            yield GAUGE, "tixy_backend_pool_connections", {"host": pool["host"], "state": state}, pool[state]
+
+
+@collector
+def _load_stats():
+    from . import ratelimit, shedding, startup
+
+    stats = shedding.stats()
+    yield GAUGE, "tixy_shed_in_flight", {}, stats["inflight"]
+    for route, counters in stats["routes"].items():
+        for outcome in ("admitted", "queued", "shed"):
+            yield COUNTER, "tixy_shed_requests_total", {"route": route, "outcome": outcome}, counters.get(outcome, 0)
+    for name, counters in ratelimit.stats().items():
+        for result, n in counters.items():
+            yield COUNTER, "tixy_ratelimit_requests_total", {"name": name, "result": result}, n
+    yield GAUGE, "tixy_workers_ready", {}, 1 if startup.is_ready() else 0
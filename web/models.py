@@ -1,3 +1,63 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class Job(models.Model):
+    """
+    Operazione lenta verso il backend eseguita fuori dalla richiesta
+    (vedi web/jobs.py). `idempotency_key` evita doppioni da doppio submit.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "In coda"),
+        (RUNNING, "In esecuzione"),
+        (DONE, "Completato"),
+        (FAILED, "Fallito"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=50)
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(db_index=True)
+    # avanzamento (checkpoint fra i passi) e risultato finale
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["created_at"]
+
+    def __str__(self):
+        return f"{self.kind} {self.id} ({self.status})"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (self.DONE, self.FAILED)
+
+
+class Invalidation(models.Model):
+    """
+    Messaggio del bus di invalidazione (trasporto "db", vedi web/invalidation.py):
+    i worker di tutti i nodi leggono le righe nuove e scartano le copie in cache
+    con quei tag.
+    """
+
+    tags = models.JSONField(default=list)
+    origin = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.id}: {' '.join(self.tags)}"
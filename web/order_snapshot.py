@@ -0,0 +1,112 @@
+# web/order_snapshot.py
+# -----------------------------------------------------------------------------
+# Snapshot per-sessione dell'ordine nel flusso acquista -> pagamento ->
+# conferma -> riepilogo.
+# - In sessione solo pochi campi per ordine (id, qty, listing, importi del
+#   checkout e un riferimento casuale): stanno comodi anche nella sessione
+#   cookie (~4 KB), che altrimenti verrebbe scartata in silenzio.
+# - I campi da mostrare arrivano sempre da checkout/summary del backend; il
+#   summary resta nella cache server (ORDER_SNAPSHOT_CACHE_ALIAS) per
+#   ORDER_SNAPSHOT_TTL secondi, sotto una chiave che contiene il riferimento
+#   salvato in sessione: solo quella sessione la può rileggere.
+# - Dopo il pagamento il summary in cache viene scartato, così la conferma
+#   mostra lo stato aggiornato dal backend.
+# - Gli importi del checkout completano il summary solo dove mancano.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .services import tixy_api
+
+SESSION_KEY = "order_snapshots"
+MAX_ORDERS = 5
+ORDER_FIELDS = ("qty", "listing", "unit_price", "subtotal", "commission", "total")
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "ORDER_SNAPSHOT_TTL", 120))
+
+
+def _cache():
+    return caches[getattr(settings, "ORDER_SNAPSHOT_CACHE_ALIAS", "default")]
+
+
+def _summary_key(order_id, ref: str) -> str:
+    return f"order:summary:{order_id}:{ref}"
+
+
+def _store(request) -> dict:
+    return request.session.get(SESSION_KEY) or {}
+
+
+def _remember(request, order_id, fields: dict) -> dict:
+    """Aggiorna (o crea) la voce di sessione dell'ordine con i soli campi compatti."""
+    snaps = _store(request)
+    entry = snaps.get(str(order_id)) or {"ref": secrets.token_hex(8)}
+    entry.update({k: fields[k] for k in ORDER_FIELDS if fields.get(k) not in (None, "")})
+    entry["at"] = time.time()
+    snaps[str(order_id)] = entry
+    if len(snaps) > MAX_ORDERS:
+        # tiene solo gli ordini più recenti
+        for key in sorted(snaps, key=lambda k: snaps[k]["at"])[:-MAX_ORDERS]:
+            del snaps[key]
+    request.session[SESSION_KEY] = snaps
+    return entry
+
+
+def save(request, order: dict) -> dict:
+    """Memorizza `order` (dict di checkout/summary): campi compatti in sessione, summary in cache."""
+    entry = _remember(request, order["id"], order)
+    _cache().set(_summary_key(order["id"], entry["ref"]), order, _ttl())
+    return order
+
+
+def save_started(request, res: dict, *, listing: dict, qty: int, email: str | None, quote) -> dict:
+    """
+    Voce di sessione dalla risposta di checkout/start: qty, listing e importi
+    del checkout, che il summary del backend potrebbe non rimandare.
+    """
+    return _remember(request, (res or {})["id"], {
+        "qty": qty,
+        "listing": listing.get("id"),
+        "unit_price": str(quote.unit_price),
+        "subtotal": str(quote.subtotal),
+        "commission": str(quote.commission),
+        "total": str(quote.total),
+    })
+
+
+def mark_stale(request, order_id: int) -> None:
+    """Da rinfrescare alla prossima lettura (es. dopo il pagamento)."""
+    entry = _store(request).get(str(order_id))
+    if entry:
+        _cache().delete(_summary_key(order_id, entry["ref"]))
+
+
+def get_order(request, order_id: int, email: str | None = None) -> dict:
+    """
+    Ordine da checkout/summary (dalla cache se letto da poco in questa
+    sessione), completato con i campi del checkout che mancano. Ritorna un
+    dict che la view può modificare liberamente.
+    """
+    entry = _store(request).get(str(order_id))
+    order = _cache().get(_summary_key(order_id, entry["ref"])) if entry else None
+    if order is None:
+        order = tixy_api.checkout_summary(order_id, email=email) or {}
+        order.setdefault("id", order_id)
+        save(request, order)
+        entry = _store(request).get(str(order_id))
+    for k in ORDER_FIELDS:
+        if order.get(k) in (None, "") and entry.get(k) not in (None, ""):
+            order[k] = entry[k]
+    if order.get("total_price") in (None, "") and entry.get("total"):
+        order["total_price"] = entry["total"]
+    if email and not order.get("email"):
+        order["email"] = email
+    return order
@@ -0,0 +1,215 @@
+# web/pricing.py
+# -----------------------------------------------------------------------------
+# Calcolo prezzi del checkout (unica fonte per acquista / pagamento /
+# conferma / riepilogo ordine).
+# - quote(): subtotale, commissione, totale, cambio nominativo, totale finale.
+#   I valori del backend (preview / checkout summary) vincono se presenti,
+#   altrimenti si calcolano qui con la stessa configurazione fee inviata.
+# - quote_range(): tabella prezzi per un intervallo di quantità in un passaggio
+#   (cambio nominativo calcolato una volta sola).
+# - cached_preview(): preview del backend in cache per (listing, qty, fee)
+#   per PRICING_PREVIEW_TTL secondi (o finché listing:<id> non viene
+#   invalidato, vedi web.invalidation).
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.timezone import now as dj_now
+
+from . import invalidation, metrics
+from .services import tixy_api
+
+logger = logging.getLogger(__name__)
+
+CENT = Decimal("0.01")
+
+DEFAULT_FEE_PERCENT = Decimal("10.0")  # 10%
+DEFAULT_FEE_FLAT = None               # nessuna fee flat
+
+CHANGE_NAME_FEE = Decimal("3.50")
+CHANGE_NAME_MIN_NOTICE = timedelta(hours=24)
+
+
+def D(x, default="0.00") -> Decimal:
+    """Decimal safe: converte qualunque valore in Decimal, con fallback."""
+    try:
+        return Decimal(str(x))
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal(default)
+
+
+def _positive(value) -> Decimal | None:
+    d = D(value)
+    return d if d > 0 else None
+
+
+def calc_change_name_fee(starts_at_iso: str):
+    """
+    Ritorna (fee: Decimal, msg: str, required: bool)
+    REGOLA: €3,50 se mancano >= 24 ore all'evento; entro 24 ore = 0
+    """
+    starts = None
+    if starts_at_iso:
+        try:
+            starts = datetime.fromisoformat(starts_at_iso.replace("Z", "+00:00"))
+            if starts.tzinfo is None:
+                starts = starts.replace(tzinfo=dt_timezone.utc)
+        except ValueError:
+            starts = None
+
+    if not starts:
+        return Decimal("0.00"), "Cambio nominativo: data evento non disponibile.", False
+
+    if starts - dj_now() >= CHANGE_NAME_MIN_NOTICE:
+        return CHANGE_NAME_FEE, "Cambio nominativo previsto (+ € 3,50) oltre le 24 ore.", True
+    return Decimal("0.00"), "Entro 24 ore dall’evento il cambio nominativo non è richiesto.", False
+
+
+@dataclass(frozen=True)
+class FeeConfig:
+    percent: Decimal | None = DEFAULT_FEE_PERCENT
+    flat: Decimal | None = DEFAULT_FEE_FLAT
+
+    def key(self) -> str:
+        return f"{self.percent}:{self.flat}"
+
+    def commission(self, subtotal: Decimal) -> Decimal:
+        fee = Decimal("0")
+        if self.percent is not None:
+            fee += subtotal * self.percent / 100
+        if self.flat is not None:
+            fee += self.flat
+        return fee.quantize(CENT)
+
+    def payload(self) -> dict:
+        """Campi fee per checkout/start (stringhe, come si aspetta il serializer)."""
+        out = {}
+        if self.percent is not None:
+            out["fee_percent"] = str(self.percent)
+        if self.flat is not None:
+            out["fee_flat"] = str(self.flat)
+        return out
+
+
+DEFAULT_FEES = FeeConfig()
+
+
+@dataclass(frozen=True)
+class Quote:
+    qty: int
+    unit_price: Decimal
+    subtotal: Decimal
+    commission: Decimal
+    total: Decimal
+    change_fee: Decimal
+    change_msg: str
+    change_required: bool
+    final_total: Decimal
+
+    def as_dict(self) -> dict:
+        """Versione serializzabile (stringhe per i Decimal)."""
+        return {
+            "qty": self.qty,
+            "unit_price": str(self.unit_price),
+            "subtotal": str(self.subtotal),
+            "commission": str(self.commission),
+            "total": str(self.total),
+            "change_fee": str(self.change_fee),
+            "change_required": self.change_required,
+            "change_msg": self.change_msg,
+            "final_total": str(self.final_total),
+        }
+
+
+def quote(unit_price, qty: int, *, fees: FeeConfig = DEFAULT_FEES, starts_iso: str = "",
+          api: dict | None = None, change=None) -> Quote:
+    """
+    Prezzo per `qty` biglietti. `api` = risposta preview/summary del backend:
+    i suoi importi (se > 0) hanno la precedenza su quelli calcolati.
+    `change` = tupla già calcolata di calc_change_name_fee (per quote_range).
+    """
+    api = api or {}
+    qty = max(1, int(qty or 1))
+    unit = _positive(api.get("unit_price")) or D(unit_price)
+    subtotal = _positive(api.get("subtotal")) or (unit * qty).quantize(CENT)
+    commission = _positive(api.get("commission")) or fees.commission(subtotal)
+    total = (_positive(api.get("total")) or _positive(api.get("total_price"))
+             or (subtotal + commission).quantize(CENT))
+    change_fee, change_msg, change_required = change or calc_change_name_fee(starts_iso)
+    return Quote(
+        qty=qty, unit_price=unit, subtotal=subtotal, commission=commission, total=total,
+        change_fee=change_fee, change_msg=change_msg, change_required=change_required,
+        final_total=(total + change_fee).quantize(CENT),
+    )
+
+
+def quote_range(unit_price, qtys, *, fees: FeeConfig = DEFAULT_FEES, starts_iso: str = "") -> list[Quote]:
+    """Tabella prezzi locale per più quantità (stesse regole di quote())."""
+    change = calc_change_name_fee(starts_iso)
+    return [quote(unit_price, q, fees=fees, change=change) for q in qtys]
+
+
+# ---------------------------
+# Preview backend (cache)
+# ---------------------------
+
+def _cache():
+    return caches[getattr(settings, "PRICING_CACHE_ALIAS", "default")]
+
+
+def cached_preview(listing_id: int, qty: int, fees: FeeConfig = DEFAULT_FEES) -> dict:
+    """listings/<id>/preview/ in cache per (listing, qty, fee); {"error": ...} se fallisce."""
+    key = f"pricing:preview:v2:{listing_id}:{qty}:{fees.key()}"
+    cache = _cache()
+    entry = cache.get(key)
+    if entry is not None and not invalidation.stale([invalidation.listing(listing_id)], entry[0]):
+        metrics.cache_access("pricing", "hit")
+        return entry[1]
+    metrics.cache_access("pricing", "miss")
+    fetched = time.time()
+    try:
+        preview = tixy_api.listing_preview(
+            listing_id, qty,
+            float(fees.percent) if fees.percent is not None else None,
+            float(fees.flat) if fees.flat is not None else None,
+        ) or {}
+    except Exception as e:
+        # errori non in cache: al prossimo giro si ritenta
+        return {"error": str(e)}
+    cache.set(key, (fetched, preview), int(getattr(settings, "PRICING_PREVIEW_TTL", 30)))
+    return preview
+
+
+# ---------------------------
+# Ordini (checkout summary)
+# ---------------------------
+
+def order_starts_iso(order: dict) -> str:
+    perf = (order.get("listing_info") or {}).get("performance_info") or {}
+    return (
+        perf.get("starts_at_utc")
+        or perf.get("starts_at")
+        or (order.get("performance_info") or {}).get("starts_at_utc")
+        or ""
+    )
+
+
+def quote_order(order: dict, *, fees: FeeConfig = DEFAULT_FEES) -> Quote:
+    """Quote di un ordine a partire dalla risposta di checkout/summary."""
+    unit_price = order.get("unit_price") or (order.get("listing_info") or {}).get("price_each")
+    return quote(unit_price, order.get("qty") or 1, fees=fees,
+                 starts_iso=order_starts_iso(order), api=order)
+
+
+def apply_to_order(order: dict, q: Quote) -> dict:
+    """Scrive gli importi calcolati nel dict ordine usato dai template."""
+    order.update(q.as_dict())
+    return order
@@ -0,0 +1,368 @@
+# web/profiler.py
+# -----------------------------------------------------------------------------
+# Profiler a campionamento (opt-in) per capire dove passa il tempo di una
+# view: I/O verso il backend, decode JSON, parsing date, template, ...
+# - ProfilerMiddleware (primo della lista) profila una richiesta se:
+#     header PROFILER_HEADER con valore = PROFILER_HEADER_TOKEN, oppure
+#     view in PROFILER_URL_NAMES, oppure estrazione con PROFILER_SAMPLE_RATE.
+#   Con PROFILER_ENABLED=False non fa nulla.
+# - Un thread campiona ogni PROFILER_INTERVAL_MS lo stack dei thread che
+#   stanno servendo richieste profilate (sys._current_frames), tagliato al
+#   middleware: niente server WSGI né handler Django sopra.
+# - Gli stack si sommano per view (url_name) e ogni PROFILER_FLUSH_SECONDS
+#   finiscono come riga JSON in PROFILER_PATH (append, rotazione in .1 oltre
+#   PROFILER_MAX_BYTES), come il hit log.
+# - `manage.py profile_report` unisce le righe di una finestra temporale:
+#   report hotspot per view, export collapsed (flamegraph.pl / speedscope)
+#   o JSON speedscope.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_DEPTH = 200
+
+
+def log_path() -> Path:
+    return Path(getattr(settings, "PROFILER_PATH", Path(settings.BASE_DIR) / "var" / "profiles.jsonl"))
+
+
+def _interval() -> float:
+    return float(getattr(settings, "PROFILER_INTERVAL_MS", 5)) / 1000
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+# ---------------------------
+# Campionamento
+# ---------------------------
+
+class _Active:
+    """Richiesta profilata in corso: thread, frame radice e stack raccolti."""
+
+    __slots__ = ("thread_id", "root", "stacks", "samples")
+
+    def __init__(self, thread_id: int, root):
+        self.thread_id = thread_id
+        self.root = root
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+
+class _Sampler:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active: dict[int, _Active] = {}
+        self.wake = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.pid: int | None = None
+        self.ticks = 0
+        self.tick_time = 0.0
+
+    def start(self, root) -> _Active:
+        current = _Active(threading.get_ident(), root)
+        with self.lock:
+            self.active[current.thread_id] = current
+            if self.pid != os.getpid() or self.thread is None or not self.thread.is_alive():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self.thread.start()
+        self.wake.set()
+        return current
+
+    def stop(self, current: _Active):
+        """Dopo stop() il sampler non tocca più `current` (un giro in corso finisce prima)."""
+        with self.lock:
+            self.active.pop(current.thread_id, None)
+
+    def _run(self):
+        interval = _interval()
+        last = time.perf_counter()
+        while True:
+            with self.lock:
+                targets = list(self.active.values())
+                if not targets:
+                    # start() fa set() dopo aver rilasciato il lock: nessun risveglio perso
+                    self.wake.clear()
+            if not targets:
+                self.wake.wait()
+                last = time.perf_counter()
+                continue
+            frames = sys._current_frames()
+            taken = [(current, self._stack(frames[current.thread_id], current.root))
+                     for current in targets if current.thread_id in frames]
+            del frames
+            now = time.perf_counter()
+            with self.lock:
+                # solo le richieste ancora attive: stop() ha già consegnato le altre
+                for current, stack in taken:
+                    if self.active.get(current.thread_id) is current:
+                        current.stacks[stack] += 1
+                        current.samples += 1
+                self.ticks += 1
+                self.tick_time += now - last
+            last = now
+            time.sleep(interval)
+
+    @staticmethod
+    def _stack(frame, root) -> str:
+        labels = []
+        while frame is not None and len(labels) < MAX_DEPTH:
+            labels.append(frame_label(frame))
+            if frame is root:
+                break
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+    def mean_interval_ms(self) -> float:
+        with self.lock:
+            if not self.ticks:
+                return _interval() * 1000
+            return self.tick_time / self.ticks * 1000
+
+
+_sampler = _Sampler()
+
+
+# ---------------------------
+# Aggregazione per view + flush su file
+# ---------------------------
+
+class _Profiles:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views: dict[str, Counter] = defaultdict(Counter)
+        self.requests: Counter = Counter()
+        self.last_flush = time.time()
+
+    def add(self, view: str, stacks: Counter):
+        with self.lock:
+            self.views[view].update(stacks)
+            self.requests[view] += 1
+            due = time.time() - self.last_flush >= float(getattr(settings, "PROFILER_FLUSH_SECONDS", 60))
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            views, self.views = self.views, defaultdict(Counter)
+            requests, self.requests = self.requests, Counter()
+            self.last_flush = time.time()
+        if not views:
+            return
+        interval_ms = round(_sampler.mean_interval_ms(), 3)
+        lines = "".join(
+            json.dumps({
+                "t": int(time.time()),
+                "pid": os.getpid(),
+                "view": view,
+                "requests": requests[view],
+                "interval_ms": interval_ms,
+                "stacks": dict(stacks),
+            }, separators=(",", ":")) + "\n"
+            for view, stacks in views.items()
+        )
+        path = log_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists() and path.stat().st_size > int(getattr(settings, "PROFILER_MAX_BYTES", 50_000_000)):
+                os.replace(path, path.with_name(path.name + ".1"))
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write(lines)
+        except OSError:
+            logger.warning("Profili non scritti (%s)", path, exc_info=True)
+
+
+_profiles = _Profiles()
+atexit.register(_profiles.flush)
+
+
+def flush():
+    _profiles.flush()
+
+
+# ---------------------------
+# Middleware
+# ---------------------------
+
+class ProfilerMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _wanted(self, request) -> bool:
+        token = getattr(settings, "PROFILER_HEADER_TOKEN", "")
+        header = getattr(settings, "PROFILER_HEADER", "X-Tixy-Profile")
+        if token and request.headers.get(header) == token:
+            return True
+        rate = float(getattr(settings, "PROFILER_SAMPLE_RATE", 0.0))
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not getattr(settings, "PROFILER_ENABLED", False):
+            return self.get_response(request)
+        # URL allowlist: si decide prima della view, la url_name non c'è ancora
+        allow = getattr(settings, "PROFILER_URL_NAMES", ())
+        if not (self._wanted(request) or (allow and _url_name(request) in allow)):
+            return self.get_response(request)
+
+        current = _sampler.start(sys._getframe())
+        try:
+            response = self.get_response(request)
+        finally:
+            _sampler.stop(current)
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name or match.view_name) if match is not None else "unresolved"
+        if current.stacks:
+            _profiles.add(view or "unresolved", current.stacks)
+        response["X-Profile-Samples"] = str(current.samples)
+        return response
+
+
+def _url_name(request) -> str | None:
+    from django.urls import Resolver404, resolve
+
+    try:
+        return resolve(request.path_info).url_name
+    except Resolver404:
+        return None
+
+
+# ---------------------------
+# Lettura / export (manage.py profile_report)
+# ---------------------------
+
+def read(since: float, view: str | None = None) -> dict[str, dict]:
+    """{view: {"stacks": Counter, "requests": n, "interval_ms": media}} delle righe dopo `since`."""
+    out: dict[str, dict] = {}
+    path = log_path()
+    for p in (path.with_name(path.name + ".1"), path):
+        try:
+            fh = open(p, encoding="utf-8")
+        except FileNotFoundError:
+            continue
+        with fh:
+            for line in fh:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                if row.get("t", 0) < since or (view and row.get("view") != view):
+                    continue
+                agg = out.setdefault(row["view"], {"stacks": Counter(), "requests": 0, "ms": 0.0, "samples": 0})
+                stacks = row.get("stacks") or {}
+                n = sum(stacks.values())
+                agg["stacks"].update(stacks)
+                agg["requests"] += row.get("requests", 0)
+                agg["samples"] += n
+                agg["ms"] += n * float(row.get("interval_ms") or _interval() * 1000)
+    for agg in out.values():
+        agg["interval_ms"] = agg["ms"] / agg["samples"] if agg["samples"] else 0.0
+    return out
+
+
+# categorie del report: prima regola che corrisponde, dalla foglia verso la radice
+CATEGORIES = (
+    ("backend I/O", ("requests.", "urllib3.", "http.client:", "socket:", "ssl:", "concurrent.futures.",
+                     "web.services.tixy_api:_send")),
+    ("JSON", ("json:", "json.", "web.services.tixy_api:decode_json")),
+    ("date", ("_strptime:", "datetime:", "zoneinfo", "django.utils.dateparse:", "django.utils.timezone:",
+              "django.utils.dateformat:", "web.views:_fmt_iso", "web.views:_parse_iso", "web.views:_safe_dt",
+              "web.services.catalog:_parse_ts")),
+    ("template", ("django.template.",)),
+    ("database", ("django.db.", "sqlite3")),
+)
+
+
+def category(stack: str) -> str:
+    for label in reversed(stack.split(";")):
+        for name, prefixes in CATEGORIES:
+            if label.startswith(prefixes):
+                return name
+    return "altro"
+
+
+# frame presenti in quasi ogni stack: esclusi dalla classifica "total"
+_PLUMBING = ("web.profiler:", "django.core.handlers.", "django.utils.deprecation:", "django.middleware.",
+             "django.contrib.sessions.middleware:", "django.contrib.auth.middleware:")
+
+
+def hotspots(agg: dict, top: int = 15) -> dict:
+    """Frame con più campioni "self" (foglia) e "total" (presenti nello stack) + categorie."""
+    self_c: Counter = Counter()
+    total_c: Counter = Counter()
+    cats: Counter = Counter()
+    for stack, count in agg["stacks"].items():
+        frames = stack.split(";")
+        self_c[frames[-1]] += count
+        for label in set(frames):
+            if not (label.startswith(_PLUMBING) or label.endswith("Middleware.__call__")):
+                total_c[label] += count
+        cats[category(stack)] += count
+    return {
+        "self": self_c.most_common(top),
+        "total": total_c.most_common(top),
+        "categories": cats.most_common(),
+    }
+
+
+def collapsed_lines(profiles: dict[str, dict]) -> list[str]:
+    """Formato "collapsed" (flamegraph.pl, speedscope): view;frame;...;frame count."""
+    lines = []
+    for view, agg in sorted(profiles.items()):
+        for stack, count in agg["stacks"].most_common():
+            lines.append(f"{view};{stack} {count}")
+    return lines
+
+
+def speedscope(profiles: dict[str, dict], name: str = "tixy") -> dict:
+    """File JSON speedscope: un profilo "sampled" per view, pesi in millisecondi."""
+    frames: list[dict] = []
+    index: dict[str, int] = {}
+
+    def frame_id(label: str) -> int:
+        if label not in index:
+            index[label] = len(frames)
+            frames.append({"name": label})
+        return index[label]
+
+    out = []
+    for view, agg in sorted(profiles.items()):
+        samples, weights = [], []
+        for stack, count in agg["stacks"].most_common():
+            samples.append([frame_id(label) for label in stack.split(";")])
+            weights.append(round(count * agg["interval_ms"], 3))
+        out.append({
+            "type": "sampled",
+            "name": f"{view} ({agg['requests']} richieste)",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": round(sum(weights), 3),
+            "samples": samples,
+            "weights": weights,
+        })
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": out,
+        "name": name,
+        "activeProfileIndex": 0,
+        "exporter": "tixy manage.py profile_report",
+    }
@@ -0,0 +1,262 @@
+# web/ratelimit.py
+# -----------------------------------------------------------------------------
+# Rate limit (token bucket) per le view che moltiplicano le chiamate al
+# backend: ricerca, pagine evento, reinvio OTP, password dimenticata.
+# - Budget per route in RATE_LIMITS, es. {"ip": "60/m", "session": "30/m"}:
+#   "N/periodo" = fino a N richieste di fila, poi N per periodo (s, m, h, d,
+#   anche "10m"). Bucket per IP sempre; per sessione (o utente loggato) se
+#   la richiesta ne ha una.
+# - Stato condiviso nella cache RATE_LIMIT_CACHE_ALIAS (GCRA: un solo valore
+#   per bucket): la cache deve essere condivisa dai worker (default "sessions",
+#   file sul nodo o Redis); con una cache di processo i limiti valgono per worker.
+# - Percorso veloce in memoria: ogni processo prende in prestito dal bucket
+#   condiviso una scorta di token e, dopo un rifiuto, ricorda il client
+#   bloccato fino allo scadere di Retry-After. La scorta parte da 1 token e
+#   raddoppia (fino a RATE_LIMIT_LEASE della capacità) solo se il client la
+#   consuma prima che scada; i token avanzati si restituiscono al bucket e la
+#   scorta si dimezza. Un client che ruota sui worker paga quindi un token per
+#   richiesta, uno insistente su un worker quasi mai tocca la cache.
+# - Oltre il budget: 429 + Retry-After. Cache non raggiungibile = si lascia
+#   passare (il limite non deve diventare un punto di guasto).
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+
+from .warmup import is_warmup
+
+logger = logging.getLogger(__name__)
+
+SESSION_TOKEN_KEY = "api_access"  # = views.SESSION_TOKEN_KEY
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+_rate_re = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\s*$")
+
+
+@dataclass(frozen=True)
+class Budget:
+    capacity: int
+    period: float  # secondi per ricaricare `capacity` token
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.capacity
+
+    @classmethod
+    def parse(cls, rate: str) -> "Budget":
+        m = _rate_re.match(rate or "")
+        if not m or int(m.group(1)) <= 0:
+            raise ValueError(f"Rate limit non valido: {rate!r} (atteso es. '30/m', '5/10m')")
+        return cls(int(m.group(1)), int(m.group(2) or 1) * _UNITS[m.group(3)])
+
+
+@lru_cache(maxsize=256)
+def _parse(rate: str) -> Budget:
+    return Budget.parse(rate)
+
+
+def _budgets(name: str) -> dict[str, Budget]:
+    conf = getattr(settings, "RATE_LIMITS", {}).get(name) or {}
+    return {scope: _parse(rate) for scope, rate in conf.items()}
+
+
+# ---------------------------
+# Identità del client
+# ---------------------------
+
+def client_ip(request) -> str:
+    """
+    IP del client. Con RATE_LIMIT_PROXY_COUNT = n (proxy fidati davanti a
+    Django) si usa l'n-esimo indirizzo da destra di X-Forwarded-For.
+    """
+    proxies = int(getattr(settings, "RATE_LIMIT_PROXY_COUNT", 0))
+    if proxies > 0:
+        chain = [p.strip() for p in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if p.strip()]
+        if len(chain) >= proxies:
+            return chain[-proxies]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def _session_id(request) -> str | None:
+    session = getattr(request, "session", None)
+    token = session.get(SESSION_TOKEN_KEY) if session is not None else None
+    if token:
+        return "u:" + str(token)
+    cookie = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    return "s:" + cookie if cookie else None
+
+
+def _bucket_key(name: str, scope: str, ident: str) -> str:
+    return f"rl:{name}:{scope}:" + hashlib.blake2b(ident.encode("utf-8"), digest_size=12).hexdigest()
+
+
+# ---------------------------
+# Bucket
+# ---------------------------
+
+class _Local:
+    """Scorte in prestito e client bloccati, per processo (LRU limitato)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> [token, scadenza, bloccato_fino, dimensione scorta]
+        self.entries: OrderedDict[str, list] = OrderedDict()
+        self.counters: dict[str, Counter] = defaultdict(Counter)
+
+    def get(self, key: str) -> list:
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = [0, 0.0, 0.0, 1]
+            if len(self.entries) > int(getattr(settings, "RATE_LIMIT_LOCAL_MAX", 10000)):
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return entry
+
+
+_local = _Local()
+
+
+def _cache():
+    return caches[getattr(settings, "RATE_LIMIT_CACHE_ALIAS", "default")]
+
+
+def _take_shared(key: str, budget: Budget, n: int, now: float) -> float:
+    """GCRA sul bucket condiviso: prende n token; ritorna 0 oppure i secondi da attendere."""
+    cache = _cache()
+    tat = max(float(cache.get(key) or 0.0), now)
+    new_tat = tat + n * budget.interval
+    allowed_at = new_tat - budget.period
+    if allowed_at > now:
+        return allowed_at - now
+    # get + set non atomici: sotto concorrenza l'errore è al più una scorta per processo
+    cache.set(key, new_tat, int(budget.period) + 1)
+    return 0.0
+
+
+def _refund_shared(key: str, budget: Budget, n: int, now: float) -> None:
+    """Restituisce al bucket condiviso n token presi in prestito e non usati."""
+    cache = _cache()
+    tat = cache.get(key)
+    if tat is not None:
+        cache.set(key, max(now, float(tat) - n * budget.interval), int(budget.period) + 1)
+
+
+def _take(key: str, budget: Budget) -> float:
+    now = time.time()
+    with _local.lock:
+        entry = _local.get(key)
+        if entry[2] > now:
+            return entry[2] - now
+        if entry[0] > 0 and entry[1] > now:
+            entry[0] -= 1
+            return 0.0
+        unused = entry[0]
+        if unused:
+            # scorta scaduta con token avanzati: si restituiscono, la prossima è più piccola
+            lease = max(1, entry[3] // 2)
+        elif entry[1] > now:
+            # scorta finita prima di scadere: il client insiste su questo worker
+            max_lease = max(1, int(budget.capacity * float(getattr(settings, "RATE_LIMIT_LEASE", 0.1))))
+            lease = min(max_lease, entry[3] * 2)
+        else:
+            lease = entry[3]
+        entry[0], entry[3] = 0, lease
+    try:
+        if unused:
+            _refund_shared(key, budget, unused, now)
+        wait = _take_shared(key, budget, lease, now)
+        if wait and lease > 1:
+            lease = 1
+            wait = _take_shared(key, budget, 1, now)
+    except Exception:
+        logger.warning("Rate limit: cache non disponibile, richiesta lasciata passare", exc_info=True)
+        return 0.0
+    with _local.lock:
+        entry = _local.get(key)
+        if wait:
+            entry[2], entry[3] = now + wait, 1
+        else:
+            # la scorta scade col tempo che rappresenta (poi i token avanzati tornano al bucket)
+            entry[0], entry[1], entry[3] = lease - 1, now + lease * budget.interval, lease
+    return wait
+
+
+def check(request, name: str) -> float:
+    """0 se la richiesta rientra nei budget di `name`, altrimenti i secondi di Retry-After."""
+    budgets = _budgets(name)
+    idents = {"ip": client_ip(request), "session": _session_id(request)}
+    wait = 0.0
+    for scope, budget in budgets.items():
+        ident = idents.get(scope)
+        if ident:
+            wait = max(wait, _take(_bucket_key(name, scope, ident), budget))
+            if wait:
+                break
+    with _local.lock:
+        _local.counters[name]["limited" if wait else "allowed"] += 1
+    return wait
+
+
+def stats() -> dict:
+    with _local.lock:
+        return {name: dict(c) for name, c in _local.counters.items()}
+
+
+# ---------------------------
+# Risposta 429 / decorator
+# ---------------------------
+
+def too_many_requests(request, retry_after: float):
+    retry = max(1, int(retry_after + 0.999))
+    if "application/json" in request.headers.get("Accept", ""):
+        response = JsonResponse({"detail": "Troppe richieste.", "retry_after": retry}, status=429)
+    else:
+        html = render_to_string("web/degraded.html", {
+            "retry_after": retry,
+            "path": request.get_full_path(),
+            "title": "Troppe richieste",
+            "message": "Hai fatto troppe richieste in poco tempo.",
+            # dopo un POST il refresh ripeterebbe solo la GET: niente riprova automatica
+            "no_refresh": request.method not in ("GET", "HEAD"),
+        })
+        response = HttpResponse(html, status=429)
+    response["Retry-After"] = str(retry)
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+def rate_limit(name: str, *, methods=None, when=None):
+    """
+    Applica i budget RATE_LIMITS[name] alla view.
+    methods: solo questi metodi HTTP; when(request) -> bool: solo se vero
+    (es. il POST "reinvia codice" della pagina OTP).
+    """
+    def decorator(view):
+        @wraps(view)
+        def _wrapped(request, *args, **kwargs):
+            if (
+                getattr(settings, "RATE_LIMIT_ENABLED", True)
+                and not is_warmup(request)
+                and (methods is None or request.method in methods)
+                and (when is None or when(request))
+            ):
+                wait = check(request, name)
+                if wait:
+                    return too_many_requests(request, wait)
+            return view(request, *args, **kwargs)
+        return _wrapped
+    return decorator
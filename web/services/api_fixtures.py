@@ -0,0 +1,248 @@
+# web/services/api_fixtures.py
+# -----------------------------------------------------------------------------
+# Registrazione / replay delle chiamate al backend (trasporto di tixy_api).
+# - record(path): le richieste vanno al backend vero e le coppie
+#   richiesta/risposta finiscono in un file JSON compatto, ripulito da token,
+#   password e header non necessari.
+# - replay(path): nessuna rete; le risposte arrivano dal file (opzionalmente
+#   con la latenza registrata). Conta le chiamate per chiave: i test di
+#   regressione ci fanno le asserzioni.
+# - Chiave: "METODO path?query ordinata" (+ digest del body JSON per le
+#   scritture). Più risposte per la stessa chiave si servono in sequenza;
+#   finite quelle, si ripete l'ultima.
+# - shift_dates: in replay le date ISO dei body vengono spostate di un multiplo
+#   di 7 giorni (da recorded_at a oggi), così "prossimi eventi", weekend e
+#   calendario restano validi anche con fixture vecchie.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from django.conf import settings
+from requests.structures import CaseInsensitiveDict
+
+from . import tixy_api
+
+FORMAT_VERSION = 1
+REDACTED = "<redacted>"
+# campi sensibili nei body (richiesta e risposta)
+SENSITIVE_KEYS = frozenset({"access", "refresh", "token", "password", "new_password", "otp_code"})
+# header di risposta conservati (il body è salvato già decompresso)
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class UnrecordedRequest(requests.ConnectionError):
+    """Richiesta assente dalla fixture: per le view è come un backend irraggiungibile."""
+
+
+def _redact(obj):
+    if isinstance(obj, dict):
+        return {k: (REDACTED if k in SENSITIVE_KEYS and v else _redact(v)) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_redact(v) for v in obj]
+    return obj
+
+
+def request_key(method: str, url: str, params: dict | None = None, json_body=None) -> str:
+    """Chiave stabile di una richiesta (path relativo ad API_BASE_URL)."""
+    base_path = urlsplit(settings.API_BASE_URL.rstrip("/") + "/").path
+    parts = urlsplit(url)
+    path = parts.path[len(base_path):] if parts.path.startswith(base_path) else parts.path
+    query = [(k, v) for k, v in sorted((params or {}).items()) if v is not None]
+    key = f"{method.upper()} {path}"
+    if query:
+        key += "?" + urlencode(query, doseq=True)
+    if json_body and method.upper() not in tixy_api.IDEMPOTENT_METHODS:
+        raw = json.dumps(_redact(json_body), sort_keys=True, separators=(",", ":"), default=str)
+        key += "#" + hashlib.blake2b(raw.encode("utf-8"), digest_size=6).hexdigest()
+    return key
+
+
+def _key_from_kwargs(method: str, url: str, kwargs: dict) -> str:
+    return request_key(method, url, kwargs.get("params"), kwargs.get("json"))
+
+
+def clear_api_caches():
+    """Svuota le cache alimentate dal backend (API, ricerca, prezzi, frammenti)."""
+    from django.core.cache import caches
+
+    aliases = {getattr(settings, name, "default") for name in (
+        "API_CACHE_ALIAS", "SEARCH_CACHE_ALIAS", "PRICING_CACHE_ALIAS", "FRAGMENT_CACHE_ALIAS")}
+    for alias in aliases:
+        caches[alias].clear()
+
+
+# ---------------------------
+# Registrazione
+# ---------------------------
+
+class Recorder:
+    def __init__(self, transport):
+        self.transport = transport
+        self.entries: dict[str, list[dict]] = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, method: str, url: str, **kwargs) -> requests.Response:
+        t0 = time.perf_counter()
+        r = self.transport(method=method, url=url, **kwargs)
+        elapsed_ms = round((time.perf_counter() - t0) * 1000, 1)
+        if kwargs.get("stream"):
+            # download (PDF): non registrato, la risposta resta intatta
+            return r
+        ctype = r.headers.get("Content-Type", "")
+        if ctype.startswith("application/json") and r.content:
+            body = _redact(tixy_api.decode_json(r.content))
+        else:
+            body = r.text
+        entry = {
+            "status": r.status_code,
+            "headers": {h: r.headers[h] for h in KEPT_HEADERS if h in r.headers},
+            "body": body,
+            "ms": elapsed_ms,
+        }
+        with self.lock:
+            self.entries.setdefault(_key_from_kwargs(method, url, kwargs), []).append(entry)
+        return r
+
+    def dump(self, path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": FORMAT_VERSION,
+            "recorded_at": datetime.now(dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "entries": dict(sorted(self.entries.items())),
+        }
+        path.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":"), sort_keys=False) + "\n",
+                        encoding="utf-8")
+        return path
+
+
+@contextmanager
+def record(path):
+    """Registra tutte le chiamate del blocco nel file `path` (scritto all'uscita)."""
+    recorder = Recorder(tixy_api._transport)
+    previous = tixy_api.set_transport(recorder)
+    try:
+        yield recorder
+    finally:
+        tixy_api.set_transport(previous)
+        recorder.dump(path)
+
+
+# ---------------------------
+# Replay
+# ---------------------------
+
+def fixture_path(name: str) -> Path:
+    """web/api_fixtures/<name>.json (cartella da API_FIXTURES_DIR)."""
+    base = getattr(settings, "API_FIXTURES_DIR", Path(settings.BASE_DIR) / "web" / "api_fixtures")
+    return Path(base) / f"{name}.json"
+
+
+def _response(entry: dict, url: str) -> requests.Response:
+    r = requests.Response()
+    r.status_code = entry["status"]
+    r.url = url
+    r.headers = CaseInsensitiveDict(entry.get("headers") or {})
+    body = entry.get("body")
+    if isinstance(body, str) and not r.headers.get("Content-Type", "").startswith("application/json"):
+        r._content = body.encode("utf-8")
+    else:
+        r._content = json.dumps(body, separators=(",", ":")).encode("utf-8") if body is not None else b""
+    r.encoding = "utf-8"
+    return r
+
+
+_ISO_RE = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?$")
+
+
+def _shift(obj, delta: timedelta):
+    if isinstance(obj, dict):
+        return {k: _shift(v, delta) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_shift(v, delta) for v in obj]
+    if isinstance(obj, str) and _ISO_RE.match(obj):
+        try:
+            dt = datetime.fromisoformat(obj.replace("Z", "+00:00"))
+        except ValueError:
+            return obj
+        out = (dt + delta).isoformat()
+        return out.replace("+00:00", "Z") if obj.endswith("Z") else out
+    return obj
+
+
+def _week_delta(recorded_at: str | None) -> timedelta:
+    if not recorded_at:
+        return timedelta(0)
+    recorded = datetime.fromisoformat(recorded_at.replace("Z", "+00:00"))
+    weeks = (datetime.now(dt_timezone.utc) - recorded).days // 7
+    return timedelta(weeks=max(0, weeks))
+
+
+class Replayer:
+    def __init__(self, entries: dict[str, list[dict]], latency: float = 0.0):
+        self.entries = entries
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.missing: list[str] = []
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, latency: float = 0.0, shift_dates: bool = True) -> "Replayer":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Fixture {path}: versione {data.get('version')!r} non supportata")
+        entries = data.get("entries") or {}
+        delta = _week_delta(data.get("recorded_at")) if shift_dates else timedelta(0)
+        if delta:
+            entries = {k: [{**e, "body": _shift(e.get("body"), delta)} for e in seq] for k, seq in entries.items()}
+        return cls(entries, latency=latency)
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
+            self.missing.clear()
+
+    def __call__(self, method: str, url: str, **kwargs) -> requests.Response:
+        key = _key_from_kwargs(method, url, kwargs)
+        with self.lock:
+            seq = self.entries.get(key)
+            n = self.calls[key]
+            self.calls[key] += 1
+            if not seq:
+                self.missing.append(key)
+        if not seq:
+            raise UnrecordedRequest(f"Richiesta non registrata: {key}")
+        entry = seq[min(n, len(seq) - 1)]
+        if self.latency:
+            time.sleep(entry.get("ms", 0) / 1000 * self.latency)
+        return _response(entry, url)
+
+
+@contextmanager
+def replay(path, latency: float = 0.0, shift_dates: bool = True):
+    """
+    Serve le chiamate del blocco dalla fixture `path`.
+    latency: fattore sulla latenza registrata (0 = nessuna attesa, 1 = reale).
+    """
+    replayer = Replayer.load(path, latency=latency, shift_dates=shift_dates)
+    previous = tixy_api.set_transport(replayer)
+    try:
+        yield replayer
+    finally:
+        tixy_api.set_transport(previous)
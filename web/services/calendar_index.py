@@ -0,0 +1,119 @@
+# web/services/calendar_index.py
+# -----------------------------------------------------------------------------
+# Indice a bucket per data delle performance future (snapshot catalogo).
+# - Bucket giorno / settimana ISO / mese sulla data locale (TIME_ZONE).
+# - "Questo mese", "questo weekend", un giorno preciso: lookup O(bucket)
+#   invece della scansione lineare della lista.
+# - Ricostruito a ogni nuovo snapshot (catalog.on_refresh); usato da home,
+#   search (filtro solo-data) e dall'endpoint JSON del calendario.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.utils.timezone import localtime
+
+from . import catalog
+
+# intervallo massimo per range() (l'endpoint JSON è pubblico)
+MAX_RANGE_DAYS = 92
+
+
+def local_date(ts: float) -> date:
+    return localtime(datetime.fromtimestamp(ts, tz=dt_timezone.utc)).date()
+
+
+class CalendarIndex:
+    def __init__(self, rows, version: str = ""):
+        self.version = version
+        self.rows = tuple(rows)  # già ordinate per starts_ts (vedi build_snapshot)
+        self._ts = [r["starts_ts"] for r in self.rows]
+        self._days: dict[date, list] = defaultdict(list)
+        self._weeks: dict[tuple, list] = defaultdict(list)
+        self._months: dict[tuple, list] = defaultdict(list)
+        for r in self.rows:
+            d = local_date(r["starts_ts"])
+            self._days[d].append(r)
+            self._weeks[d.isocalendar()[:2]].append(r)
+            self._months[(d.year, d.month)].append(r)
+
+    # --- bucket ---
+    def day(self, d: date) -> list:
+        return self._days.get(d, [])
+
+    def week(self, d: date) -> list:
+        return self._weeks.get(d.isocalendar()[:2], [])
+
+    def month(self, d: date) -> list:
+        return self._months.get((d.year, d.month), [])
+
+    def weekend(self, d: date) -> list:
+        """Sabato + domenica del weekend corrente (o del prossimo, da lun a ven)."""
+        if d.weekday() == 6:
+            return self.day(d)
+        sat = d + timedelta(days=5 - d.weekday())
+        return self.day(sat) + self.day(sat + timedelta(days=1))
+
+    def range(self, start: date, end: date) -> list:
+        days = min((end - start).days, MAX_RANGE_DAYS)
+        out = []
+        for i in range(days + 1):
+            out.extend(self._days.get(start + timedelta(days=i), ()))
+        return out
+
+    def upcoming(self, n: int, now_ts: float | None = None) -> list:
+        i = bisect_left(self._ts, time.time() if now_ts is None else now_ts)
+        return list(self.rows[i:i + n])
+
+    def day_counts(self, start: date, end: date) -> dict[date, int]:
+        days = min((end - start).days, MAX_RANGE_DAYS)
+        out = {}
+        for i in range(days + 1):
+            d = start + timedelta(days=i)
+            if d in self._days:
+                out[d] = len(self._days[d])
+        return out
+
+
+def scope_bounds(scope: str, d: date) -> tuple[date, date]:
+    """Primo e ultimo giorno del bucket `scope` che contiene `d`."""
+    if scope == "week":
+        start = d - timedelta(days=d.weekday())
+        return start, start + timedelta(days=6)
+    if scope == "weekend":
+        if d.weekday() == 6:
+            return d, d
+        sat = d + timedelta(days=5 - d.weekday())
+        return sat, sat + timedelta(days=1)
+    if scope == "month":
+        start = d.replace(day=1)
+        nxt = (start + timedelta(days=32)).replace(day=1)
+        return start, nxt - timedelta(days=1)
+    return d, d
+
+
+def future(rows, now_ts: float | None = None) -> list:
+    """Scarta le righe già iniziate dopo la costruzione dello snapshot."""
+    now_ts = time.time() if now_ts is None else now_ts
+    return [r for r in rows if r["starts_ts"] >= now_ts]
+
+
+_index: CalendarIndex | None = None
+
+
+@catalog.on_refresh
+def _rebuild(snapshot: catalog.CatalogSnapshot) -> None:
+    global _index
+    if _index is not None and _index.version == snapshot.version:
+        return
+    _index = CalendarIndex(snapshot.performances, version=snapshot.version)
+
+
+def get_index() -> CalendarIndex | None:
+    """Indice corrente (None a freddo, finché il primo snapshot non è pronto)."""
+    catalog.get_snapshot()
+    return _index
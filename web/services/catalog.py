@@ -0,0 +1,231 @@
+# web/services/catalog.py
+# -----------------------------------------------------------------------------
+# Snapshot in-process del catalogo (performance future).
+# - Costruito da search/performances/ (tutte le pagine, ordinate per data).
+# - Aggiornato in background ogni CATALOG_REFRESH_INTERVAL secondi: le view
+#   leggono sempre lo snapshot corrente (anche se un po' vecchio) senza
+#   attendere il backend; al primo accesso (cold start) ritorna None.
+# - Gli indici derivati (autocomplete, calendario, ...) si registrano con
+#   on_refresh() e vengono ricostruiti a ogni nuovo snapshot.
+# - Con CATALOG_STORE_ENABLED lo snapshot è persistito su disco
+#   (web.services.catalog_store): al primo accesso un worker mappa il file
+#   esistente (anche vecchio) invece di aspettare il backend, e il refresh
+#   lo fa un solo worker per nodo; gli altri ricaricano il file scritto.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone as dt_timezone
+from typing import Callable
+
+from django.conf import settings
+
+from . import catalog_store, tixy_api
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: str
+    built_at: float
+    # righe compatte: id, event_id, name, venue, city, starts_iso, starts_ts, prezzo_min
+    # + raw (riga API originale, per le view che la rendono così com'è)
+    performances: tuple = field(default_factory=tuple)
+
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+
+_lock = threading.Lock()
+_snapshot: CatalogSnapshot | None = None
+_refreshing = False
+_file_id: tuple | None = None  # file dello store da cui viene lo snapshot corrente
+_listeners: list[Callable[[CatalogSnapshot], None]] = []
+
+
+def _interval() -> int:
+    return int(getattr(settings, "CATALOG_REFRESH_INTERVAL", 300))
+
+
+def _parse_ts(iso: str) -> float | None:
+    if not iso:
+        return None
+    try:
+        dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=dt_timezone.utc)
+    return dt.timestamp()
+
+
+def normalize_row(p: dict) -> dict | None:
+    """Riga API -> riga compatta dello snapshot (None se inutilizzabile)."""
+    if not isinstance(p, dict):
+        return None
+    pi = p.get("performance_info") or {}
+    pid = p.get("id") or pi.get("id")
+    iso = p.get("starts_at_utc") or pi.get("starts_at_utc") or p.get("starts_at") or ""
+    ts = _parse_ts(iso)
+    if not pid or ts is None:
+        return None
+    return {
+        "id": int(pid),
+        "event_id": p.get("evento") or p.get("event") or p.get("evento_id") or pi.get("evento"),
+        "name": (p.get("evento_nome") or pi.get("evento_nome") or "").strip(),
+        "venue": (p.get("luogo_nome") or pi.get("luogo_nome") or "").strip(),
+        "city": (p.get("citta") or p.get("city") or pi.get("citta") or "").strip(),
+        "starts_iso": iso,
+        "starts_ts": ts,
+        "prezzo_min": p.get("prezzo_min"),
+        "raw": p,
+    }
+
+
+def build_snapshot(rows) -> CatalogSnapshot:
+    now_ts = time.time()
+    perfs = []
+    seen = set()
+    for p in rows:
+        row = normalize_row(p)
+        if not row or row["id"] in seen or row["starts_ts"] < now_ts:
+            continue
+        seen.add(row["id"])
+        perfs.append(row)
+    perfs.sort(key=lambda r: r["starts_ts"])
+    raw = json.dumps(perfs, sort_keys=True, default=str).encode("utf-8")
+    version = hashlib.blake2b(raw, digest_size=8).hexdigest()
+    return CatalogSnapshot(version=version, built_at=now_ts, performances=tuple(perfs))
+
+
+def _fetch_rows() -> list:
+    page_size = int(getattr(settings, "CATALOG_PAGE_SIZE", 200))
+    max_pages = int(getattr(settings, "CATALOG_MAX_PAGES", 50))
+    rows = []
+    for page in range(1, max_pages + 1):
+        data = tixy_api.search_performances(ordering="starts_at_utc", page=page, page_size=page_size) or {}
+        chunk = data.get("results", data if isinstance(data, list) else []) or []
+        rows.extend(chunk)
+        if not chunk or not isinstance(data, dict) or not data.get("next"):
+            break
+    return rows
+
+
+def install(snapshot: CatalogSnapshot) -> CatalogSnapshot:
+    """Rende `snapshot` quello corrente e notifica gli indici registrati."""
+    global _snapshot
+    with _lock:
+        _snapshot = snapshot
+        listeners = list(_listeners)
+    for cb in listeners:
+        try:
+            cb(snapshot)
+        except Exception:
+            logger.exception("Indice catalogo non ricostruito (%s)", getattr(cb, "__name__", cb))
+    return snapshot
+
+
+def _install_built(snap: CatalogSnapshot) -> CatalogSnapshot:
+    # snapshot invariato: teniamo gli indici ma aggiorniamo l'età
+    current = _snapshot
+    if current is not None and current.version == snap.version:
+        return install(CatalogSnapshot(current.version, snap.built_at, current.performances))
+    return install(snap)
+
+
+def load_persisted(max_age: float | None = None) -> CatalogSnapshot | None:
+    """
+    Installa lo snapshot su disco se è più recente di quello corrente
+    (e, con max_age, non più vecchio di max_age secondi). None se non c'è.
+    """
+    global _file_id
+    head = catalog_store.peek()
+    if head is None:
+        return None
+    version, built_at, fid = head
+    if max_age is not None and time.time() - built_at > max_age:
+        return None
+    current = _snapshot
+    if fid == _file_id and current is not None:
+        return current
+    if current is not None and current.built_at >= built_at:
+        return None
+    if current is not None and current.version == version:
+        _file_id = fid
+        return install(CatalogSnapshot(version, built_at, current.performances))
+    try:
+        snap, fid = catalog_store.load()
+    except (catalog_store.StoreError, OSError, ValueError):
+        logger.warning("Snapshot catalogo su disco non leggibile", exc_info=True)
+        return None
+    _file_id = fid
+    return install(snap)
+
+
+def _refresh_from_backend() -> CatalogSnapshot:
+    snap = build_snapshot(_fetch_rows())
+    if not catalog_store.enabled():
+        return _install_built(snap)
+    try:
+        catalog_store.write(snap)
+    except OSError:
+        logger.warning("Snapshot catalogo non salvato su disco", exc_info=True)
+        return _install_built(snap)
+    # anche questo worker legge dal file mappato (righe raw fuori dall'heap)
+    return load_persisted() or _install_built(snap)
+
+
+def refresh() -> CatalogSnapshot | None:
+    """Ricostruisce lo snapshot dal backend (sincrono). Ritorna None se fallisce."""
+    global _refreshing
+    try:
+        if not catalog_store.enabled():
+            return _refresh_from_backend()
+        with catalog_store.refresh_lock():
+            # mentre aspettavamo il lock un altro worker può averlo già scritto
+            return load_persisted(max_age=_interval()) or _refresh_from_backend()
+    except Exception:
+        logger.exception("Refresh catalogo fallito")
+        return None
+    finally:
+        with _lock:
+            _refreshing = False
+
+
+def _schedule_refresh():
+    global _refreshing
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+    if getattr(settings, "CATALOG_BACKGROUND_REFRESH", True):
+        threading.Thread(target=refresh, name="catalog-refresh", daemon=True).start()
+    else:
+        refresh()
+
+
+def get_snapshot() -> CatalogSnapshot | None:
+    """Snapshot corrente (anche scaduto); se manca o è vecchio avvia un refresh."""
+    snap = _snapshot
+    if snap is None and catalog_store.enabled():
+        snap = load_persisted()
+    if snap is None or snap.age() > _interval():
+        _schedule_refresh()
+    return _snapshot
+
+
+def on_refresh(callback: Callable[[CatalogSnapshot], None]) -> Callable[[CatalogSnapshot], None]:
+    """Registra un indice derivato; se c'è già uno snapshot viene costruito subito."""
+    with _lock:
+        _listeners.append(callback)
+        snap = _snapshot
+    if snap is not None:
+        callback(snap)
+    return callback
@@ -0,0 +1,199 @@
+# web/services/catalog_store.py
+# -----------------------------------------------------------------------------
+# Snapshot catalogo persistito su disco, condiviso dai worker del nodo.
+# - Un file binario (CATALOG_STORE_DIR/catalog.bin):
+#     header   -> magic, FORMAT, numero righe, built_at, versione snapshot
+#     indice   -> una voce a dimensione fissa per riga: id, starts_ts e
+#                 offset/lunghezza della riga compatta e della riga API (raw)
+#     dati     -> JSON della riga compatta + JSON della riga raw
+# - Scrittura atomica: file temporaneo + fsync + os.replace. Chi ha già
+#   mappato il file vecchio continua a leggerlo (stesso inode) finché non
+#   carica il nuovo.
+# - Lettura via mmap: le righe compatte vengono decodificate al caricamento,
+#   la riga raw (la parte grossa) resta nelle pagine condivise del page cache
+#   e si decodifica solo quando una view la usa (row["raw"]).
+# - Un solo worker alla volta aggiorna dal backend (flock su catalog.lock);
+#   gli altri aspettano e ricaricano il file scritto.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+from . import tixy_api
+
+try:
+    import fcntl
+except ImportError:  # non POSIX: ogni worker aggiorna da sé
+    fcntl = None
+
+MAGIC = b"TXCS"
+FORMAT = 1
+# magic, formato, righe, built_at, lunghezza e testo della versione (hex ascii)
+_HEADER = struct.Struct("<4sHxxIdB16s")
+# id, starts_ts, offset riga, lunghezza riga, offset raw, lunghezza raw
+_ENTRY = struct.Struct("<qdQIQI")
+
+COMPACT_FIELDS = ("id", "event_id", "name", "venue", "city", "starts_iso", "starts_ts", "prezzo_min")
+
+
+class StoreError(Exception):
+    """File snapshot assente, troncato o di un formato diverso."""
+
+
+def store_dir() -> Path:
+    return Path(getattr(settings, "CATALOG_STORE_DIR", Path(settings.BASE_DIR) / "var" / "catalog"))
+
+
+def store_path() -> Path:
+    return store_dir() / "catalog.bin"
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "CATALOG_STORE_ENABLED", True))
+
+
+# ---------------------------
+# Righe
+# ---------------------------
+
+class MappedRow(dict):
+    """
+    Riga compatta dello snapshot; "raw" viene letto dal file mappato a ogni
+    accesso con row["raw"] (non è una chiave del dict: row.get("raw") è None).
+    """
+
+    __slots__ = ("_mm", "_raw_at")
+
+    def __missing__(self, key):
+        if key != "raw":
+            raise KeyError(key)
+        off, length = self._raw_at
+        return tixy_api.decode_json(self._mm[off:off + length])
+
+
+def _encode(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), default=str).encode("utf-8")
+
+
+# ---------------------------
+# Scrittura / lettura
+# ---------------------------
+
+def write(snapshot) -> Path:
+    """Serializza `snapshot` (CatalogSnapshot) e sostituisce il file in modo atomico."""
+    rows = snapshot.performances
+    entries = []
+    blobs = []
+    pos = _HEADER.size + _ENTRY.size * len(rows)
+    for r in rows:
+        compact = _encode({k: r[k] for k in COMPACT_FIELDS})
+        raw = _encode(r["raw"])
+        entries.append(_ENTRY.pack(r["id"], r["starts_ts"], pos, len(compact), pos + len(compact), len(raw)))
+        blobs.append(compact)
+        blobs.append(raw)
+        pos += len(compact) + len(raw)
+
+    version = snapshot.version.encode("ascii")[:16]
+    header = _HEADER.pack(MAGIC, FORMAT, len(rows), snapshot.built_at, len(version), version)
+
+    path = store_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".catalog-", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(header)
+            fh.writelines(entries)
+            fh.writelines(blobs)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+def peek() -> tuple[str, float, tuple] | None:
+    """(versione, built_at, file_id) leggendo solo l'header; None se manca o non è valido."""
+    path = store_path()
+    try:
+        with open(path, "rb") as fh:
+            st = os.fstat(fh.fileno())
+            head = fh.read(_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(head) < _HEADER.size:
+        return None
+    magic, fmt, _, built_at, vlen, version = _HEADER.unpack(head)
+    if magic != MAGIC or fmt != FORMAT:
+        return None
+    return version[:vlen].decode("ascii"), built_at, (st.st_ino, st.st_mtime_ns)
+
+
+def load():
+    """
+    Mappa il file corrente e ritorna (CatalogSnapshot, file_id).
+    Solleva StoreError se il file non c'è o non è leggibile.
+    """
+    from .catalog import CatalogSnapshot
+
+    path = store_path()
+    try:
+        with open(path, "rb") as fh:
+            st = os.fstat(fh.fileno())
+            if st.st_size < _HEADER.size:
+                raise StoreError(f"{path}: file troncato")
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError as e:
+        raise StoreError(f"{path}: assente") from e
+
+    magic, fmt, count, built_at, vlen, version = _HEADER.unpack_from(mm, 0)
+    if magic != MAGIC or fmt != FORMAT:
+        raise StoreError(f"{path}: formato {magic!r}/{fmt} non supportato")
+    if _HEADER.size + _ENTRY.size * count > len(mm):
+        raise StoreError(f"{path}: indice troncato")
+
+    decode = tixy_api.decode_json
+    rows = []
+    for i in range(count):
+        _, _, off, length, raw_off, raw_len = _ENTRY.unpack_from(mm, _HEADER.size + i * _ENTRY.size)
+        if raw_off + raw_len > len(mm):
+            raise StoreError(f"{path}: riga {i} troncata")
+        row = MappedRow(decode(mm[off:off + length]))
+        row._mm = mm
+        row._raw_at = (raw_off, raw_len)
+        rows.append(row)
+
+    snap = CatalogSnapshot(
+        version=version[:vlen].decode("ascii"),
+        built_at=built_at,
+        performances=tuple(rows),
+    )
+    return snap, (st.st_ino, st.st_mtime_ns)
+
+
+@contextmanager
+def refresh_lock():
+    """Lock esclusivo tra i processi del nodo (bloccante) per l'aggiornamento dal backend."""
+    path = store_dir() / "catalog.lock"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,300 @@
+# web/services/search_cache.py
+# -----------------------------------------------------------------------------
+# Cache delle pagine risultato di /search.
+# - SearchQuery.from_params(): forma canonica della ricerca (alias dei
+#   parametri, maiuscole, spazi, accenti, formati data) così che query
+#   equivalenti condividano la stessa voce di cache. Al backend va però il
+#   testo dell'utente (solo ripulito dagli spazi): "Måneskin" resta Måneskin.
+# - get_results(): pagina risultato in cache per SEARCH_CACHE_TTL secondi.
+# - Query popolari: contatore in-process (con decadimento); le prime pagine
+#   delle più cercate restano in cache SEARCH_POPULAR_TTL secondi e vengono
+#   ricalcolate a ogni refresh dello snapshot catalogo (pre-warm, in un
+#   thread a parte: mai nella richiesta che ha installato lo snapshot).
+# - Ricerca per sola data: servita dall'indice calendario, senza backend.
+# - Le pagine in cache portano i tag perf:<id> delle righe: un'invalidazione
+#   (web.invalidation) di una di quelle performance le fa ricalcolare.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field, fields, replace
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.timezone import localdate
+
+from .. import invalidation, metrics
+from . import calendar_index, catalog, tixy_api
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "search:v1:"
+
+Q_ALIASES = ("q", "query", "term")
+DATE_ALIASES = ("date", "data")
+CITY_ALIASES = ("localita", "city", "location")
+
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%Y/%m/%d")
+_DATE_WORDS = {"oggi": 0, "today": 0, "domani": 1, "tomorrow": 1, "dopodomani": 2}
+
+_spaces = re.compile(r"\s+")
+
+
+def _cache():
+    return caches[getattr(settings, "SEARCH_CACHE_ALIAS", "default")]
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "SEARCH_CACHE_TTL", 60))
+
+
+def _popular_ttl() -> int:
+    return int(getattr(settings, "SEARCH_POPULAR_TTL", 300))
+
+
+# ---------------------------
+# Normalizzazione
+# ---------------------------
+
+def clean_text(value: str | None) -> str:
+    """Testo dell'utente con gli spazi compattati (quello che va al backend)."""
+    return _spaces.sub(" ", (value or "").strip())
+
+
+def normalize_text(value: str | None) -> str:
+    """Minuscolo, spazi compattati; accenti rimossi se SEARCH_FOLD_ACCENTS."""
+    s = clean_text(value).lower()
+    if s and getattr(settings, "SEARCH_FOLD_ACCENTS", True):
+        s = unicodedata.normalize("NFKD", s)
+        s = "".join(c for c in s if not unicodedata.combining(c))
+    return s
+
+
+def normalize_date(value: str | None) -> str:
+    """Date in vari formati (gg/mm/aaaa, "oggi", ...) -> ISO aaaa-mm-gg."""
+    s = (value or "").strip().lower()
+    if not s:
+        return ""
+    if s in _DATE_WORDS:
+        return (localdate() + timedelta(days=_DATE_WORDS[s])).isoformat()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date().isoformat()
+        except ValueError:
+            continue
+    # formato sconosciuto: lo passiamo al backend così com'è
+    return s
+
+
+def _first(params, names) -> str:
+    for n in names:
+        v = params.get(n)
+        if v:
+            return v
+    return ""
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    q: str = ""
+    date: str = ""
+    city: str = ""
+    page: int = 1
+    ordering: str = ""
+    # testo originale per il backend: fuori da uguaglianza e chiave di cache
+    q_text: str = field(default="", compare=False)
+    city_text: str = field(default="", compare=False)
+
+    @classmethod
+    def from_params(cls, params) -> "SearchQuery":
+        try:
+            page = max(1, int(params.get("page") or 1))
+        except (TypeError, ValueError):
+            page = 1
+        q = _first(params, Q_ALIASES)
+        city = _first(params, CITY_ALIASES)
+        return cls(
+            q=normalize_text(q),
+            date=normalize_date(_first(params, DATE_ALIASES)),
+            city=normalize_text(city),
+            page=page,
+            ordering=(params.get("ordering") or "").strip(),
+            q_text=clean_text(q),
+            city_text=clean_text(city),
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.q or self.date or self.city)
+
+    @property
+    def first_page(self) -> "SearchQuery":
+        return replace(self, page=1)
+
+    def cache_key(self) -> str:
+        raw = json.dumps({f.name: getattr(self, f.name) for f in fields(self) if f.compare}, sort_keys=True)
+        return KEY_PREFIX + hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+    def api_kwargs(self) -> dict:
+        return {
+            "q": (self.q_text or self.q) or None,
+            "date": self.date or None,
+            "city": (self.city_text or self.city) or None,
+            "page": self.page if self.page > 1 else None,
+            "ordering": self.ordering or None,
+        }
+
+
+# ---------------------------
+# Pagine risultato
+# ---------------------------
+
+def _fetch(query: SearchQuery) -> dict:
+    fetched = time.time()
+    data = tixy_api.search_performances(**query.api_kwargs())
+    results = data.get("results", data if isinstance(data, list) else []) if data else []
+    page = {
+        "results": results,
+        "count": (data.get("count") if isinstance(data, dict) else len(results)) if data else 0,
+        "next": data.get("next") if isinstance(data, dict) else None,
+        "previous": data.get("previous") if isinstance(data, dict) else None,
+    }
+    raw = json.dumps(page, sort_keys=True, default=str).encode("utf-8")
+    page["version"] = hashlib.blake2b(raw, digest_size=10).hexdigest()
+    page["fetched"] = fetched
+    page["tags"] = sorted({f"perf:{r['id']}" for r in results if isinstance(r, dict) and r.get("id")})
+    return page
+
+
+def _local_page(query: SearchQuery) -> dict | None:
+    """Filtro solo-data (futura, prima pagina): bucket giorno dell'indice calendario."""
+    if query.q or query.city or query.ordering or query.page > 1:
+        return None
+    try:
+        day = date.fromisoformat(query.date)
+    except ValueError:
+        return None
+    if day < localdate():
+        return None
+    cal = calendar_index.get_index()
+    if cal is None:
+        return None
+    rows = [r["raw"] for r in calendar_index.future(cal.day(day))]
+    return {"results": rows, "count": len(rows), "next": None, "previous": None,
+            "version": f"cal:{cal.version}:{day.isoformat()}"}
+
+
+def _store(query: SearchQuery, page: dict) -> None:
+    ttl = _popular_ttl() if query.page == 1 and is_popular(query) else _ttl()
+    _cache().set(query.cache_key(), page, ttl)
+
+
+def get_results(query: SearchQuery) -> dict:
+    """Pagina risultato {results, count, next, previous, version} (da cache se c'è)."""
+    track(query)
+    catalog.get_snapshot()  # tiene vivo il refresh periodico (e quindi il pre-warm)
+    page = _local_page(query)
+    if page is not None:
+        metrics.cache_access("search", "local")
+        tixy_api.record_version(page["version"])
+        return page
+    key = query.cache_key()
+    page = _cache().get(key)
+    if page is not None and invalidation.stale(page.get("tags"), page.get("fetched", 0)):
+        page = None
+    if page is None:
+        metrics.cache_access("search", "miss")
+        page = _fetch(query)
+        _store(query, page)
+    else:
+        metrics.cache_access("search", "hit")
+    # la pagina in cache non passa da _api_request: la versione per l'ETag la diamo noi
+    tixy_api.record_version(page["version"])
+    return page
+
+
+# ---------------------------
+# Query popolari
+# ---------------------------
+
+_pop_lock = threading.Lock()
+_popularity: Counter = Counter()
+
+
+def track(query: SearchQuery) -> None:
+    if query.is_empty:
+        return
+    q = query.first_page
+    max_tracked = int(getattr(settings, "SEARCH_TRACK_MAX", 1000))
+    with _pop_lock:
+        _popularity[q] += 1
+        if len(_popularity) > max_tracked:
+            # tiene la metà più cercata
+            keep = _popularity.most_common(max_tracked // 2)
+            _popularity.clear()
+            _popularity.update(dict(keep))
+
+
+def popular(n: int | None = None) -> list[SearchQuery]:
+    n = int(getattr(settings, "SEARCH_POPULAR_SIZE", 20)) if n is None else n
+    min_hits = int(getattr(settings, "SEARCH_POPULAR_MIN_HITS", 3))
+    with _pop_lock:
+        return [q for q, c in _popularity.most_common(n) if c >= min_hits]
+
+
+def is_popular(query: SearchQuery) -> bool:
+    return query.first_page in set(popular())
+
+
+def prewarm(n: int | None = None) -> int:
+    """Ricalcola e mette in cache la prima pagina delle query più cercate."""
+    queries = popular(n)
+    warmed = 0
+    for q in queries:
+        try:
+            _cache().set(q.cache_key(), _fetch(q), _popular_ttl())
+            warmed += 1
+        except Exception:
+            logger.warning("Pre-warm ricerca fallito: %r", q, exc_info=True)
+    # decadimento: le query che smettono di essere cercate escono dalla classifica
+    with _pop_lock:
+        for q in list(_popularity):
+            _popularity[q] //= 2
+            if _popularity[q] <= 0:
+                del _popularity[q]
+    return warmed
+
+
+_prewarm_lock = threading.Lock()
+_prewarming = False
+
+
+def _prewarm_thread() -> None:
+    global _prewarming
+    try:
+        prewarm()
+    finally:
+        with _prewarm_lock:
+            _prewarming = False
+
+
+@catalog.on_refresh
+def _prewarm_on_refresh(snapshot: catalog.CatalogSnapshot) -> None:
+    # install() può girare nella richiesta (refresh sincrono, snapshot su disco
+    # caricato da get_snapshot): le chiamate al backend vanno in un thread, una
+    # tornata alla volta
+    global _prewarming
+    with _prewarm_lock:
+        if _prewarming:
+            return
+        _prewarming = True
+    threading.Thread(target=_prewarm_thread, name="search-prewarm", daemon=True).start()
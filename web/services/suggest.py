@@ -0,0 +1,227 @@
+# web/services/suggest.py
+# -----------------------------------------------------------------------------
+# Autocomplete locale su nomi evento, luoghi e città del catalogo.
+# - Indice ricostruito a ogni refresh dello snapshot (catalog.on_refresh).
+# - Prefisso: bisect su lista ordinata di token (tutti i token della query
+#   devono essere prefisso di un token dell'etichetta). Le voci sono numerate
+#   in ordine di classifica (peso, poi etichetta) e ogni token ha la lista dei
+#   suoi id già ordinata: si scorrono in ordine e ci si ferma ai primi
+#   `limit`. Per i prefissi corti (fino a SHORT_PREFIX caratteri, i più
+#   frequenti e con più candidati) le liste ordinate sono precalcolate.
+# - Typo: similarità di Jaccard sui trigrammi quando i prefissi non bastano.
+# - Testo normalizzato: minuscolo, senza accenti né punteggiatura.
+# Se lo snapshot non c'è ancora (cold start) si usa autocomplete/ del backend.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from urllib.parse import urlencode
+
+from django.urls import reverse
+
+from . import catalog, tixy_api
+
+MIN_QUERY_LEN = 2
+SHORT_PREFIX = 3
+FUZZY_MIN_SIMILARITY = 0.3
+
+_non_alnum = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return _non_alnum.sub(" ", text).strip()
+
+
+def trigrams(norm: str) -> set[str]:
+    s = f"  {norm} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class SuggestIndex:
+    def __init__(self, entries: list[dict], version: str = ""):
+        self.version = version
+        # id = posizione in classifica a parità di punteggio
+        self.entries = sorted(entries, key=lambda e: (-e["weight"], e["label"]))
+        postings: dict[str, list[int]] = defaultdict(list)
+        norms = []
+        self._tokens: list[tuple[str, ...]] = []
+        self._grams: dict[str, set[int]] = defaultdict(set)
+        self._gram_count: list[int] = []
+        for i, e in enumerate(self.entries):
+            toks = tuple(set(e["norm"].split()))
+            self._tokens.append(toks)
+            for tok in toks:
+                postings[tok].append(i)  # id crescenti: liste già ordinate
+            norms.append((e["norm"], i))
+            grams = trigrams(e["norm"])
+            self._gram_count.append(len(grams))
+            for g in grams:
+                self._grams[g].add(i)
+        self._tok_keys = sorted(postings)
+        self._postings = [postings[t] for t in self._tok_keys]
+        norms.sort()
+        self._norm_keys = [n for n, _ in norms]
+        self._norm_ids = [i for _, i in norms]
+        # prefissi corti -> id in ordine di classifica (parole / intera etichetta)
+        self._short_tok = _short_lists((tok, i) for i, toks in enumerate(self._tokens) for tok in toks)
+        self._short_norm = _short_lists(norms)
+
+    @staticmethod
+    def _range(keys: list[str], prefix: str) -> tuple[int, int]:
+        return bisect_left(keys, prefix), bisect_left(keys, prefix + "￿")
+
+    def _ranked(self, tok: str):
+        """Id delle voci con un token che inizia per `tok`, in ordine di classifica."""
+        if MIN_QUERY_LEN <= len(tok) <= SHORT_PREFIX:
+            yield from self._short_tok.get(tok, ())
+            return
+        lo, hi = self._range(self._tok_keys, tok)
+        prev = -1
+        for i in heapq.merge(*self._postings[lo:hi]):
+            if i != prev:
+                prev = i
+                yield i
+
+    def query(self, q: str, limit: int = 8) -> list[dict]:
+        nq = normalize(q)
+        if len(nq) < MIN_QUERY_LEN:
+            return []
+
+        # prefisso dell'intera etichetta > prefisso di una parola
+        if len(nq) <= SHORT_PREFIX:
+            full = self._short_norm.get(nq, [])[:limit]
+        else:
+            lo, hi = self._range(self._norm_keys, nq)
+            full = heapq.nsmallest(limit, self._norm_ids[lo:hi])
+        found = set(full)
+
+        # la parola con meno token corrispondenti guida la scansione
+        qtoks = nq.split()
+        spans = [self._range(self._tok_keys, t) for t in qtoks]
+        lead = min(range(len(qtoks)), key=lambda j: spans[j][1] - spans[j][0])
+        others = qtoks[:lead] + qtoks[lead + 1:]
+        words = []
+        for i in self._ranked(qtoks[lead]):
+            if len(full) + len(words) >= limit:
+                break
+            if i in found:
+                continue
+            if all(any(t.startswith(o) for t in self._tokens[i]) for o in others):
+                words.append(i)
+        ids = full + words
+
+        if len(ids) < limit:
+            # scansione esaurita: `ids` sono tutti i candidati per prefisso
+            found.update(words)
+            qg = trigrams(nq)
+            shared = Counter()
+            for g in qg:
+                shared.update(self._grams.get(g, ()))
+            fuzzy = []
+            for i, c in shared.items():
+                if i in found:
+                    continue
+                sim = c / (len(qg) + self._gram_count[i] - c)
+                if sim >= FUZZY_MIN_SIMILARITY:
+                    fuzzy.append((-sim, i))
+            ids += [i for _, i in heapq.nsmallest(limit - len(ids), fuzzy)]
+
+        return [_public(self.entries[i]) for i in ids]
+
+
+def _short_lists(pairs) -> dict[str, list[int]]:
+    """{prefisso di MIN_QUERY_LEN..SHORT_PREFIX caratteri: id ordinati, senza doppioni}."""
+    out: dict[str, set[int]] = defaultdict(set)
+    for key, i in pairs:
+        for n in range(MIN_QUERY_LEN, min(len(key), SHORT_PREFIX) + 1):
+            out[key[:n]].add(i)
+    return {p: sorted(ids) for p, ids in out.items()}
+
+
+def _public(e: dict) -> dict:
+    return {"type": e["type"], "label": e["label"], "url": e["url"]}
+
+
+def build_entries(snapshot: catalog.CatalogSnapshot) -> list[dict]:
+    events: dict[str, dict] = {}
+    venues: Counter = Counter()
+    cities: Counter = Counter()
+    labels: dict[tuple, str] = {}
+
+    for p in snapshot.performances:
+        name = p["name"]
+        if name:
+            key = normalize(name)
+            ev = events.get(key)
+            if ev is None:
+                # prima data (lo snapshot è ordinato per data)
+                url = (reverse("event_dates", args=[int(p["event_id"])]) if p["event_id"]
+                       else reverse("event-listings", args=[p["id"]]))
+                events[key] = {"type": "event", "label": name, "norm": key, "url": url, "weight": 1}
+            else:
+                ev["weight"] += 1
+        for kind, value, counter in (("venue", p["venue"], venues), ("city", p["city"], cities)):
+            if value:
+                k = normalize(value)
+                counter[k] += 1
+                labels.setdefault((kind, k), value)
+
+    search_url = reverse("search")
+    entries = list(events.values())
+    for k, n in venues.items():
+        label = labels[("venue", k)]
+        entries.append({"type": "venue", "label": label, "norm": k, "weight": n,
+                        "url": f"{search_url}?{urlencode({'q': label})}"})
+    for k, n in cities.items():
+        label = labels[("city", k)]
+        entries.append({"type": "city", "label": label, "norm": k, "weight": n,
+                        "url": f"{search_url}?{urlencode({'localita': label})}"})
+    return entries
+
+
+_index: SuggestIndex | None = None
+
+
+@catalog.on_refresh
+def _rebuild(snapshot: catalog.CatalogSnapshot) -> None:
+    global _index
+    if _index is not None and _index.version == snapshot.version:
+        return
+    _index = SuggestIndex(build_entries(snapshot), version=snapshot.version)
+
+
+def _backend_suggest(q: str, limit: int) -> list[dict]:
+    data = tixy_api.autocomplete(kind="event", q=q, limit=limit) or {}
+    rows = data.get("results", data if isinstance(data, list) else []) or []
+    out = []
+    search_url = reverse("search")
+    for r in rows[:limit]:
+        if isinstance(r, str):
+            label = r
+        elif isinstance(r, dict):
+            label = r.get("label") or r.get("evento_nome") or r.get("nome") or r.get("name") or ""
+        else:
+            continue
+        if label:
+            out.append({"type": "event", "label": label, "url": f"{search_url}?{urlencode({'q': label})}"})
+    return out
+
+
+def suggest(q: str, limit: int = 8) -> tuple[list[dict], str]:
+    """Ritorna (suggerimenti, sorgente) con sorgente "local" o "backend"."""
+    catalog.get_snapshot()  # avvia il refresh se manca/scaduto
+    if _index is not None:
+        return _index.query(q, limit), "local"
+    if len(normalize(q)) < MIN_QUERY_LEN:
+        return [], "backend"
+    try:
+        return _backend_suggest(q, limit), "backend"
+    except Exception:
+        return [], "backend"
@@ -4,12 +4,70 @@
 # - Unifica GET/POST/PATCH/… con _api_request (Bearer opzionale).
 # - Espone funzioni di alto livello usate dalle views.
 # - Gestisce timeout da settings.REQUESTS_TIMEOUT (fallback 8s).
+# - Cache delle GET pubbliche (cache_ttl) con rivalidazione condizionale:
+#   ETag/Last-Modified del backend salvati col body, 304 = refresh della copia.
+# - Ogni risposta ha una "versione" (ETag o hash del body) raccolta durante la
+#   richiesta: le view la usano per calcolare il proprio ETag.
+# - Decoder JSON configurabile (orjson se disponibile), proiezione dei campi
+#   (`fields=`) e compressione gzip/brotli negoziata.
+# - Retry con backoff esponenziale + jitter sugli errori transitori: sempre per
+#   le GET, per le scritture solo se hanno un Idempotency-Key. Un budget
+#   globale (per processo) limita i retry durante un'interruzione del backend.
+# - Connessioni keep-alive riusate: una requests.Session per processo.
+# - Hedging (opt-in per endpoint, solo GET): se la risposta non arriva entro il
+#   p90 osservato per quell'endpoint parte una seconda richiesta identica e
+#   vince la prima che risponde; al massimo API_HEDGE_RATIO del traffico. La
+#   prima richiesta resta sul thread chiamante, nel pool gira solo l'hedge (e
+#   niente hedge se il pool è pieno).
+# - Ogni copia in cache ha dei tag (perf:<id>, listing:<id>, event:<id>, ...):
+#   se uno viene invalidato dopo il salvataggio (web.invalidation) la copia
+#   non è più servita, in nessun worker.
+# - Metriche (web.metrics): durata ed esito di ogni chiamata per funzione
+#   chiamante (argomento `function=`, esplicito: niente ispezione dello stack),
+#   esiti della cache, utilizzo del pool di connessioni.
 # -----------------------------------------------------------------------------
 
 from __future__ import annotations
 
+import contextvars
+import hashlib
+import json as _stdlib_json
+import logging
+import os
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlencode
+
 import requests
+import urllib3
 from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from .. import invalidation, metrics
+
+logger = logging.getLogger(__name__)
+
+# urllib3 decodifica "br" solo se è installato brotli/brotlicffi (opzionale)
+try:
+    import brotli  # noqa: F401
+    _ACCEPT_ENCODING = "br, gzip, deflate"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        _ACCEPT_ENCODING = "br, gzip, deflate"
+    except ImportError:
+        _ACCEPT_ENCODING = "gzip, deflate"
 
 
 # ---------------------------
@@ -21,39 +79,650 @@ def _timeout() -> int:
     return getattr(settings, "REQUESTS_TIMEOUT", 8)
 
 
+def _catalog_ttl() -> int:
+    """Secondi in cui una GET di catalogo in cache è servita senza rivalidare."""
+    return int(getattr(settings, "API_CACHE_TTL", 30))
+
+
+def _stale_ttl() -> int:
+    """Per quanto tenere una copia scaduta ma rivalidabile (ETag/Last-Modified)."""
+    return int(getattr(settings, "API_CACHE_STALE_TTL", 600))
+
+
+def _api_cache():
+    return caches[getattr(settings, "API_CACHE_ALIAS", "default")]
+
+
+# ---------------------------
+# Decodifica JSON / proiezione campi
+# ---------------------------
+
+@lru_cache(maxsize=1)
+def _json_decoder():
+    """
+    settings.API_JSON_DECODER: "auto" (orjson se installato, altrimenti json),
+    "orjson", "json" oppure dotted path di una funzione bytes -> oggetto.
+    """
+    name = getattr(settings, "API_JSON_DECODER", "auto")
+    if name in ("auto", "orjson"):
+        try:
+            import orjson
+            return orjson.loads
+        except ImportError:
+            if name == "orjson":
+                raise
+    if name in ("auto", "json"):
+        return _stdlib_json.loads
+    return import_string(name)
+
+
+def decode_json(content: bytes):
+    return _json_decoder()(content)
+
+
+def _project(row, fields):
+    if not isinstance(row, dict):
+        return row
+    return {k: row[k] for k in fields if k in row}
+
+
+def project_fields(body, fields):
+    """
+    Tiene solo `fields` nelle righe della risposta (lista, {"results": [...]} o
+    singolo oggetto). Serve anche se il backend ignora `fields=`: le copie in
+    cache restano piccole.
+    """
+    if not fields or body is None:
+        return body
+    if isinstance(body, list):
+        return [_project(r, fields) for r in body]
+    if isinstance(body, dict) and isinstance(body.get("results"), list):
+        return {**body, "results": [_project(r, fields) for r in body["results"]]}
+    if isinstance(body, dict):
+        return _project(body, fields)
+    return body
+
+
+# ---------------------------
+# Versioni delle risposte (per gli ETag delle pagine)
+# ---------------------------
+
+_versions: contextvars.ContextVar[list | None] = contextvars.ContextVar("tixy_api_versions", default=None)
+
+
+@contextmanager
+def collect_versions():
+    """Raccoglie le versioni di tutte le risposte API ottenute nel blocco."""
+    bucket: list = []
+    token = _versions.set(bucket)
+    try:
+        yield bucket
+    finally:
+        _versions.reset(token)
+
+
+def record_version(value) -> None:
+    """Aggiunge una versione (ETag, hash, o stato per-utente) alla raccolta corrente."""
+    bucket = _versions.get()
+    if bucket is not None:
+        bucket.append(str(value))
+
+
+def _digest(content: bytes) -> str:
+    return hashlib.blake2b(content or b"", digest_size=10).hexdigest()
+
+
+def _cache_key(url: str, params: dict | None) -> str:
+    qs = urlencode(sorted((params or {}).items()), doseq=True)
+    return "tixy_api:" + _digest(f"{url}?{qs}".encode("utf-8"))
+
+
+_TAGGED_PATHS = (
+    (re.compile(r"^performances/(\d+)/"), "perf"),
+    (re.compile(r"^listings/(\d+)/"), "listing"),
+    (re.compile(r"^eventi/(\d+)/"), "event"),
+)
+
+
+def _cache_tags(path: str, body) -> list[str]:
+    """Tag di invalidazione di una GET in cache: oggetto del path + righe della risposta."""
+    path = path.lstrip("/")
+    tags = set()
+    for pattern, kind in _TAGGED_PATHS:
+        m = pattern.match(path)
+        if m:
+            tags.add(f"{kind}:{m.group(1)}")
+    is_listing = "listings" in path
+    if is_listing:
+        tags.add("listings")
+    rows = body.get("results") if isinstance(body, dict) else body
+    for r in (rows if isinstance(rows, list) else ()):
+        if not isinstance(r, dict) or not r.get("id"):
+            continue
+        if is_listing:
+            tags.add(f"listing:{r['id']}")
+            if r.get("performance"):
+                tags.add(f"perf:{r['performance']}")
+        elif path.startswith(("search/performances", "performances")):
+            tags.add(f"perf:{r['id']}")
+    return sorted(tags)
+
+
+# ---------------------------
+# Retry (backoff con jitter + budget globale)
+# ---------------------------
+
+_http: requests.Session | None = None
+_http_pid: int | None = None
+_http_lock = threading.Lock()
+
+
+_reading: dict[int, object] = {}  # thread -> connessione in attesa della risposta
+
+
+class _TrackedConnectionMixin:
+    def getresponse(self, *args, **kwargs):
+        tid = threading.get_ident()
+        _reading[tid] = self
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            _reading.pop(tid, None)
+
+
+class _TrackedHTTPConnection(_TrackedConnectionMixin, urllib3.connection.HTTPConnection):
+    pass
+
+
+class _TrackedHTTPSConnection(_TrackedConnectionMixin, urllib3.connection.HTTPSConnection):
+    pass
+
+
+class _HTTPPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _TrackedHTTPConnection
+
+
+class _HTTPSPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = _TrackedHTTPSConnection
+
+
+class _Adapter(HTTPAdapter):
+    """HTTPAdapter le cui attese di risposta si possono interrompere da un altro thread (abort_read)."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPPool, "https": _HTTPSPool}
+
+
+def abort_read(thread_id: int) -> bool:
+    """Chiude la connessione su cui `thread_id` aspetta una risposta (la richiesta fallisce)."""
+    sock = getattr(_reading.get(thread_id), "sock", None)
+    if sock is None:
+        return False
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        return False
+    return True
+
+
+def http_session() -> requests.Session:
+    """
+    Sessione HTTP condivisa dal processo (connessioni keep-alive riusate,
+    API_POOL_MAXSIZE per host). Ricreata dopo un fork; nessun cookie
+    conservato fra una richiesta e l'altra.
+    """
+    global _http, _http_pid
+    if _http is not None and _http_pid == os.getpid():
+        return _http
+    with _http_lock:
+        if _http is None or _http_pid != os.getpid():
+            session = requests.Session()
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            adapter = _Adapter(pool_connections=4,
+                               pool_maxsize=int(getattr(settings, "API_POOL_MAXSIZE", 20)))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http, _http_pid = session, os.getpid()
+    return _http
+
+
+def pool_stats() -> list[dict]:
+    """Connessioni per host del pool di questo processo: in uso, inattive, massimo."""
+    if _http is None or _http_pid != os.getpid():
+        return []
+    out = []
+    for adapter in list(_http.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            queue = getattr(pool, "pool", None)
+            if queue is None:
+                continue
+            # la coda contiene le connessioni libere e None per gli slot mai aperti
+            idle = sum(1 for c in list(queue.queue) if c is not None)
+            out.append({
+                "host": f"{pool.host}:{pool.port}",
+                "in_use": queue.maxsize - queue.qsize(),
+                "idle": idle,
+                "max": queue.maxsize,
+            })
+    return out
+
+
+def _pooled_request(method: str, url: str, **kwargs) -> requests.Response:
+    return http_session().request(method=method, url=url, **kwargs)
+
+
+# funzione che esegue fisicamente la richiesta (sostituita da
+# web.services.api_fixtures in registrazione / replay)
+_transport = _pooled_request
+
+
+def set_transport(fn):
+    """Installa un trasporto alternativo (firma di requests.request); ritorna il precedente."""
+    global _transport
+    previous, _transport = _transport, fn
+    return previous
+
+
+RETRY_STATUSES = frozenset({502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class RetryBudget:
+    """
+    Token bucket dei retry: ogni richiesta "normale" deposita `ratio` token,
+    ogni retry ne preleva uno; in più `min_per_sec` token al secondo perché un
+    sito con poco traffico possa comunque ritentare. Con il backend giù i
+    retry si fermano al ~ratio% delle richieste invece di moltiplicarle.
+    """
+
+    def __init__(self, ratio: float, min_per_sec: float, capacity: float):
+        self.ratio = ratio
+        self.min_per_sec = min_per_sec
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.min_per_sec)
+        self._last = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+@lru_cache(maxsize=1)
+def _retry_budget() -> RetryBudget:
+    return RetryBudget(
+        ratio=float(getattr(settings, "API_RETRY_BUDGET_RATIO", 0.1)),
+        min_per_sec=float(getattr(settings, "API_RETRY_BUDGET_MIN_PER_SEC", 1.0)),
+        capacity=float(getattr(settings, "API_RETRY_BUDGET_MAX", 20)),
+    )
+
+
+retry_stats = {"retries": 0, "budget_exhausted": 0}
+
+
+def new_idempotency_key() -> str:
+    return uuid.uuid4().hex
+
+
+def _backoff(attempt: int) -> float:
+    """Full jitter: uniforme fra 0 e base * 2^attempt (massimo API_RETRY_MAX_DELAY)."""
+    base = float(getattr(settings, "API_RETRY_BASE_DELAY", 0.1))
+    cap = float(getattr(settings, "API_RETRY_MAX_DELAY", 1.0))
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _may_retry(budget: RetryBudget, method: str, url: str, reason: str) -> bool:
+    if budget.withdraw():
+        retry_stats["retries"] += 1
+        return True
+    retry_stats["budget_exhausted"] += 1
+    logger.debug("Retry budget esaurito: %s %s (%s)", method, url, reason)
+    return False
+
+
+def _send(method: str, url: str, *, function: str = "unknown", **kwargs) -> requests.Response:
+    """
+    _send_retrying con le metriche della chiamata (durata, esito) etichettate
+    con `function`: la funzione pubblica (o la view) che l'ha originata, passata
+    esplicitamente dal chiamante.
+    """
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        r = _send_retrying(method, url, **kwargs)
+        outcome = "ok" if r.status_code < 400 else f"{r.status_code // 100}xx"
+        return r
+    finally:
+        metrics.observe("tixy_backend_request_duration_seconds", time.perf_counter() - t0, function=function)
+        metrics.inc("tixy_backend_requests_total", function=function, outcome=outcome)
+
+
+def _send_retrying(method: str, url: str, *, idempotency_key: str | None = None, **kwargs) -> requests.Response:
+    """
+    requests.request con retry sugli errori transitori (connessione, 502/503/504).
+    GET/HEAD/OPTIONS si ritentano sempre; le altre solo con idempotency_key,
+    che viaggia come header Idempotency-Key identico su tutti i tentativi.
+    """
+    method = method.upper()
+    if idempotency_key:
+        kwargs["headers"] = {**(kwargs.get("headers") or {}), "Idempotency-Key": idempotency_key}
+    retries = int(getattr(settings, "API_RETRY_MAX", 2))
+    if method not in IDEMPOTENT_METHODS and not idempotency_key:
+        retries = 0
+
+    budget = _retry_budget()
+    budget.deposit()
+    attempt = 0
+    while True:
+        try:
+            r = _transport(method=method, url=url, **kwargs)
+        except requests.ConnectionError as e:
+            # i read timeout non si ritentano: il backend è lento, non giù
+            if attempt >= retries or _hedge_won() or not _may_retry(budget, method, url, repr(e)):
+                raise
+        else:
+            if r.status_code not in RETRY_STATUSES or attempt >= retries:
+                return r
+            if not _may_retry(budget, method, url, f"HTTP {r.status_code}"):
+                return r
+        attempt += 1
+        logger.info("Retry %s/%s %s %s", attempt, retries, method, url)
+        time.sleep(_backoff(attempt))
+
+
+# ---------------------------
+# Hedging (letture critiche per la latenza)
+# ---------------------------
+
+class _LatencyWindow:
+    """Ultime N latenze (secondi) di un endpoint, per il p90."""
+
+    def __init__(self, size: int):
+        self.samples: deque = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int) -> float | None:
+        with self.lock:
+            if len(self.samples) < min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+_latency: dict[str, _LatencyWindow] = {}
+_latency_lock = threading.Lock()
+hedge_stats: dict[str, dict[str, int]] = {}
+_hedge_lock = threading.Lock()
+_hedge_slots = 0  # hedge nel pool (in attesa del p90 o in volo)
+_hedge_local = threading.local()
+
+
+def _window(endpoint: str) -> _LatencyWindow:
+    with _latency_lock:
+        win = _latency.get(endpoint)
+        if win is None:
+            win = _latency[endpoint] = _LatencyWindow(int(getattr(settings, "API_HEDGE_WINDOW", 200)))
+            hedge_stats[endpoint] = {"requests": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0,
+                                     "pool_full": 0}
+        return win
+
+
+@lru_cache(maxsize=1)
+def _hedge_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=int(getattr(settings, "API_HEDGE_WORKERS", 16)),
+                              thread_name_prefix="tixy-hedge")
+
+
+@lru_cache(maxsize=1)
+def _hedge_budget() -> RetryBudget:
+    # stesso token bucket dei retry: ogni richiesta vale RATIO hedge, nessun minimo
+    return RetryBudget(ratio=float(getattr(settings, "API_HEDGE_RATIO", 0.05)), min_per_sec=0.0,
+                       capacity=float(getattr(settings, "API_HEDGE_BURST", 5)))
+
+
+def _timed_send(win: _LatencyWindow, method: str, url: str, kwargs: dict) -> requests.Response:
+    t0 = time.monotonic()
+    r = _send(method, url, **kwargs)
+    win.add(time.monotonic() - t0)
+    return r
+
+
+def _count(endpoint: str, event: str):
+    with _hedge_lock:
+        hedge_stats[endpoint][event] += 1
+
+
+def _take_slot() -> bool:
+    """Posto nel pool per un hedge: mai in coda dietro ad altri."""
+    global _hedge_slots
+    with _hedge_lock:
+        if _hedge_slots >= int(getattr(settings, "API_HEDGE_WORKERS", 16)):
+            return False
+        _hedge_slots += 1
+        return True
+
+
+def _release_slot():
+    global _hedge_slots
+    with _hedge_lock:
+        _hedge_slots -= 1
+
+
+class _Race:
+    """Richiesta primaria (thread chiamante) contro hedge (pool): vince la prima risposta."""
+
+    def __init__(self):
+        self.caller = threading.get_ident()
+        self.lock = threading.Lock()
+        self.primary_done = threading.Event()
+        self.hedge_response: requests.Response | None = None
+
+    def hedge_arrived(self, r: requests.Response) -> bool:
+        with self.lock:
+            if self.primary_done.is_set():
+                return False
+            self.hedge_response = r
+            # sotto lock: il chiamante non può essere già passato a un'altra richiesta
+            abort_read(self.caller)
+            return True
+
+    def primary_finished(self) -> requests.Response | None:
+        with self.lock:
+            self.primary_done.set()
+            return self.hedge_response
+
+
+def _hedge_won() -> bool:
+    race = getattr(_hedge_local, "race", None)
+    return race is not None and race.hedge_response is not None
+
+
+def _hedge_after(race: _Race, delay: float, endpoint: str, win: _LatencyWindow,
+                 method: str, url: str, kwargs: dict):
+    try:
+        if race.primary_done.wait(delay):
+            return
+        if not _hedge_budget().withdraw():
+            _count(endpoint, "budget_denied")
+            return
+        _count(endpoint, "hedged")
+        try:
+            r = _timed_send(win, method, url, kwargs)
+        except Exception:
+            logger.info("Hedge %s fallito", endpoint, exc_info=True)
+            return
+        if race.hedge_arrived(r):
+            _count(endpoint, "hedge_wins")
+        else:
+            r.close()
+    finally:
+        _release_slot()
+
+
+def _send_hedged(endpoint: str, method: str, url: str, **kwargs) -> requests.Response:
+    """
+    _send con hedging: la richiesta parte sul thread chiamante; se non ha
+    risposto entro il p90 di `endpoint` (servono API_HEDGE_MIN_SAMPLES misure)
+    e il budget lo consente, il pool ne manda una seconda identica. Se arriva
+    prima l'hedge, l'attesa del chiamante viene interrotta e vince l'hedge.
+    """
+    win = _window(endpoint)
+    _count(endpoint, "requests")
+    _hedge_budget().deposit()
+
+    delay = win.quantile(0.9, int(getattr(settings, "API_HEDGE_MIN_SAMPLES", 20)))
+    if delay is None:
+        return _timed_send(win, method, url, kwargs)
+    if not _take_slot():
+        _count(endpoint, "pool_full")
+        return _timed_send(win, method, url, kwargs)
+    delay = max(delay, float(getattr(settings, "API_HEDGE_MIN_DELAY", 0.02)))
+
+    race = _Race()
+    try:
+        _hedge_pool().submit(_hedge_after, race, delay, endpoint, win, method, url, kwargs)
+    except RuntimeError:  # pool chiuso (shutdown dell'interprete)
+        _release_slot()
+        return _timed_send(win, method, url, kwargs)
+    _hedge_local.race = race
+    try:
+        r = _timed_send(win, method, url, kwargs)
+    except Exception:
+        hedged = race.primary_finished()
+        if hedged is None:
+            raise
+        return hedged
+    finally:
+        _hedge_local.race = None
+    hedged = race.primary_finished()
+    if hedged is not None:
+        r.close()
+        return hedged
+    return r
+
+
 def _api_request(method: str, path: str, *, params: dict | None = None,
                  json: dict | None = None, token: str | None = None,
-                 timeout: int | None = None):
-    """Richiesta HTTP generica con gestione base del Bearer Token."""
+                 timeout: int | None = None, cache_ttl: int | None = None,
+                 fields: tuple[str, ...] | list[str] | None = None,
+                 idempotency_key: str | None = None, hedge: str | None = None,
+                 function: str = "unknown"):
+    """
+    Richiesta HTTP generica con gestione base del Bearer Token.
+    cache_ttl (solo GET senza token): la risposta resta in cache; entro il TTL è
+    servita direttamente, dopo viene rivalidata con If-None-Match /
+    If-Modified-Since e un 304 rinnova la copia senza riscaricare il body.
+    fields: sparse fieldset richiesto al backend (`fields=a,b`) e applicato
+    comunque alle righe decodificate.
+    idempotency_key: header Idempotency-Key; rende ritentabili le scritture.
+    hedge: nome dell'endpoint per l'hedging (solo GET, se API_HEDGE_ENABLED).
+    function: etichetta delle metriche backend (funzione pubblica o view chiamante).
+    """
     base = settings.API_BASE_URL.rstrip("/")
     url = f"{base}/{path.lstrip('/')}"
-    headers = {}
+    if fields:
+        params = {**(params or {}), "fields": ",".join(fields)}
+    headers = {"Accept-Encoding": _ACCEPT_ENCODING}
     if token:
         headers["Authorization"] = f"Bearer {token}"
 
-    r = requests.request(
-        method=method,
-        url=url,
+    cacheable = cache_ttl is not None and method.upper() == "GET" and not token
+    key, entry = None, None
+    if cacheable:
+        key = _cache_key(url, params)
+        entry = _api_cache().get(key)
+        if entry is not None and invalidation.stale(entry.get("tags"), entry["fetched"]):
+            entry = None
+        if entry is not None:
+            if time.time() - entry["fetched"] < cache_ttl:
+                metrics.cache_access("api", "hit")
+                record_version(entry["version"])
+                return entry["body"]
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+    send_kwargs = dict(
         params=params or {},
         json=json or {},
         headers=headers,
         timeout=timeout or _timeout(),
+        idempotency_key=idempotency_key,
+        function=function,
     )
+    # "fetched" = invio: un'invalidazione arrivata durante la richiesta vale anche per questa copia
+    sent_at = time.time()
+    if hedge and method.upper() == "GET" and getattr(settings, "API_HEDGE_ENABLED", True):
+        r = _send_hedged(hedge, method, url, **send_kwargs)
+    else:
+        r = _send(method, url, **send_kwargs)
+
+    if entry is not None and r.status_code == 304:
+        metrics.cache_access("api", "revalidated")
+        entry["fetched"] = sent_at
+        _api_cache().set(key, entry, _stale_ttl())
+        record_version(entry["version"])
+        return entry["body"]
+
     try:
         r.raise_for_status()
     except requests.HTTPError as e:
         # includo il body per debug lato FE/log
-        raise requests.HTTPError(f"{e} | body={r.text}") from e
+        raise requests.HTTPError(f"{e} | body={r.text}", response=r) from e
     # se non c'è JSON (204 No Content), ritorno None
-    return r.json() if r.content and r.headers.get("Content-Type", "").startswith("application/json") else None
-
-
-def _api_get(path: str, params: dict | None = None):
-    return _api_request("GET", path, params=params)
-
-
-def _api_post(path: str, json: dict | None = None):
-    return _api_request("POST", path, json=json)
+    body = decode_json(r.content) if r.content and r.headers.get("Content-Type", "").startswith("application/json") else None
+    body = project_fields(body, fields)
+
+    etag = r.headers.get("ETag")
+    last_modified = r.headers.get("Last-Modified")
+    version = etag or _digest(r.content)
+    record_version(version)
+    if cacheable:
+        metrics.cache_access("api", "miss")
+        entry = {
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified,
+            "version": version,
+            "fetched": sent_at,
+            "tags": _cache_tags(path, body),
+        }
+        # senza validatori la copia scaduta non è rivalidabile: la teniamo solo per il TTL
+        _api_cache().set(key, entry, _stale_ttl() if (etag or last_modified) else cache_ttl)
+    return body
+
+
+def _api_get(path: str, params: dict | None = None, *, cache_ttl: int | None = None,
+             fields: tuple[str, ...] | list[str] | None = None, hedge: str | None = None,
+             function: str = "unknown"):
+    return _api_request("GET", path, params=params, cache_ttl=cache_ttl, fields=fields, hedge=hedge, function=function)
+
+
+def _api_post(path: str, json: dict | None = None, *, idempotency_key: str | None = None,
+              function: str = "unknown"):
+    return _api_request("POST", path, json=json, idempotency_key=idempotency_key, function=function)
 
 
 def _auth_headers(token: str | None) -> dict:
@@ -64,7 +733,8 @@ def _auth_headers(token: str | None) -> dict:
 # SEARCH / AUTOCOMPLETE
 # ---------------------------
 
-def search_performances(q=None, date=None, city=None, page=None, ordering=None, page_size=None):
+def search_performances(q=None, date=None, city=None, page=None, ordering=None, page_size=None,
+                        fields=None):
     params: dict = {}
     if q:         params["q"] = q
     if date:      params["date"] = date
@@ -72,11 +742,13 @@ def search_performances(q=None, date=None, city=None, page=None, ordering=None,
     if page:      params["page"] = page
     if ordering:  params["ordering"] = ordering
     if page_size: params["page_size"] = page_size   # <-- aggiungi questo
-    return _api_get("search/performances/", params=params)
+    return _api_get("search/performances/", params=params, cache_ttl=_catalog_ttl(), fields=fields,
+                    function="search_performances")
 
 
 def autocomplete(kind: str = "event", q: str = "", limit: int = 10):
-    return _api_get("autocomplete/", params={"type": kind, "q": q, "limit": limit})
+    return _api_get("autocomplete/", params={"type": kind, "q": q, "limit": limit}, cache_ttl=_catalog_ttl(),
+                    function="autocomplete")
 
 
 # ---------------------------
@@ -84,16 +756,36 @@ def autocomplete(kind: str = "event", q: str = "", limit: int = 10):
 # ---------------------------
 
 def get_performance(perf_id: int):
-    return _api_get(f"performances/{perf_id}/")
+    return _api_get(f"performances/{perf_id}/", cache_ttl=_catalog_ttl(), hedge="performance",
+                    function="get_performance")
 
 
 def get_performance_listings(perf_id: int, page: int | str | None = None):
     params = {"page": page} if page else None
-    return _api_get(f"performances/{perf_id}/listings/", params=params)
+    return _api_get(f"performances/{perf_id}/listings/", params=params,
+                    cache_ttl=_catalog_ttl(), hedge="performance_listings", function="get_performance_listings")
+
+
+def poll_performance_listings(perf_id: int, etag: str | None = None):
+    """
+    Listings per il feed live (web.live_listings): non passa dalla cache API,
+    così i poll non toccano la copia usata dalle pagine. Rivalida con l'ETag
+    del giro precedente. Ritorna (body, etag); body None = invariato (304).
+    """
+    url = f"{settings.API_BASE_URL.rstrip('/')}/performances/{perf_id}/listings/"
+    headers = {"Accept-Encoding": _ACCEPT_ENCODING}
+    if etag:
+        headers["If-None-Match"] = etag
+    r = _send("GET", url, params={}, headers=headers, timeout=_timeout(), function="poll_performance_listings")
+    if etag and r.status_code == 304:
+        return None, etag
+    r.raise_for_status()
+    body = decode_json(r.content) if r.content else None
+    return body, r.headers.get("ETag")
 
 
 def get_event(event_id: int):
-    return _api_get(f"eventi/{event_id}/")
+    return _api_get(f"eventi/{event_id}/", cache_ttl=_catalog_ttl(), function="get_event")
 
 
 # ---------------------------
@@ -101,7 +793,7 @@ def get_event(event_id: int):
 # ---------------------------
 
 def get_listing(listing_id: int):
-    return _api_get(f"listings/{listing_id}/")
+    return _api_get(f"listings/{listing_id}/", function="get_listing")
 
 
 def listing_preview(listing_id: int, qty: int, fee_percent: float | None = None, fee_flat: float | None = None):
@@ -110,17 +802,20 @@ def listing_preview(listing_id: int, qty: int, fee_percent: float | None = None,
         payload["fee_percent"] = fee_percent
     if fee_flat is not None:
         payload["fee_flat"] = fee_flat
-    return _api_post(f"listings/{listing_id}/preview/", json=payload)
+    # sola lettura lato backend: ritentabile
+    return _api_post(f"listings/{listing_id}/preview/", json=payload, idempotency_key=new_idempotency_key(),
+                     function="listing_preview")
 
 
-def checkout_start(payload: dict):
+def checkout_start(payload: dict, idempotency_key: str | None = None):
     # payload conforme al serializer del backend (CheckoutStartSerializer)
-    return _api_post("checkout/start/", json=payload)
+    return _api_post("checkout/start/", json=payload,
+                     idempotency_key=idempotency_key or new_idempotency_key(), function="checkout_start")
 
 
 def checkout_summary(order_id: int, email: str | None = None):
     params = {"email": email} if email else None
-    return _api_get(f"checkout/summary/{order_id}/", params=params)
+    return _api_get(f"checkout/summary/{order_id}/", params=params, function="checkout_summary")
 
 
 # ---------------------------
@@ -137,19 +832,20 @@ def api_register_user(email: str, password: str, first_name: str, last_name: str
         "accepted_terms": accepted_terms,
         "accepted_privacy": accepted_privacy,
     }
-    return _api_request("POST", "register/", json=payload)
+    return _api_request("POST", "register/", json=payload, function="api_register_user")
 
 
 def api_confirm_otp(email: str, otp_code: str):
-    return _api_request("POST", "auth/confirm-otp/", json={"email": email, "otp_code": otp_code})
+    return _api_request("POST", "auth/confirm-otp/", json={"email": email, "otp_code": otp_code},
+                        function="api_confirm_otp")
 
 
 def api_obtain_token(email: str, password: str):
-    return _api_request("POST", "auth/token/", json={"email": email, "password": password})
+    return _api_request("POST", "auth/token/", json={"email": email, "password": password}, function="api_obtain_token")
 
 
 def api_get_profile(token: str):
-    return _api_request("GET", "profile/", token=token)
+    return _api_request("GET", "profile/", token=token, function="api_get_profile")
 
 
 # ---------------------------
@@ -164,11 +860,14 @@ def api_event_follow_create(token: str, event_id: int):
     base = settings.API_BASE_URL.rstrip("/")
     url = f"{base}/event-follows/"
     payload = {"event": event_id}
-    r = requests.post(
+    r = _send(
+        "POST",
         url,
         json=payload,
         headers=_auth_headers(token),
         timeout=_timeout(),
+        idempotency_key=new_idempotency_key(),
+        function="api_event_follow_create",
     )
     if r.status_code in (200, 201):
         return r.json()
@@ -181,22 +880,51 @@ def api_event_follow_create(token: str, event_id: int):
 def api_event_follow_status(token: str, event_id: int) -> bool:
     base = settings.API_BASE_URL.rstrip("/")
     url = f"{base}/event-follows/"
-    r = requests.get(
+    r = _send(
+        "GET",
         url,
         params={"event": event_id},
         headers=_auth_headers(token),
         timeout=_timeout(),
+        function="api_event_follow_status",
     )
     if r.status_code == 401:
         return False
     r.raise_for_status()
     data = r.json()
     items = data.get("results", data if isinstance(data, list) else [])
+    # lo stato follow entra nell'ETag della pagina che lo mostra
+    record_version(f"follow:{event_id}:{bool(items)}")
     return bool(items)
 
 
+def api_event_follow_set(token: str, page_size: int = 200, max_pages: int = 10) -> dict[int, bool]:
+    """
+    Tutti gli eventi seguiti dall'utente in un colpo solo: {event_id: active}.
+    Sostituisce N chiamate a api_event_follow_status per le pagine con più card.
+    """
+    follows: dict[int, bool] = {}
+    for page in range(1, max_pages + 1):
+        data = _api_request("GET", "event-follows/my/", params={"page": page, "page_size": page_size},
+                            token=token, function="api_event_follow_set") or {}
+        rows = data.get("results", data if isinstance(data, list) else []) or []
+        for r in rows:
+            if not isinstance(r, dict):
+                continue
+            ev = r.get("evento_info") or r.get("event_info") or {}
+            eid = r.get("evento") or r.get("event") or r.get("evento_id") or ev.get("id")
+            try:
+                eid = int(eid)
+            except (TypeError, ValueError):
+                continue
+            follows[eid] = follows.get(eid, False) or bool(r.get("active", True))
+        if not isinstance(data, dict) or not data.get("next"):
+            break
+    return follows
+
+
 def api_abbonamento_create(token: str, *, plan_id: int | None = None, prezzo: str = "6.99",
-                           durata_giorni: int | None = None):
+                           durata_giorni: int | None = None, idempotency_key: str | None = None):
     """
     Crea un abbonamento (puoi passare plan_id oppure solo prezzo/durata_giorni).
     """
@@ -209,11 +937,14 @@ def api_abbonamento_create(token: str, *, plan_id: int | None = None, prezzo: st
 
     base = settings.API_BASE_URL.rstrip("/")
     url = f"{base}/abbonamenti/"
-    r = requests.post(
+    r = _send(
+        "POST",
         url,
         json=payload,
         headers=_auth_headers(token),
         timeout=_timeout(),
+        idempotency_key=idempotency_key,
+        function="api_abbonamento_create",
     )
     r.raise_for_status()
     return r.json()
@@ -221,7 +952,7 @@ def api_abbonamento_create(token: str, *, plan_id: int | None = None, prezzo: st
 
 def api_monitoraggio_create(token: str, *, abbonamento_id: int,
                             event_id: int | None = None, performance_id: int | None = None,
-                            filters: dict | None = None):
+                            filters: dict | None = None, idempotency_key: str | None = None):
     """
     Crea il monitoraggio collegato all'abbonamento (per evento o performance).
     """
@@ -235,11 +966,14 @@ def api_monitoraggio_create(token: str, *, abbonamento_id: int,
 
     base = settings.API_BASE_URL.rstrip("/")
     url = f"{base}/monitoraggi/"
-    r = requests.post(
+    r = _send(
+        "POST",
         url,
         json=payload,
         headers=_auth_headers(token),
         timeout=_timeout(),
+        idempotency_key=idempotency_key,
+        function="api_monitoraggio_create",
     )
     r.raise_for_status()
     return r.json()
@@ -250,16 +984,16 @@ def api_monitoraggio_create(token: str, *, abbonamento_id: int,
 # ---------------------------
 
 def api_password_reset_start(email: str):
-    return _api_request("POST", "auth/password-reset/", json={"email": email})
+    return _api_request("POST", "auth/password-reset/", json={"email": email}, function="api_password_reset_start")
 
 
 def api_password_reset_confirm(uid: str, token: str, new_password: str):
     payload = {"uid": uid, "token": token, "new_password": new_password}
-    return _api_request("POST", "auth/password-reset-confirm/", json=payload)
+    return _api_request("POST", "auth/password-reset-confirm/", json=payload, function="api_password_reset_confirm")
 
 
 def api_resend_otp(email: str):
-    return _api_request("POST", "auth/resend-otp/", json={"email": email})
+    return _api_request("POST", "auth/resend-otp/", json={"email": email}, function="api_resend_otp")
 
 
 # ---------------------------
@@ -268,7 +1002,7 @@ def api_resend_otp(email: str):
 
 def get_top_listings(limit: int = 40, offset: int = 0, dedupe: str = "seller"):
     params = {"limit": limit, "offset": offset, "dedupe": dedupe}
-    return _api_get("listings/top/", params=params)
+    return _api_get("listings/top/", params=params, cache_ttl=_catalog_ttl(), function="get_top_listings")
 
 
 def get_sellers_list(limit: int = 40, offset: int = 0, ordering: str | None = "-rating_avg"):
@@ -284,7 +1018,7 @@ def get_sellers_list(limit: int = 40, offset: int = 0, ordering: str | None = "-
         params = {"limit": limit, "offset": offset}
         if ordering:
             params["ordering"] = ordering
-        r = requests.get(f"{base}/sellers/", params=params, timeout=_timeout())
+        r = _send("GET", f"{base}/sellers/", params=params, timeout=_timeout(), function="get_sellers_list")
         r.raise_for_status()
         data = r.json() or {}
         if isinstance(data, dict) and data.get("count"):
@@ -297,7 +1031,7 @@ def get_sellers_list(limit: int = 40, offset: int = 0, ordering: str | None = "-
     # 2) Fallback costruito da /listings/top/?dedupe=seller
     try:
         params = {"limit": limit, "offset": offset, "dedupe": "seller"}
-        r = requests.get(f"{base}/listings/top/", params=params, timeout=_timeout())
+        r = _send("GET", f"{base}/listings/top/", params=params, timeout=_timeout(), function="get_sellers_list")
         r.raise_for_status()
         raw = r.json() or {}
         rows = raw.get("results", raw if isinstance(raw, list) else []) or []
@@ -329,31 +1063,36 @@ def api_reviews_list(venditore: int, page: int | None = None):
     params = {"venditore": venditore}
     if page:
         params["page"] = page
-    return _api_get("reviews/", params=params)
+    return _api_get("reviews/", params=params, function="api_reviews_list")
 
 
 def api_reviews_stats(venditore: int):
-    return _api_get("reviews/stats/", params={"venditore": venditore})
+    return _api_get("reviews/stats/", params={"venditore": venditore}, function="api_reviews_stats")
 
 
 def api_review_create(token: str, *, venditore: int, order: int, rating: int, testo: str):
     payload = {"venditore": venditore, "order": order, "rating": rating, "testo": testo}
-    return _api_request("POST", "reviews/", json=payload, token=token)
+    return _api_request("POST", "reviews/", json=payload, token=token, idempotency_key=new_idempotency_key(),
+                        function="api_review_create")
 def api_follows_list(token: str, page: int = 1, page_size: int = 20):
-    return _api_request("GET", "follows/my/", params={"page": page, "page_size": page_size}, token=token)
+    return _api_request("GET", "follows/my/", params={"page": page, "page_size": page_size}, token=token,
+                        function="api_follows_list")
 
 def api_follow_set_active(token: str, follow_id: int, active: bool):
-    return _api_request("PATCH", f"event-follows/{follow_id}/", json={"active": active}, token=token)
+    return _api_request("PATCH", f"event-follows/{follow_id}/", json={"active": active}, token=token,
+                        function="api_follow_set_active")
 
 def api_follow_delete(token: str, follow_id: int):
-    return _api_request("DELETE", f"event-follows/{follow_id}/", token=token)
+    return _api_request("DELETE", f"event-follows/{follow_id}/", token=token, function="api_follow_delete")
 
 # === AUTH GET/POST helper comodi (opzionali ma utili) ===
-def _api_get_auth(path: str, *, params: dict | None = None, token: str | None = None, timeout: int | None = None):
-    return _api_request("GET", path, params=params, token=token, timeout=timeout)
+def _api_get_auth(path: str, *, params: dict | None = None, token: str | None = None, timeout: int | None = None,
+                  function: str = "unknown"):
+    return _api_request("GET", path, params=params, token=token, timeout=timeout, function=function)
 
-def _api_post_auth(path: str, *, json: dict | None = None, token: str | None = None, timeout: int | None = None):
-    return _api_request("POST", path, json=json, token=token, timeout=timeout)
+def _api_post_auth(path: str, *, json: dict | None = None, token: str | None = None, timeout: int | None = None,
+                   function: str = "unknown"):
+    return _api_request("POST", path, json=json, token=token, timeout=timeout, function=function)
 # === MONITORAGGI / PRO ===
 
 def api_monitoraggi_my(token: str, page: int = 1, page_size: int = 20):
@@ -361,7 +1100,7 @@ def api_monitoraggi_my(token: str, page: int = 1, page_size: int = 20):
     Lista monitoraggi dell'utente (free+pro a seconda del backend).
     """
     params = {"page": page, "page_size": page_size}
-    return _api_get_auth("monitoraggi/my/", params=params, token=token)
+    return _api_get_auth("monitoraggi/my/", params=params, token=token, function="api_monitoraggi_my")
 
 def api_monitoraggi_my_pro(token: str, page: int = 1, page_size: int = 20):
     """
@@ -369,7 +1108,7 @@ def api_monitoraggi_my_pro(token: str, page: int = 1, page_size: int = 20):
     Ritorna già gli oggetti collegati (evento/performance/abbonamento) se il serializer li espone.
     """
     params = {"page": page, "page_size": page_size}
-    return _api_get_auth("monitoraggi/my-pro/", params=params, token=token)
+    return _api_get_auth("monitoraggi/my-pro/", params=params, token=token, function="api_monitoraggi_my_pro")
 
 def api_abbonamenti_my(token: str, page: int = 1, page_size: int = 20):
     """
@@ -377,7 +1116,7 @@ def api_abbonamenti_my(token: str, page: int = 1, page_size: int = 20):
     Utile se vuoi mostrare anche abbonamenti PRO senza monitoraggio associato.
     """
     params = {"page": page, "page_size": page_size}
-    return _api_get_auth("abbonamenti/", params=params, token=token)
+    return _api_get_auth("abbonamenti/", params=params, token=token, function="api_abbonamenti_my")
 # ---------------------------
 # I MIEI BIGLIETTI (ACQUISTI) / ORDINI
 # ---------------------------
@@ -402,7 +1141,7 @@ def api_my_purchases(token: str,
     }
     if past:
         params["past"] = "1"
-    return _api_get_auth("my/purchases/", params=params, token=token)
+    return _api_get_auth("my/purchases/", params=params, token=token, function="api_my_purchases")
 
 
 def api_orders_my(token: str,
@@ -422,7 +1161,7 @@ def api_orders_my(token: str,
     }
     if status:
         params["status"] = status
-    return _api_get_auth("orders/my/", params=params, token=token)
+    return _api_get_auth("orders/my/", params=params, token=token, function="api_orders_my")
 
 
 def api_order_download_stream(token: str, order_id: int, timeout: int | None = None):
@@ -436,10 +1175,52 @@ def api_order_download_stream(token: str, order_id: int, timeout: int | None = N
     """
     base = settings.API_BASE_URL.rstrip("/")
     url = f"{base}/orders/{order_id}/download/"
-    r = requests.get(
+    r = _send(
+        "GET",
         url,
         headers=_auth_headers(token),
         stream=True,
         timeout=timeout or _timeout(),
+        function="api_order_download_stream",
     )
     return r
+
+
+# ---------------------------
+# UPLOAD (multipart): biglietti in rivendita / allegati supporto
+# ---------------------------
+
+def _api_multipart(path: str, *, data: dict, files, token: str, timeout: int | None = None,
+                   idempotency_key: str | None = None, function: str = "unknown"):
+    base = settings.API_BASE_URL.rstrip("/")
+    r = _send(
+        "POST",
+        f"{base}/{path.lstrip('/')}",
+        headers=_auth_headers(token),
+        data=data,
+        files=files,
+        timeout=timeout or _timeout(),
+        idempotency_key=idempotency_key,
+        function=function,
+    )
+    try:
+        r.raise_for_status()
+    except requests.HTTPError as e:
+        raise requests.HTTPError(f"{e} | body={r.text}", response=r) from e
+    return decode_json(r.content) if r.content else {}
+
+
+def api_ticket_upload(token: str, data: dict, files=None, timeout: int = 60, idempotency_key: str | None = None):
+    """tickets/upload/: PDF (files={"ticket_file": ...}) oppure ticket_url nel data."""
+    return _api_multipart("tickets/upload/", data=data, files=files, token=token, timeout=timeout,
+                          idempotency_key=idempotency_key, function="api_ticket_upload")
+
+
+def api_support_ticket_create(token: str, fields: dict, files=None, timeout: int = 60,
+                              idempotency_key: str | None = None):
+    """support/tickets/: multipart se ci sono allegati, altrimenti JSON."""
+    if files:
+        return _api_multipart("support/tickets/", data=fields, files=files, token=token, timeout=timeout,
+                              idempotency_key=idempotency_key, function="api_support_ticket_create")
+    return _api_request("POST", "support/tickets/", json=fields, token=token, timeout=timeout,
+                        idempotency_key=idempotency_key, function="api_support_ticket_create")
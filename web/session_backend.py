@@ -0,0 +1,186 @@
+# web/session_backend.py
+# -----------------------------------------------------------------------------
+# Session engine "cache + write-behind":
+# - letture/scritture servite dalla cache SESSION_CACHE_ALIAS (condivisa fra i
+#   worker del nodo: Redis, oppure FileSessionCache qui sotto, vedi settings);
+# - la persistenza su DB (tabella django_session) è differita: un thread per
+#   processo accumula le sessioni modificate e le scrive in un'unica
+#   transazione ogni SESSION_WRITE_BEHIND_DELAY secondi (una sola riga per
+#   sessione anche se modificata più volte nella finestra).
+# Così le richieste non attendono più il lock di scrittura di SQLite.
+# Su cache miss si ricade sul DB come il backend `cached_db` di Django.
+# FileSessionCache: FileBasedCache di Django con due correzioni per l'uso come
+# store di sessioni:
+# - add() atomico (file scritto a parte e pubblicato con os.link, che fallisce
+#   se la chiave esiste già): serve all'unicità delle nuove session_key;
+# - il cull (listing dell'intera directory) non gira a ogni set() ma al più
+#   una volta ogni OPTIONS["CULL_INTERVAL"] secondi per processo, togliendo
+#   prima le sessioni scadute.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import DatabaseError, close_old_connections, router, transaction
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "web.session_backend"
+
+
+class _WriteBehind:
+    """Coda (deduplicata per session_key) delle scritture da riportare sul DB."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending: dict[str, tuple[type, object | None]] = {}
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+    def _delay(self) -> float:
+        return float(getattr(settings, "SESSION_WRITE_BEHIND_DELAY", 2.0))
+
+    def _ensure_thread(self):
+        # dopo un fork (gunicorn --preload) il thread del padre non esiste più
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="session-write-behind", daemon=True)
+        self._thread.start()
+
+    def schedule(self, model, session_key: str, obj):
+        """obj = istanza Session da salvare, oppure None per cancellare."""
+        with self._lock:
+            self._pending[session_key] = (model, obj)
+            self._ensure_thread()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._delay())
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        try:
+            by_model: dict[type, dict] = {}
+            for key, (model, obj) in batch.items():
+                by_model.setdefault(model, {})[key] = obj
+            for model, items in by_model.items():
+                with transaction.atomic(using=router.db_for_write(model)):
+                    for key, obj in items.items():
+                        if obj is None:
+                            model.objects.filter(session_key=key).delete()
+                        else:
+                            model.objects.update_or_create(
+                                session_key=key,
+                                defaults={"session_data": obj.session_data, "expire_date": obj.expire_date},
+                            )
+        except DatabaseError:
+            # rimetto in coda (senza sovrascrivere scritture più recenti)
+            logger.exception("Session write-behind fallito, ritento al prossimo giro")
+            with self._lock:
+                for key, val in batch.items():
+                    self._pending.setdefault(key, val)
+        finally:
+            close_old_connections()
+
+
+_writer = _WriteBehind()
+atexit.register(_writer.flush)
+
+
+def flush_pending():
+    """Scrive subito sul DB le sessioni in coda (test / shutdown ordinato)."""
+    _writer.flush()
+
+
+class FileSessionCache(FileBasedCache):
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        self._cull_interval = float(params.get("OPTIONS", {}).get("CULL_INTERVAL", 300))
+        self._cull_lock = threading.Lock()
+        self._next_cull = 0.0
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, "wb") as f:
+                self._write_content(f, timeout, value)
+            for _ in range(3):
+                try:
+                    os.link(tmp_path, fname)
+                    return True
+                except FileExistsError:
+                    # has_key() cancella il file se è scaduto: allora si ritenta
+                    if self.has_key(key, version):
+                        return False
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def _cull(self):
+        now = time.monotonic()
+        with self._cull_lock:
+            if now < self._next_cull:
+                return
+            self._next_cull = now + self._cull_interval
+        for fname in self._list_cache_files():
+            try:
+                with open(fname, "rb") as f:
+                    self._is_expired(f)
+            except OSError:
+                pass
+        super()._cull()
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def create(self):
+        while True:
+            self._session_key = self._get_new_session_key()
+            try:
+                self.save(must_create=True)
+            except CreateError:
+                continue
+            self.modified = True
+            return
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        if must_create:
+            # unicità della chiave: add atomico (Redis, FileSessionCache); se un
+            # altro processo l'ha appena presa, create() ne genera un'altra
+            if not self._cache.add(self.cache_key, data, self.get_expiry_age()):
+                raise CreateError
+        else:
+            self._cache.set(self.cache_key, data, self.get_expiry_age())
+        _writer.schedule(self.model, self.session_key, self.create_model_instance(data))
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete(self.cache_key_prefix + session_key)
+        _writer.schedule(self.model, session_key, None)
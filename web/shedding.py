@@ -0,0 +1,272 @@
+# web/shedding.py
+# -----------------------------------------------------------------------------
+# Load shedding per processo: limiti di concorrenza per classe e per route.
+# - Ogni route (url_name) ha una classe di priorità (SHED_ROUTES):
+#     critical -> checkout / pagamento / conferma ordine: può usare tutti gli
+#                 SHED_MAX_CONCURRENCY slot del processo
+#     default  -> tutto il resto
+#     browse   -> crawl costosi (eventi, date, ricerca, ...): al massimo la
+#                 propria quota (SHED_CLASSES["browse"]["share"]) degli slot
+#   e opzionalmente un limite proprio (SHED_ROUTE_LIMITS).
+# - Quota browse adattiva: se checkout / pagine default restano in coda più
+#   di SHED_TARGET_WAIT la quota browse si riduce (fino a SHED_MIN_FACTOR),
+#   poi risale piano quando le richieste prioritarie entrano subito.
+# - Una richiesta che non trova posto aspetta al massimo max_wait della sua
+#   classe, se in coda ci sono meno di max_queue richieste della stessa
+#   classe (chi aspetta occupa comunque un thread del worker); altrimenti
+#   risposta degradata: ultima copia buona della pagina
+#   (solo GET anonime delle route browse, X-Load-Shed: stale) oppure 503 con
+#   Retry-After (pagina leggera con riprova automatica, JSON per le API).
+# - stats(): contatori per route (servite, in coda, scartate) + stato limiti,
+#   esposti su /healthz/load.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+
+logger = logging.getLogger(__name__)
+
+CRITICAL, DEFAULT, BROWSE = "critical", "default", "browse"
+
+DEFAULT_ROUTES = {
+    "acquista": CRITICAL,
+    "pagamento": CRITICAL,
+    "ordine_confermato": CRITICAL,
+    "ordine": CRITICAL,
+    "pro_pagamento": CRITICAL,
+    "home": BROWSE,
+    "top": BROWSE,
+    "rivendita": BROWSE,
+    "events_index": BROWSE,
+    "events_calendar_json": BROWSE,
+    "event_dates": BROWSE,
+    "event_dates_from_perf": BROWSE,
+    "search": BROWSE,
+    "search_suggest": BROWSE,
+}
+DEFAULT_CLASSES = {
+    CRITICAL: {"share": 1.0, "max_wait": 10.0, "max_queue": 64},
+    DEFAULT: {"share": 0.8, "max_wait": 2.0, "max_queue": 16},
+    BROWSE: {"share": 0.5, "max_wait": 0.5, "max_queue": 4},
+}
+# probe e feed live (che ha già i suoi limiti, web.live_listings) non passano dai limiti
+DEFAULT_EXEMPT = ("healthz_live", "healthz_ready", "healthz_load", "metrics", "event_listings_live")
+JSON_ROUTES = ("events_calendar_json", "search_suggest", "job_status")
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+class _Limiter:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.inflight = 0
+        self.by_class: Counter = Counter()
+        self.by_route: Counter = Counter()
+        self.waiting: Counter = Counter()
+        self.factor = 1.0  # quota browse adattiva (SHED_MIN_FACTOR .. 1)
+        self.counters: dict[str, Counter] = defaultdict(Counter)
+        self.wait_ms: dict[str, float] = defaultdict(float)
+
+    @staticmethod
+    def _config(cls: str) -> dict:
+        classes = _setting("SHED_CLASSES", DEFAULT_CLASSES)
+        return {**DEFAULT_CLASSES[cls], **classes.get(cls, {})}
+
+    def _class_cap(self, cls: str) -> int:
+        total = int(_setting("SHED_MAX_CONCURRENCY", 32))
+        share = float(self._config(cls)["share"])
+        if cls == BROWSE:
+            share *= self.factor
+        return max(1, math.floor(total * share))
+
+    def _fits(self, cls: str, route: str) -> bool:
+        if self.inflight >= int(_setting("SHED_MAX_CONCURRENCY", 32)):
+            return False
+        if self.by_class[cls] >= self._class_cap(cls):
+            return False
+        limit = _setting("SHED_ROUTE_LIMITS", {}).get(route)
+        return limit is None or self.by_route[route] < limit
+
+    def acquire(self, cls: str, route: str) -> float | None:
+        """Occupa uno slot; ritorna i secondi di attesa, None se scartata."""
+        config = self._config(cls)
+        max_wait = float(config["max_wait"])
+        t0 = time.monotonic()
+        with self.cond:
+            if not self._fits(cls, route):
+                if self.waiting[cls] >= int(config["max_queue"]):
+                    return self._shed(cls, route, 0.0)
+                self.counters[route]["queued"] += 1
+                self.waiting[cls] += 1
+                try:
+                    while not self._fits(cls, route):
+                        remaining = max_wait - (time.monotonic() - t0)
+                        if remaining <= 0:
+                            return self._shed(cls, route, time.monotonic() - t0)
+                        self.cond.wait(remaining)
+                finally:
+                    self.waiting[cls] -= 1
+            waited = time.monotonic() - t0
+            self.inflight += 1
+            self.by_class[cls] += 1
+            self.by_route[route] += 1
+            self.counters[route]["admitted"] += 1
+            self.wait_ms[route] += waited * 1000
+            self._adapt(cls, waited)
+        return waited
+
+    def _shed(self, cls: str, route: str, waited: float) -> None:
+        # chiamata con self.cond acquisito
+        self.counters[route]["shed"] += 1
+        self._adapt(cls, waited)
+        return None
+
+    def release(self, cls: str, route: str):
+        with self.cond:
+            self.inflight -= 1
+            self.by_class[cls] -= 1
+            self.by_route[route] -= 1
+            self.cond.notify_all()
+
+    def _adapt(self, cls: str, waited: float):
+        # chiamata con self.cond acquisito
+        if cls == BROWSE:
+            return
+        min_factor = float(_setting("SHED_MIN_FACTOR", 0.2))
+        if waited > float(_setting("SHED_TARGET_WAIT", 0.05)):
+            self.factor = max(min_factor, self.factor * 0.75)
+        elif self.factor < 1.0:
+            self.factor = min(1.0, self.factor + 0.02)
+
+    def stats(self) -> dict:
+        with self.cond:
+            return {
+                "inflight": self.inflight,
+                "by_class": dict(self.by_class),
+                "waiting": dict(self.waiting),
+                "browse_factor": round(self.factor, 3),
+                "class_caps": {cls: self._class_cap(cls) for cls in (CRITICAL, DEFAULT, BROWSE)},
+                "routes": {
+                    route: {**c, "wait_ms_total": round(self.wait_ms[route], 1)}
+                    for route, c in self.counters.items()
+                },
+            }
+
+
+_limiter = _Limiter()
+
+
+def stats() -> dict:
+    return _limiter.stats()
+
+
+# ---------------------------
+# Copie per le risposte degradate
+# ---------------------------
+
+_stored_lock = threading.Lock()
+_stored_at: dict[str, float] = {}
+
+
+def _stale_key(request) -> str:
+    return "shed:stale:" + hashlib.blake2b(request.get_full_path().encode("utf-8"), digest_size=12).hexdigest()
+
+
+def _is_anonymous(request) -> bool:
+    """Nessuna sessione né messaggi flash: la pagina è uguale per tutti."""
+    return not ({settings.SESSION_COOKIE_NAME, "messages"} & request.COOKIES.keys())
+
+
+def _remember(request, response):
+    """Salva (al massimo ogni SHED_STALE_REFRESH secondi) l'ultima copia buona della pagina."""
+    if response.streaming or response.cookies or response.status_code != 200:
+        return
+    key = _stale_key(request)
+    now = time.time()
+    with _stored_lock:
+        if now - _stored_at.get(key, 0) < float(_setting("SHED_STALE_REFRESH", 60)):
+            return
+        if len(_stored_at) > 5000:
+            _stored_at.clear()
+        _stored_at[key] = now
+    caches[_setting("SHED_CACHE_ALIAS", "default")].set(
+        key, (response.content, response.get("Content-Type")), int(_setting("SHED_STALE_TTL", 600))
+    )
+
+
+def _degraded(request, route: str, cls: str):
+    retry = int(_setting("SHED_RETRY_AFTER", 5))
+    if request.method in ("GET", "HEAD") and cls == BROWSE and _is_anonymous(request):
+        copy = caches[_setting("SHED_CACHE_ALIAS", "default")].get(_stale_key(request))
+        if copy is not None:
+            content, content_type = copy
+            response = HttpResponse(content, content_type=content_type)
+            response["X-Load-Shed"] = "stale"
+            response["Cache-Control"] = "no-store"
+            return response
+
+    if route in JSON_ROUTES or "application/json" in request.headers.get("Accept", ""):
+        response = JsonResponse({"results": [], "degraded": True, "retry_after": retry}, status=503)
+    else:
+        html = render_to_string("web/degraded.html", {"retry_after": retry, "path": request.get_full_path()})
+        response = HttpResponse(html, status=503)
+    response["Retry-After"] = str(retry)
+    response["X-Load-Shed"] = "empty"
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+# ---------------------------
+# Middleware
+# ---------------------------
+
+class LoadShedMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self._finish(request, self.get_response(request))
+        finally:
+            slot = getattr(request, "_shed_slot", None)
+            if slot is not None:
+                _limiter.release(*slot)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not _setting("SHED_ENABLED", True):
+            return None
+        match = request.resolver_match
+        route = match.url_name if match is not None else None
+        if not route or route in _setting("SHED_EXEMPT", DEFAULT_EXEMPT):
+            return None
+        cls = _setting("SHED_ROUTES", DEFAULT_ROUTES).get(route, DEFAULT)
+        waited = _limiter.acquire(cls, route)
+        if waited is None:
+            logger.info("Load shedding: %s (%s) scartata", route, cls)
+            return _degraded(request, route, cls)
+        request._shed_slot = (cls, route)
+        return None
+
+    def _finish(self, request, response):
+        cls, _ = getattr(request, "_shed_slot", None) or (None, None)
+        if (
+            cls == BROWSE
+            and request.method == "GET"
+            and "X-Load-Shed" not in response
+            and _is_anonymous(request)
+        ):
+            _remember(request, response)
+        return response
@@ -0,0 +1,171 @@
+# web/startup.py
+# -----------------------------------------------------------------------------
+# Fase di avvio del worker (chiamata da sitoweb/wsgi.py e asgi.py).
+# Passi, ciascuno cronometrato:
+#   views      -> import dei moduli view caldi (LAZY_VIEWS_PRELOAD, vedi
+#                 web.lazy_views) e costruzione del resolver URL
+#   templates  -> compilazione di tutti i template (cached loader)
+#   backend    -> apertura di STARTUP_BACKEND_CONNECTIONS connessioni keep-alive
+#   catalog    -> primo snapshot del catalogo (indici autocomplete/calendario):
+#                 dal file su disco se c'è, altrimenti dal backend
+#   warm_pages -> pre-render delle pagine calde (web.warmup), se abilitato
+# Di default gira in un thread: il worker accetta subito connessioni (liveness
+# ok) ma /healthz/ready risponde 503 finché il warm-up non è finito, così il
+# bilanciatore non gli manda traffico durante un rolling restart.
+# Un passo che fallisce viene registrato ma non blocca la readiness.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.steps: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self.pid: int | None = None
+
+    def report(self) -> dict:
+        total = None
+        if self.started_at is not None:
+            total = round(((self.finished_at or time.time()) - self.started_at) * 1000, 1)
+        return {
+            "ready": self.ready.is_set(),
+            "pid": self.pid,
+            "startup_ms": total,
+            "steps_ms": dict(self.steps),
+            "errors": dict(self.errors),
+        }
+
+
+state = _State()
+
+
+# ---------------------------
+# Passi
+# ---------------------------
+
+def _step_views():
+    from django.urls import reverse
+
+    from web import lazy_views
+
+    lazy_views.preload()  # i moduli dei flussi rari restano al primo uso
+    reverse("home")  # costruisce il resolver (e importa gli URLconf)
+
+
+def _step_templates():
+    from django.template.loader import get_template
+
+    for base in settings.TEMPLATES[0].get("DIRS") or []:
+        base = Path(base)
+        for path in sorted(base.rglob("*.html")):
+            get_template(path.relative_to(base).as_posix())
+
+
+def _step_backend():
+    from .services import tixy_api
+
+    n = int(getattr(settings, "STARTUP_BACKEND_CONNECTIONS", 4))
+    if n <= 0:
+        return
+    session = tixy_api.http_session()
+    url = settings.API_BASE_URL.rstrip("/") + "/"
+    timeout = float(getattr(settings, "STARTUP_BACKEND_TIMEOUT", 3))
+
+    def ping(_):
+        # qualunque risposta va bene: serve solo la connessione nel pool
+        session.head(url, timeout=timeout).close()
+
+    with ThreadPoolExecutor(max_workers=n, thread_name_prefix="startup-conn") as pool:
+        list(pool.map(ping, range(n)))
+
+
+def _step_catalog():
+    from .services import catalog
+
+    if catalog.get_snapshot() is None:
+        catalog.refresh()
+
+
+def _step_warm_pages():
+    from . import warmup
+
+    if not getattr(settings, "STARTUP_WARM_PAGES", True):
+        return
+    results = warmup.warm(warmup.select_paths("auto"))
+    failed = [r.path for r in results if r.status != 200]
+    if failed:
+        logger.info("Warm-up: %s pagine non riuscite (%s)", len(failed), ", ".join(failed[:5]))
+
+
+STEPS = (
+    ("views", _step_views),
+    ("templates", _step_templates),
+    ("backend", _step_backend),
+    ("catalog", _step_catalog),
+    ("warm_pages", _step_warm_pages),
+)
+
+
+def run() -> dict:
+    """Esegue tutti i passi (sincrono) e segna il processo come pronto."""
+    state.started_at = time.time()
+    state.pid = os.getpid()
+    skip = set(getattr(settings, "STARTUP_SKIP_STEPS", ()))
+    for name, fn in STEPS:
+        if name in skip:
+            continue
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            state.errors[name] = repr(e)
+            logger.warning("Startup: passo %s fallito", name, exc_info=True)
+        state.steps[name] = round((time.perf_counter() - t0) * 1000, 1)
+    state.finished_at = time.time()
+    state.ready.set()
+    report = state.report()
+    logger.info("Worker %s pronto in %s ms %s", state.pid, report["startup_ms"], report["steps_ms"])
+    return report
+
+
+def begin(application=None):
+    """
+    Avvia la fase di startup (una volta per processo) e ritorna `application`.
+    STARTUP_BLOCKING=True la esegue subito, prima di servire richieste.
+    """
+    if not getattr(settings, "STARTUP_ENABLED", True):
+        state.ready.set()
+        return application
+    with state.lock:
+        if state.pid == os.getpid():
+            return application
+        state.pid = os.getpid()
+        state.ready.clear()
+    if getattr(settings, "STARTUP_BLOCKING", False):
+        run()
+    else:
+        threading.Thread(target=run, name="worker-startup", daemon=True).start()
+    return application
+
+
+def is_ready() -> bool:
+    """Pronto? Dopo un fork (gunicorn --preload) lo startup riparte nel figlio."""
+    if state.pid != os.getpid():
+        begin()
+    return state.ready.is_set()
@@ -44,8 +44,19 @@ Version         : 1.1
     });
 
 
+    // plugin caricati solo dalle pagine che li dichiarano (chunk JS per pagina):
+    // se il chunk non è incluso, la chiamata diventa un no-op
+    $.each(['owlCarousel', 'countTo', 'appear', 'magnificPopup', 'isotope', 'niceSelect', 'countdown'], function (i, name) {
+        if (!$.fn[name]) {
+            $.fn[name] = function () { return this; };
+        }
+    });
+
+
     // wow init
-    new WOW().init();
+    if (typeof WOW !== 'undefined') {
+        new WOW().init();
+    }
 
 
     // hero slider
@@ -425,6 +436,100 @@ Version         : 1.1
     }
 
 
+    // search type-ahead (/search/suggest)
+    var suggestSeq = 0;
+    $('input[data-suggest]').each(function(i){
+        var $input = $(this);
+        var listId = 'search-suggest-' + i;
+        var $list = $('<datalist>').attr('id', listId).insertAfter($input);
+        var timer = null;
+        var urls = {};
+        $input.attr('list', listId);
+        $input.on('input', function(){
+            var q = $.trim($input.val());
+            if (urls[q]) {  // scelta da un suggerimento: vai diretto alla pagina
+                window.location.href = urls[q];
+                return;
+            }
+            clearTimeout(timer);
+            if (q.length < 2) { $list.empty(); return; }
+            timer = setTimeout(function(){
+                var seq = ++suggestSeq;
+                $.getJSON($input.data('suggest'), {q: q}, function(data){
+                    if (seq !== suggestSeq) return;  // risposta superata
+                    urls = {};
+                    $list.empty();
+                    $.each(data.results || [], function(_, r){
+                        urls[r.label] = r.url;
+                        $list.append($('<option>').attr('value', r.label));
+                    });
+                });
+            }, 150);
+        });
+    });
+
+
+    // checkout: cambio quantità senza round-trip (tabella prezzi #checkout-price-table)
+    var $priceTable = $('#checkout-price-table');
+    if ($priceTable.length) {
+        var priceRows = JSON.parse($priceTable.text());
+        $('select[data-price-qty]').on('change', function(){
+            var row = priceRows[parseInt($(this).val(), 10) - 1];
+            if (!row) return;
+            $.each(['qty', 'subtotal', 'commission', 'final_total'], function(_, k){
+                $('[data-price="' + k + '"]').text(row[k]);
+            });
+        });
+    }
+
+
+    // live biglietti (pagina evento): long-poll su /evento/<id>/live/, SSE se servito via ASGI
+    var $live = $('#live-listings');
+    if ($live.length) {
+        var liveUrl = $live.data('live-url');
+        var added = 0, sold = 0, changed = 0;
+        var showLive = function(ev){
+            if (ev.type === 'reset') { window.location.reload(); return false; }
+            var $card = $('[data-listing-id="' + ev.listing + '"]');
+            if (ev.type === 'new') added++;
+            if (ev.type === 'sold') {
+                sold++;
+                $card.css('opacity', .5).find('a.theme-btn').addClass('disabled').attr('aria-disabled', 'true');
+            }
+            if (ev.type === 'price' || ev.type === 'qty') {
+                changed++;
+                $card.addClass('border border-warning');
+            }
+            var parts = [];
+            if (added) parts.push(added + (added === 1 ? ' nuovo biglietto' : ' nuovi biglietti'));
+            if (sold) parts.push(sold + (sold === 1 ? ' venduto' : ' venduti'));
+            if (changed) parts.push(changed + (changed === 1 ? ' aggiornato' : ' aggiornati'));
+            $live.find('.live-msg').text('Disponibilità cambiata: ' + parts.join(', ') + '.');
+            $live.removeClass('d-none');
+            return true;
+        };
+        if ($live.data('live-sse') && window.EventSource) {
+            var source = new EventSource(liveUrl);
+            source.addEventListener('listing', function(e){
+                if (!showLive(JSON.parse(e.data))) source.close();
+            });
+        } else {
+            var liveCursor = '';
+            var livePoll = function(){
+                $.getJSON(liveUrl, {since: liveCursor}).done(function(data){
+                    var go = true;
+                    liveCursor = data.cursor || liveCursor;
+                    $.each(data.events || [], function(_, ev){ go = showLive(ev); return go; });
+                    if (go) setTimeout(livePoll, data.retry || 0);
+                }).fail(function(){
+                    setTimeout(livePoll, 10000);
+                });
+            };
+            livePoll();
+        }
+    }
+
+
 })(jQuery);
 
 
@@ -0,0 +1,40 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from web import assets
+
+register = template.Library()
+
+
+@register.simple_tag
+def js_bundles(*chunks):
+    """
+    {% js_bundles "carousel" "effects" %}
+    Emette core + chunk richiesti + app, tutti con `defer` (ordine preservato).
+    """
+    return format_html_join(
+        "\n", '<script src="{}" defer></script>',
+        ((static(p),) for p in assets.bundle_urls(chunks)),
+    )
+
+
+@register.simple_tag
+def critical_css():
+    """Inlinea il CSS critico (above-the-fold) nel <head>."""
+    css = assets.critical_css()
+    if not css:
+        return ""
+    return mark_safe(f"<style>{css}</style>")
+
+
+@register.simple_tag
+def async_css(path):
+    """CSS non critico: preload + swap a stylesheet al termine del download."""
+    href = static(path)
+    return format_html(
+        '<link rel="preload" href="{0}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+        '<noscript><link rel="stylesheet" href="{0}"></noscript>',
+        href,
+    )
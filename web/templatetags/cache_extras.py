@@ -0,0 +1,39 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from web import fragments
+
+register = template.Library()
+
+
+class CardCacheNode(template.Node):
+    def __init__(self, nodelist, kind, obj, vary):
+        self.nodelist = nodelist
+        self.kind = kind
+        self.obj = obj
+        self.vary = vary
+
+    def render(self, context):
+        kind = self.kind.resolve(context)
+        obj = self.obj.resolve(context)
+        vary = [v.resolve(context) for v in self.vary]
+        key = fragments.card_key(kind, obj, *vary)
+        return mark_safe(fragments.get_or_render(key, lambda: self.nodelist.render(context)))
+
+
+@register.tag
+def cardcache(parser, token):
+    """
+    {% cardcache "listing" l [vary ...] %} ... {% endcardcache %}
+    Cache del markup di una card per (tipo, id, versione). Da usare solo per
+    markup uguale per tutti i visitatori: le parti per-utente vanno fuori.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' richiede almeno tipo e oggetto.")
+    nodelist = parser.parse(("endcardcache",))
+    parser.delete_first_token()
+    kind = parser.compile_filter(bits[1])
+    obj = parser.compile_filter(bits[2])
+    vary = [parser.compile_filter(b) for b in bits[3:]]
+    return CardCacheNode(nodelist, kind, obj, vary)
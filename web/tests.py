@@ -1,3 +1,422 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from . import hitlog, invalidation, jobs, live_listings, metrics, ratelimit, shedding
+from .models import Job
+from .services import api_fixtures, catalog
+
+
+# File scritti dai worker (hit log, metriche, profili, allegati dei job) in una
+# cartella temporanea per tutta l'esecuzione: anche i flush atexit, che
+# arrivano dopo l'ultimo test, restano fuori da var/.
+_RUNTIME_DIR = tempfile.TemporaryDirectory(prefix="tixy-tests-")
+_RUNTIME = Path(_RUNTIME_DIR.name)
+
+
+def setUpModule():
+    override_settings(
+        HITLOG_PATH=_RUNTIME / "hitlog.jsonl",
+        METRICS_DIR=str(_RUNTIME / "metrics"),
+        PROFILER_PATH=_RUNTIME / "profiles.jsonl",
+        JOBS_FILES_DIR=_RUNTIME / "jobs",
+        # niente warm-up del worker in background (lo avvierebbe la prima lettura di startup.is_ready)
+        STARTUP_ENABLED=False,
+    ).enable()
+
+
+def tearDownModule():
+    hitlog._hits.flush()
+
+
+# (path, chiamate al backend, picco allocazioni KiB, tempo ms)
+# Le chiamate e la memoria sono vincolanti: una chiamata in più è una
+# regressione (o una fixture da ri-registrare con `manage.py
+# record_api_fixtures pages ...`). Il tempo dipende dalla macchina: si
+# controlla solo con TEST_PAGE_TIMING=1 (es. sempre sulla stessa macchina di CI).
+CHECK_TIMING = os.environ.get("TEST_PAGE_TIMING", "0") == "1"
+PAGE_BUDGETS = {
+    "home": ("/", 1, 768, 400),
+    "events_index": ("/eventi/", 1, 512, 250),
+    "event_listings": ("/evento/1/", 3, 384, 250),
+    "search": ("/search?q=concerto", 1, 1152, 400),
+    "event_dates": ("/evento/101/date/", 2, 640, 250),
+}
+
+
+@override_settings(
+    ALLOWED_HOSTS=["*"],
+    SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies",
+    CATALOG_BACKGROUND_REFRESH=False,
+    API_HEDGE_ENABLED=False,
+    API_RETRY_MAX=0,
+    JOBS_IN_PROCESS=False,
+    INVALIDATION_TRANSPORT="local",
+)
+class ReplayTestCase(SimpleTestCase):
+    """Backend servito dalla fixture `fixture` (web/api_fixtures/<fixture>.json)."""
+
+    fixture = "pages"
+
+    def setUp(self):
+        # store del catalogo su disco isolato per test
+        store = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CATALOG_STORE_DIR=store))
+        ctx = api_fixtures.replay(api_fixtures.fixture_path(self.fixture))
+        self.replayer = ctx.__enter__()
+        self.addCleanup(ctx.__exit__, None, None, None)
+        # snapshot catalogo già pronto (come in produzione dopo il primo refresh)
+        catalog.refresh()
+        api_fixtures.clear_api_caches()
+        self.addCleanup(api_fixtures.clear_api_caches)
+        self.replayer.reset()
+
+
+class PagePerformanceTests(ReplayTestCase):
+    """Pagine principali in replay (web/api_fixtures/pages.json): chiamate, memoria (e tempo)."""
+
+    def measure(self, path):
+        tracemalloc.start()
+        try:
+            t0 = time.perf_counter()
+            response = self.client.get(path)
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return response, elapsed_ms, peak / 1024
+
+    def check_page(self, name):
+        path, max_calls, max_kib, max_ms = PAGE_BUDGETS[name]
+        # primo giro: import e template compilati; poi si misura a cache API vuota
+        self.client.get(path)
+        api_fixtures.clear_api_caches()
+        self.replayer.reset()
+        response, elapsed_ms, peak_kib = self.measure(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.replayer.missing, [], "chiamate non presenti nella fixture")
+        self.assertEqual(self.replayer.total, max_calls, dict(self.replayer.calls))
+        self.assertLessEqual(peak_kib, max_kib, f"{name}: picco allocazioni {peak_kib:.0f} KiB")
+        if CHECK_TIMING:
+            self.assertLessEqual(elapsed_ms, max_ms, f"{name}: render {elapsed_ms:.1f} ms")
+
+    def test_home(self):
+        self.check_page("home")
+
+    def test_events_index(self):
+        self.check_page("events_index")
+
+    def test_event_listings(self):
+        self.check_page("event_listings")
+
+    def test_search(self):
+        self.check_page("search")
+
+    def test_event_dates(self):
+        self.check_page("event_dates")
+
+    def test_warm_cache_hits_no_backend(self):
+        """Seconda visita entro API_CACHE_TTL: nessuna chiamata al backend."""
+        self.client.get("/evento/1/")
+        self.replayer.reset()
+        self.client.get("/evento/1/")
+        self.assertEqual(self.replayer.total, 0, dict(self.replayer.calls))
+
+    def test_publish_makes_cached_copy_stale(self):
+        """Dopo publish("perf:<id>") la pagina non usa più la copia in cache, anche entro il TTL."""
+        self.client.get("/evento/1/")
+        invalidation.publish(invalidation.perf(999))
+        self.replayer.reset()
+        self.client.get("/evento/1/")
+        self.assertEqual(self.replayer.total, 0, "tag non correlato: copia ancora valida")
+
+        invalidation.publish(invalidation.perf(1))
+        self.replayer.reset()
+        self.assertEqual(self.client.get("/evento/1/").status_code, 200)
+        self.assertTrue(any("performances/1/" in key for key in self.replayer.calls), dict(self.replayer.calls))
+        # la copia riletta vale di nuovo fino al prossimo publish
+        self.replayer.reset()
+        self.client.get("/evento/1/")
+        self.assertEqual(self.replayer.total, 0, dict(self.replayer.calls))
+
+
+@override_settings(
+    SHED_ROUTE_LIMITS={"events_index": 1},
+    SHED_CLASSES={"browse": {"max_wait": 0.0, "max_queue": 0}},
+    SHED_STALE_REFRESH=0,
+)
+class LoadSheddingTests(ReplayTestCase):
+    """Route browse piena: ultima copia buona per gli anonimi, altrimenti 503 + Retry-After."""
+
+    def saturate(self, route):
+        self.assertIsNotNone(shedding._limiter.acquire(shedding.BROWSE, route))
+        self.addCleanup(shedding._limiter.release, shedding.BROWSE, route)
+
+    def test_stale_copy_when_shed(self):
+        fresh = self.client.get("/eventi/")
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotIn("X-Load-Shed", fresh)
+        self.saturate("events_index")
+        response = self.client.get("/eventi/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Load-Shed"], "stale")
+        self.assertEqual(response.content, fresh.content)
+
+    def test_503_without_copy(self):
+        self.saturate("events_index")
+        response = self.client.get("/eventi/?pagina=nuova")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["X-Load-Shed"], "empty")
+        self.assertEqual(response["Retry-After"], str(settings.SHED_RETRY_AFTER))
+
+    def test_session_gets_no_shared_copy(self):
+        self.client.get("/eventi/")
+        self.saturate("events_index")
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = "x"
+        response = self.client.get("/eventi/")
+        self.assertEqual((response.status_code, response["X-Load-Shed"]), (503, "empty"))
+
+    def test_other_routes_unaffected(self):
+        self.saturate("events_index")
+        response = self.client.get("/evento/1/")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Load-Shed", response)
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMIT_CACHE_ALIAS="default", RATE_LIMIT_LEASE=0.5,
+                   RATE_LIMITS={"test": {"ip": "10/m"}})
+class RateLimitTests(SimpleTestCase):
+    """GCRA sul bucket condiviso, scorte locali per worker, risposta 429."""
+
+    def setUp(self):
+        caches["default"].clear()
+        ratelimit._local.entries.clear()
+        self.factory = RequestFactory()
+
+    def request(self, ip="10.0.0.1", **extra):
+        return self.factory.get("/prova/", REMOTE_ADDR=ip, **extra)
+
+    def new_worker(self):
+        ratelimit._local.entries.clear()
+
+    def test_gcra(self):
+        budget = ratelimit.Budget.parse("5/m")
+        now = time.time()
+        waits = [ratelimit._take_shared("rl:test:gcra", budget, 1, now) for _ in range(6)]
+        self.assertEqual(waits[:5], [0.0] * 5)
+        self.assertAlmostEqual(waits[5], 12.0)
+        # un token nuovo ogni periodo / capacità
+        self.assertEqual(ratelimit._take_shared("rl:test:gcra", budget, 1, now + 12), 0.0)
+
+    def test_rotating_client_pays_one_token_per_request(self):
+        for _ in range(10):
+            self.new_worker()
+            self.assertEqual(ratelimit.check(self.request(), "test"), 0)
+        self.new_worker()
+        self.assertGreater(ratelimit.check(self.request(), "test"), 0)
+
+    def test_lease_grows_and_unused_tokens_go_back(self):
+        key = ratelimit._bucket_key("test", "ip", "10.0.0.1")
+        for _ in range(4):
+            self.assertEqual(ratelimit.check(self.request(), "test"), 0)
+        entry = ratelimit._local.entries[key]
+        # scorte 1, 2, 4: 3 token ancora in mano al worker
+        self.assertEqual((entry[0], entry[3]), (3, 4))
+        entry[1] = 0.0  # scorta scaduta
+        self.assertEqual(ratelimit.check(self.request(), "test"), 0)
+        # 3 restituiti, nuova scorta da 2: dal bucket 1 + 2 + 4 - 3 + 2 = 6 token, ne restano 4
+        self.assertEqual((entry[0], entry[3]), (1, 2))
+        self.new_worker()
+        for _ in range(4):
+            self.assertEqual(ratelimit.check(self.request(), "test"), 0)
+        self.new_worker()
+        self.assertGreater(ratelimit.check(self.request(), "test"), 0)
+
+    @override_settings(RATE_LIMITS={"test": {"ip": "2/m"}})
+    def test_429_with_retry_after(self):
+        view = ratelimit.rate_limit("test")(lambda request: HttpResponse("ok"))
+        self.assertEqual([view(self.request()).status_code for _ in range(2)], [200, 200])
+        response = view(self.request(HTTP_ACCEPT="application/json"))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(response["Content-Type"], "application/json")
+        # bloccato anche senza passare dalla cache; un altro IP no
+        caches["default"].clear()
+        self.assertEqual(view(self.request()).status_code, 429)
+        self.assertEqual(view(self.request(ip="10.0.0.2")).status_code, 200)
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        folder = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(METRICS_DIR=folder))
+        self.dir = Path(folder)
+
+    def total(self, agg, name):
+        return sum(v for (n, _), v in agg["counters"].items() if n == name)
+
+    def test_dead_snapshot_archived_once(self):
+        """Scrape concorrenti: lo snapshot di un processo terminato entra nell'archivio una volta sola."""
+        snap = {"pid": 999999, "t": time.time(), "exited": True,
+                "counters": [["tixy_test_total", [], 5.0]], "histograms": [], "gauges": []}
+        (self.dir / "999999.json").write_text(json.dumps(snap))
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(metrics.collect())) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([self.total(agg, "tixy_test_total") for agg in results], [5.0] * 8)
+        self.assertEqual(self.total(metrics.collect(), "tixy_test_total"), 5.0)
+        self.assertEqual(sorted(p.name for p in self.dir.iterdir() if "999999" in p.name), [])
+
+    @override_settings(ALLOWED_HOSTS=["*"], METRICS_TOKEN="")
+    def test_endpoint_restricted_without_token(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.9").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="127.0.0.1").status_code, 200)
+
+
+@override_settings(ALLOWED_HOSTS=["*"], LIVE_SSE_ENABLED=True, LIVE_POLL_INTERVAL=0.05, SHED_ENABLED=False)
+class LiveListingsTests(SimpleTestCase):
+    """Feed live via SSE (ASGI): posto client preso prima della risposta."""
+
+    def setUp(self):
+        poll = self.enterContext(mock.patch.object(live_listings.tixy_api, "poll_performance_listings"))
+        poll.return_value = ({"results": [{"id": 7, "price_each": "30.00", "qty": 2}]}, None)
+
+    async def get_sse(self):
+        return await AsyncClient().get("/evento/1/live/", headers={"accept": "text/event-stream"})
+
+    async def test_busy_returns_503_before_streaming(self):
+        with override_settings(LIVE_MAX_CLIENTS=0):
+            response = await self.get_sse()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "10")
+        self.assertEqual(live_listings._clients, 0)
+
+    async def test_stream_releases_slot(self):
+        with override_settings(LIVE_MAX_CLIENTS=1):
+            response = await self.get_sse()
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            self.assertEqual(live_listings._clients, 1)
+            first = await anext(aiter(response.streaming_content))
+            self.assertEqual(first, b"retry: 3000\n\n")
+            self.assertEqual((await self.get_sse()).status_code, 503)
+            response.close()
+            self.assertEqual(live_listings._clients, 0)
+
+
+class LazyViewsTests(SimpleTestCase):
+    def test_url_views_resolve(self):
+        """Ogni view in urls.py esiste nel suo modulo (web.lazy_views la carica al primo uso)."""
+        from . import lazy_views, urls
+
+        for pattern in urls.urlpatterns:
+            if isinstance(pattern.callback, lazy_views.LazyView):
+                with self.subTest(pattern.name):
+                    self.assertTrue(callable(pattern.callback.resolve()))
+
+
+class CalendarJsonTests(SimpleTestCase):
+    def setUp(self):
+        from .services import calendar_index
+
+        ts = time.time() + 86400
+        row = {"id": 1, "event_id": 1, "name": "x", "venue": "v", "city": "c",
+               "starts_ts": ts, "starts_iso": "", "prezzo_min": None}
+        patcher = mock.patch.object(calendar_index, "get_index",
+                                    return_value=calendar_index.CalendarIndex([row]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_range_is_clamped(self):
+        """Il "to" in risposta è quello letto davvero (from + MAX_RANGE_DAYS)."""
+        response = self.client.get("/eventi/calendario.json", {"from": "2026-01-01", "to": "2027-01-01"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["to"], "2026-04-03")
+
+    def test_half_range_rejected(self):
+        response = self.client.get("/eventi/calendario.json", {"from": "2026-01-01"})
+        self.assertEqual(response.status_code, 400)
+
+
+class JobsTests(TestCase):
+    """Coda job: dedupe sulla chiave, allegati, retry e token fuori dal payload."""
+
+    def setUp(self):
+        folder = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(JOBS_IN_PROCESS=False, JOBS_FILES_DIR=Path(folder),
+                                            JOBS_TOKEN_CACHE_ALIAS="default", JOBS_RETRY_BASE_SECONDS=0))
+        self.request = SimpleNamespace(session={})
+        self.calls = []
+        self.failures = 0
+
+        @jobs.handler("test_job")
+        def _run(job):
+            self.calls.append((jobs.job_token(job), [Path(f["path"]).read_bytes() for f in job.payload["files"]]))
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("backend giù")
+            return {"ok": True}
+
+        self.addCleanup(jobs._handlers.pop, "test_job", None)
+
+    def enqueue(self, content=b"%PDF-1"):
+        upload = SimpleUploadedFile("biglietto.pdf", content, content_type="application/pdf")
+        key = jobs.make_key("test_job", "tok", jobs.upload_digest(upload))
+        return jobs.enqueue(self.request, "test_job", {"files": []}, key=key, token="tok", uploads=[upload])
+
+    def test_dedupe_and_spool_only_new_jobs(self):
+        job = self.enqueue()
+        self.assertNotIn("tok", str(job.payload))
+        self.assertEqual(len(job.payload["files"]), 1)
+        self.assertEqual(self.enqueue().id, job.id)
+        self.assertNotEqual(self.enqueue(b"%PDF-2").id, job.id)
+
+        jobs.run_job(Job.objects.get(id=job.id))
+        folder = jobs.files_dir() / job.idempotency_key
+        self.assertFalse(folder.exists())
+        # doppio submit dopo la fine: stesso job, nessun file riscritto su disco
+        again = self.enqueue()
+        self.assertEqual((again.id, again.status), (job.id, Job.DONE))
+        self.assertFalse(folder.exists())
+        self.assertEqual(self.calls, [("tok", [b"%PDF-1"])])
+        self.assertEqual(self.request.session[jobs.SESSION_KEY], [str(job.id), str(self.enqueue(b"%PDF-2").id)])
+
+    def test_retry_then_done(self):
+        self.failures = 1
+        job = self.enqueue()
+        self.assertEqual(jobs.run_pending(limit=1), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertEqual(jobs.run_pending(limit=1), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), (Job.DONE, 2, {"ok": True}))
+        self.assertEqual(len(self.calls), 2)
+        with self.assertRaises(jobs.PermanentJobError):
+            jobs.job_token(job)
+
+    def test_failed_job_restarts_on_resubmit(self):
+        self.failures = 5
+        job = self.enqueue()
+        while jobs.run_pending():
+            pass
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, job.max_attempts))
+        self.assertFalse((jobs.files_dir() / job.idempotency_key).exists())
+        again = self.enqueue()
+        self.assertEqual((again.status, again.attempts), (Job.QUEUED, 0))
+        self.assertEqual(len(again.payload["files"]), 1)
@@ -1,8 +1,24 @@
 # web/urls.py
+# Le view si caricano al primo uso (web.lazy_views): i moduli dei flussi rari
+# non vengono importati dai worker che non li servono.
 from django.urls import path
-from . import views
+from . import health
+from .lazy_views import module
+
+views = module("web.views")
+account = module("web.views_account")
+pro = module("web.views_pro")
+resales = module("web.views_resales")
+support = module("web.views_support")
+reviews = module("web.views_reviews")
 
 urlpatterns = [
+    # Probe (liveness / readiness)
+    path("healthz/live", health.live, name="healthz_live"),
+    path("healthz/ready", health.ready, name="healthz_ready"),
+    path("healthz/load", health.load, name="healthz_load"),
+    path("metrics", health.prometheus, name="metrics"),
+
     # Statiche / contenuti
     path("", views.home, name="home"),
     path("top/", views.top, name="top"),
@@ -20,11 +36,13 @@ urlpatterns = [
     path("verifica-otp/", views.verifica_otp, name="verifica-otp"),
     path("password/forgot/", views.password_forgot_view, name="password_forgot"),
     path("password/reset/confirm/", views.password_reset_confirm_view, name="password_reset_confirm"),
-    path("account/", views.account_admin, name="account_admin"),
+    path("account/", account.account_admin, name="account_admin"),
 
     # Search & catalogo
     path("search", views.search, name="search"),  # (voluto) senza slash finale
+    path("search/suggest", views.search_suggest, name="search_suggest"),
     path("evento/<int:perf_id>/", views.event_listings, name="event-listings"),
+    path("evento/<int:perf_id>/live/", views.event_listings_live, name="event_listings_live"),
 
     # Checkout flow
     path("acquista/<int:listing_id>/", views.checkout_view, name="acquista"),
@@ -34,42 +52,44 @@ urlpatterns = [
 
     # Alert / PRO
     path("evento/<int:event_id>/alert/", views.attiva_alert, name="attiva_alert"),
-    path("abbonati/", views.attiva_pro, name="attiva_pro"),
-    path("abbonati/carrello/", views.pro_cart, name="pro_cart"),
-    path("abbonati/pagamento/", views.pro_pagamento, name="pro_pagamento"),
-    path("abbonati/confermato/", views.pro_done, name="pro_done"),
+    path("abbonati/", pro.attiva_pro, name="attiva_pro"),
+    path("abbonati/carrello/", pro.pro_cart, name="pro_cart"),
+    path("abbonati/pagamento/", pro.pro_pagamento, name="pro_pagamento"),
+    path("abbonati/confermato/", pro.pro_done, name="pro_done"),
 
     # Eventi (indice e date)
     path("eventi/", views.events_index, name="events_index"),
+    path("eventi/calendario.json", views.events_calendar_json, name="events_calendar_json"),
     path("evento/<int:event_id>/date/", views.event_dates, name="event_dates"),
 
     # Recensioni
-    path("recensioni/", views.reviews_page, name="reviews"),
-    path("recensioni/crea/", views.reviews_create, name="reviews_create"),
+    path("recensioni/", reviews.reviews_page, name="reviews"),
+    path("recensioni/crea/", reviews.reviews_create, name="reviews_create"),
 
     # Account: Alert
-    path("account/alerts/", views.account_alerts_view, name="account_alerts"),
-    path("account/alerts/<int:alert_id>/pause/", views.alert_pause_view, name="alert_pause"),
-    path("account/alerts/<int:alert_id>/resume/", views.alert_resume_view, name="alert_resume"),
-    path("account/alerts/<int:alert_id>/delete/", views.alert_delete_view, name="alert_delete"),
+    path("account/alerts/", account.account_alerts_view, name="account_alerts"),
+    path("account/alerts/<int:alert_id>/pause/", account.alert_pause_view, name="alert_pause"),
+    path("account/alerts/<int:alert_id>/resume/", account.alert_resume_view, name="alert_resume"),
+    path("account/alerts/<int:alert_id>/delete/", account.alert_delete_view, name="alert_delete"),
 
     # Account: Biglietti (acquisti)
-    path("account/tickets/", views.account_tickets_view, name="account_tickets"),
-    path("account/tickets/<int:order_id>/download/", views.ticket_download_proxy, name="ticket_download_proxy"),
+    path("account/tickets/", account.account_tickets_view, name="account_tickets"),
+    path("account/tickets/<int:order_id>/download/", account.ticket_download_proxy, name="ticket_download_proxy"),
 
     # Account: Rivendita
-    path("account/resales/", views.account_resales_view, name="account_resales"),
-    path("account/resales/upload/", views.resales_upload, name="resales_upload"),
-    path("account/resales/upload/<int:upload_id>/review/", views.resales_upload_review_view, name="resales_upload_review"),
+    path("account/resales/", resales.account_resales_view, name="account_resales"),
+    path("account/resales/upload/", resales.resales_upload, name="resales_upload"),
+    path("account/resales/upload/<int:upload_id>/review/", resales.resales_upload_review_view, name="resales_upload_review"),
 
 # Account: Supporto (ticket)
-    path("account/support/", views.account_support_list, name="account_support_list"),
-    path("account/support/nuovo/", views.account_support_new, name="account_support_new"),
-    path("account/support/<int:ticket_id>/", views.account_support_detail, name="account_support_detail"),
-    path("account/profilo/", views.account_profile_view, name="account_profile"),
+    path("account/support/", support.account_support_list, name="account_support_list"),
+    path("account/support/nuovo/", support.account_support_new, name="account_support_new"),
+    path("account/support/<int:ticket_id>/", support.account_support_detail, name="account_support_detail"),
+    path("account/jobs/<uuid:job_id>/", account.job_status, name="job_status"),
+    path("account/profilo/", account.account_profile_view, name="account_profile"),
 
     # Account: Abbonamenti (read-only)
-    path("account/abbonamenti/", views.account_subscriptions_view, name="account_subscriptions"),
+    path("account/abbonamenti/", account.account_subscriptions_view, name="account_subscriptions"),
 
     path("evento/perf/<int:perf_id>/date/", views.event_dates_from_perf, name="event_dates_from_perf"),
     path("evento/<int:event_id>/date/", views.event_dates, name="event_dates"),
@@ -0,0 +1,674 @@
+# web/views_account.py
+# -----------------------------------------------------------------------------
+# Area account: riepilogo, alert, abbonamenti, biglietti acquistati,
+# profilo e pagina di stato dei job in background.
+# Caricato al primo uso (web.lazy_views): vedi web/urls.py.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import quote
+
+import requests
+from django.conf import settings
+from django.contrib import messages
+from django.core.paginator import Paginator
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotFound, JsonResponse
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
+
+from . import follows, jobs
+from .models import Job
+from .services.tixy_api import api_get_profile, _api_request
+from .views import SESSION_TOKEN_KEY, _fmt_iso_dmy_hm, _require_api_login, _safe_dt
+
+
+def account_admin(request):
+    # login obbligatorio ma rispetta il "next"
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    token = request.session.get(SESSION_TOKEN_KEY)
+
+    # Profilo (opzionale)
+    profilo = {}
+    try:
+        profilo = api_get_profile(token) or {}
+    except Exception:
+        profilo = {}
+
+    # === SOLO LETTURA per /account/ ===
+    active_alerts = _get_active_alerts(token)          # elenco con scadenza
+    free_alerts_count = _get_free_alerts_count(token)  # count gratuiti
+    last_ticket = _get_last_order(token)               # ultimo ordine pagato
+
+    ctx = {
+        "profilo": profilo,
+        "active_alerts": active_alerts,
+        "free_alerts_count": free_alerts_count,
+        "last_ticket": last_ticket,
+    }
+    return render(request, "web/admin.html", ctx)
+
+
+def _get_active_alerts(token: str):
+    """
+    Ritorna lista di alert attivi (gratuiti + PRO) in sola lettura:
+    [{title, expires_at, expires_fmt, kind}]
+    """
+    alerts = []
+
+    # 1) Alert gratuiti
+    try:
+        data = _api_request("GET", "event-follows/my/", token=token,
+                            function="web.views_account._get_active_alerts") or {}
+        rows = data.get("results", data if isinstance(data, list) else []) or []
+        for r in rows:
+            ev = (r.get("evento_info") or r.get("event_info") or {})
+            title = (ev.get("nome") or ev.get("title") or r.get("title") or "Alert evento").strip()
+            exp   = r.get("expires_at") or r.get("scade_il") or r.get("valid_until") or ""
+            alerts.append({
+                "title": title,
+                "expires_at": exp,
+                "expires_fmt": _fmt_iso_dmy_hm(exp),
+                "kind": "free",
+            })
+    except Exception:
+        pass
+
+    # 2) Monitoraggi PRO
+    try:
+        data = _api_request("GET", "monitoraggi/my/", token=token,
+                            function="web.views_account._get_active_alerts") or {}
+        rows = data.get("results", data if isinstance(data, list) else []) or []
+        for r in rows:
+            ev = (r.get("evento_info") or r.get("event_info") or {})
+            title = (ev.get("nome") or ev.get("title") or r.get("title") or "Monitoraggio PRO").strip()
+            exp   = r.get("expires_at") or r.get("scade_il") or r.get("valid_until") or ""
+            alerts.append({
+                "title": f"{title} (PRO)",
+                "expires_at": exp,
+                "expires_fmt": _fmt_iso_dmy_hm(exp),
+                "kind": "pro",
+            })
+    except Exception:
+        pass
+
+    now = datetime.now(dt_timezone.utc)
+
+    def _not_expired(a):
+        dt = _safe_dt(a.get("expires_at"))
+        return True if dt is None else (dt.replace(tzinfo=dt.tzinfo or dt_timezone.utc) >= now)
+
+    alerts = [a for a in alerts if _not_expired(a)]
+    alerts.sort(key=lambda a: a.get("expires_at") or "9999-12-31T23:59:59Z")
+    return alerts
+
+
+def _get_free_alerts_count(token: str) -> int:
+    try:
+        data = _api_request("GET", "event-follows/my/", token=token,
+                            function="web.views_account._get_free_alerts_count") or {}
+        rows = data.get("results", data if isinstance(data, list) else []) or []
+        return int(data.get("count") or len(rows))
+    except Exception:
+        return 0
+
+
+def _get_last_order(token: str):
+    """
+    Ultimo ordine concluso: {order_id, created_at/created_fmt, price, listing_title, event_title, event_date/event_date_fmt}
+    """
+    try:
+        data = _api_request("GET", "orders/my/", params={"limit": 1, "ordering": "-created_at"}, token=token,
+                            function="web.views_account._get_last_order") or {}
+        rows = data.get("results", data if isinstance(data, list) else []) or []
+        if not rows:
+            return None
+        o = rows[0]
+        status = (o.get("status") or "").lower()
+        if status and status not in ("paid", "completed", "success"):
+            return None
+
+        listing = (o.get("listing_info") or {})
+        perf    = (listing.get("performance_info") or {})
+        return {
+            "order_id": o.get("id"),
+            "created_at": o.get("created_at"),
+            "created_fmt": _fmt_iso_dmy_hm(o.get("created_at") or ""),
+            "price": o.get("total") or o.get("total_price") or listing.get("price_each"),
+            "listing_title": listing.get("title") or "",
+            "event_title":  perf.get("evento_nome") or perf.get("title") or "",
+            "event_date":   perf.get("starts_at_utc") or perf.get("starts_at") or "",
+            "event_date_fmt": _fmt_iso_dmy_hm(perf.get("starts_at_utc") or perf.get("starts_at") or ""),
+        }
+    except Exception:
+        return None
+
+
+# =========================
+# Account: i miei alert (free)
+# =========================
+def _api_follow_list(token: str, page: int = 1, per_page: int = 20):
+    """
+    Legge gli alert gratuiti dell'utente.
+    Prova più endpoint noti e degrada a lista vuota se non esistono.
+    """
+    endpoints = [
+        "event-follows/my/",
+        "follows/my/",
+        "alerts/my/",
+    ]
+
+    data = None
+    last_err = None
+    for ep in endpoints:
+        try:
+            data = _api_request("GET", ep, params={"page": page, "page_size": per_page}, token=token,
+                                function="web.views_account._api_follow_list")
+            break  # trovato un endpoint valido
+        except requests.HTTPError as e:
+            last_err = e
+            # se è 404 prova il prossimo endpoint
+            if e.response is not None and e.response.status_code == 404:
+                continue
+            # altri errori (401/500/timeout...) -> esci in modo "soft"
+            return [], 0
+        except Exception:
+            # qualunque altro errore -> esci in modo "soft"
+            return [], 0
+
+    if not data:
+        # tutti 404 oppure nessuna risposta valida -> nessun alert
+        return [], 0
+
+    rows = data.get("results", data if isinstance(data, list) else []) or []
+    items = []
+    for r in rows:
+        ev = (r.get("evento_info") or r.get("event_info") or {})
+        items.append({
+            "id": r.get("id"),
+            "title": ev.get("nome") or ev.get("title") or "Alert evento",
+            "event_date": "",
+            "filters": r.get("filters_label") or "",
+            "active": bool(r.get("active", True)),
+            "last_check": r.get("last_check_fmt") or "",
+            "cover": ev.get("cover_url") or None,
+        })
+    count = int(data.get("count") or len(items))
+    return items, count
+
+
+def _api_follow_set_active(token: str, alert_id: int, active: bool) -> bool:
+    try:
+        _api_request("PATCH", f"event-follows/{alert_id}/", json={"active": active}, token=token,
+                     function="web.views_account._api_follow_set_active")
+        return True
+    except Exception:
+        return False
+
+
+def _api_follow_delete(token: str, alert_id: int) -> bool:
+    try:
+        _api_request("DELETE", f"event-follows/{alert_id}/", token=token,
+                     function="web.views_account._api_follow_delete")
+        return True
+    except Exception:
+        return False
+
+
+def account_alerts_view(request):
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    token = request.session.get(SESSION_TOKEN_KEY)
+    page = max(1, int(request.GET.get("page", 1)))
+    per_page = 12
+
+    items, total = _api_follow_list(token, page=page, per_page=per_page)
+    paginator = Paginator(items, per_page)
+    page_obj = paginator.get_page(1)  # items è già paginato lato API; presentiamo una pagina "unica"
+
+    return render(request, "web/account/alerts.html", {"page_obj": page_obj})
+
+
+@require_POST
+def alert_pause_view(request, alert_id: int):
+    guard = _require_api_login(request, next_url=reverse("account_alerts"))
+    if guard:
+        return guard
+    token = request.session.get(SESSION_TOKEN_KEY)
+    follows.invalidate(request)
+    if _api_follow_set_active(token, alert_id, False):
+        messages.success(request, "Alert messo in pausa.")
+    else:
+        messages.error(request, "Impossibile mettere in pausa l'alert.")
+    return redirect("account_alerts")
+
+
+@require_POST
+def alert_resume_view(request, alert_id: int):
+    guard = _require_api_login(request, next_url=reverse("account_alerts"))
+    if guard:
+        return guard
+    token = request.session.get(SESSION_TOKEN_KEY)
+    follows.invalidate(request)
+    if _api_follow_set_active(token, alert_id, True):
+        messages.success(request, "Alert ripreso.")
+    else:
+        messages.error(request, "Impossibile riprendere l'alert.")
+    return redirect("account_alerts")
+
+
+@require_POST
+def alert_delete_view(request, alert_id: int):
+    guard = _require_api_login(request, next_url=reverse("account_alerts"))
+    if guard:
+        return guard
+    token = request.session.get(SESSION_TOKEN_KEY)
+    follows.invalidate(request)
+    if _api_follow_delete(token, alert_id):
+        messages.success(request, "Alert eliminato.")
+    else:
+        messages.error(request, "Impossibile eliminare l'alert.")
+    return redirect("account_alerts")
+
+
+# =========================
+# Account: abbonamenti (sola lettura)
+# =========================
+def _map_sub_status(item: dict) -> str:
+    """
+    Stati: Attivo | Pending | Scaduto | Chiuso
+    """
+    it = item or {}
+    status_raw = (it.get("status") or it.get("stato") or "").lower().strip()
+
+    expires = _safe_dt(it.get("expires_at") or it.get("scade_il") or it.get("valid_until"))
+    done_at = _safe_dt(it.get("done_at") or it.get("success_at") or it.get("notified_at"))
+
+    # date evento (da evento o performance)
+    ev = it.get("evento_info") or it.get("event_info") or {}
+    perf = it.get("performance_info") or {}
+    event_dt = _safe_dt(ev.get("starts_at_utc") or ev.get("starts_at") or perf.get("starts_at_utc"))
+
+    now = datetime.utcnow().replace(tzinfo=dt_timezone.utc)
+
+    if event_dt and event_dt < now:
+        return "Chiuso"
+    if expires and expires < now:
+        return "Scaduto"
+    # se c'è un esito "ok", lo consideriamo ancora attivo fino a scadenza/evento
+    if done_at or status_raw in ("success", "trovato", "completed", "ok"):
+        return "Attivo"
+    return "Pending"
+
+
+def _api_subscriptions_list(token: str, page: int = 1, per_page: int = 20):
+    """
+    Legge gli abbonamenti/monitoraggi PRO dell'utente (endpoint my-pro).
+    Ritorna (items, total) con campi raw + formattati.
+    """
+    data = _api_request(
+        "GET",
+        "monitoraggi/my-pro/",
+        params={"page": page, "page_size": per_page},
+        token=token, function="web.views_account._api_subscriptions_list"
+    ) or {}
+
+    rows = data.get("results", data if isinstance(data, list) else []) or []
+    items = []
+
+    for r in rows:
+        ev = (r.get("evento_info") or r.get("event_info") or {})
+        perf = (r.get("performance_info") or {})
+        # attivazione = created_at del monitoraggio (o dell’abbonamento se disponibile)
+        created_iso = r.get("created_at") or r.get("creato_il") or r.get("abbonamento_created_at") or ""
+        expires_iso = r.get("expires_at") or r.get("scade_il") or r.get("valid_until") or ""
+        event_iso   = (ev.get("starts_at_utc") or ev.get("starts_at")
+                       or perf.get("starts_at_utc") or "")
+
+        item = {
+            "id": r.get("id"),
+            "title": (ev.get("nome") or ev.get("title") or r.get("title") or "Evento"),
+            "cover": ev.get("cover_url") or None,
+
+            # RAW
+            "created_at_iso": created_iso,
+            "expires_at_iso": expires_iso,
+            "event_date_iso": event_iso,
+
+            # FORMATTATI
+            "created_at": _fmt_iso_dmy_hm(created_iso),
+            "expires_at": _fmt_iso_dmy_hm(expires_iso),
+            "event_date":  _fmt_iso_dmy_hm(event_iso),
+
+            "status": _map_sub_status(r),
+            "period": r.get("period_label") or r.get("durata_label") or "",
+        }
+        items.append(item)
+
+    total = int(data.get("count") or len(items))
+    return items, total
+
+
+def account_subscriptions_view(request):
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    token = request.session.get(SESSION_TOKEN_KEY)
+    page = max(1, int(request.GET.get("page", 1)))
+    per_page = 12
+
+    items, total = _api_subscriptions_list(token, page=page, per_page=per_page)
+    paginator = Paginator(items, per_page)
+    page_obj = paginator.get_page(1)  # l'API è già paginata
+
+    return render(request, "web/account/subscriptions.html", {
+        "page_obj": page_obj,
+        "total": total,
+    })
+
+
+# =========================
+# Account: I miei biglietti (acquisti)
+# =========================
+def account_tickets_view(request):
+    """
+    Elenco dei biglietti acquistati:
+    - default: solo NON scaduti (eventi futuri)
+    - ?past=1 per vedere lo STORICO (eventi passati)
+    - ordinati DESC per data di creazione ordine
+    """
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    token = request.session.get(SESSION_TOKEN_KEY)
+
+    try:
+        page = max(1, int(request.GET.get("page", 1)))
+    except Exception:
+        page = 1
+    per_page = 12
+    show_past = request.GET.get("past") in ("1", "true", "yes")
+
+    # Chiamiamo l’endpoint API /my/purchases/ già predisposto lato backend
+    params = {
+        "page": page,
+        "page_size": per_page,
+        "ordering": "-created_at",
+        "past": "1" if show_past else None,
+    }
+    # rimuovi None
+    params = {k: v for k, v in params.items() if v is not None}
+
+    data = {"results": [], "count": 0}
+    try:
+        data = _api_request("GET", "my/purchases/", params=params, token=token,
+                            function="web.views_account.account_tickets_view") or {}
+    except Exception as e:
+        messages.error(request, f"Impossibile caricare i biglietti: {e}")
+        data = {"results": [], "count": 0}
+
+    rows = data.get("results", data if isinstance(data, list) else []) or []
+    total = int(data.get("count") or len(rows))
+
+    # Normalizzazione per il template
+    items = []
+    for r in rows:
+        # struttura robusta: prova più campi noti
+        listing = (r.get("listing_info") or r.get("listing") or {}) or {}
+        perf    = (listing.get("performance_info") or r.get("performance_info") or {}) or {}
+
+        order_id   = r.get("id") or r.get("order_id")
+        created_iso = r.get("created_at") or r.get("paid_at") or r.get("delivered_at") or ""
+        starts_iso  = perf.get("starts_at_utc") or perf.get("starts_at") or ""
+        event_title = (
+            perf.get("evento_nome") or perf.get("title") or
+            listing.get("title") or r.get("event_title") or "Evento"
+        )
+        venue = perf.get("luogo_nome") or perf.get("venue") or ""
+        qty = r.get("qty") or 1
+        total_price = r.get("total") or r.get("total_price") or listing.get("price_each")
+        currency = r.get("currency") or listing.get("currency") or "EUR"
+
+        # URL download: usa quello dell’API se presente, altrimenti passa dal proxy FE
+        api_download = (
+            r.get("download_url") or r.get("download") or r.get("ticket_url")
+        )
+        if api_download:
+            download_href = reverse("ticket_download_proxy", args=[order_id])
+        else:
+            # fallback: l’API espone l’action /orders/{id}/download/
+            download_href = reverse("ticket_download_proxy", args=[order_id])
+
+        items.append({
+            "order_id": order_id,
+            "created_iso": created_iso,
+            "created_fmt": _fmt_iso_dmy_hm(created_iso),
+            "event_title": event_title,
+            "venue": venue,
+            "starts_iso": starts_iso,
+            "starts_fmt": _fmt_iso_dmy_hm(starts_iso),
+            "qty": qty,
+            "total": total_price,
+            "currency": currency,
+            "download_href": download_href,
+        })
+
+    # Paginazione FE basata su total/per_page (l’API è già paginata, ma manteniamo coerenza UI)
+    paginator = Paginator(items, per_page)
+    page_obj = paginator.get_page(1)  # mostriamo la pagina restituita dall'API come singola pagina UI
+
+    ctx = {
+        "page_obj": page_obj,
+        "total": total,
+        "show_past": show_past,  # per evidenziare il tab attivo
+    }
+    return render(request, "web/account/tickets.html", ctx)
+
+
+# =========================
+# Proxy di download del biglietto (PDF)
+# =========================
+def ticket_download_proxy(request, order_id: int):
+    """
+    Scarica il PDF del biglietto passando il bearer token lato server.
+    Redirigere direttamente all’endpoint /orders/{id}/download/ del backend.
+    """
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    token = request.session.get(SESSION_TOKEN_KEY)
+    base = settings.API_BASE_URL.rstrip("/")
+
+    # endpoint action backend
+    url = f"{base}/orders/{order_id}/download/"
+
+    try:
+        # stream=True per passare il file così com'è
+        r = requests.get(url, headers={"Authorization": f"Bearer {token}"}, stream=True, timeout=20)
+        if r.status_code == 404:
+            return HttpResponseNotFound("Biglietto non trovato.")
+        r.raise_for_status()
+
+        # prova a ricavare il filename dal Content-Disposition dell’API
+        disp = r.headers.get("Content-Disposition") or ""
+        filename = None
+        if "filename=" in disp:
+            filename = disp.split("filename=", 1)[1].strip('"; ')
+
+        filename = filename or f"biglietto_{order_id}.pdf"
+        resp = HttpResponse(r.content, content_type=r.headers.get("Content-Type", "application/pdf"))
+        resp["Content-Disposition"] = f'attachment; filename="{quote(filename)}"'
+        return resp
+
+    except requests.HTTPError as e:
+        return HttpResponseBadRequest(f"Impossibile scaricare il biglietto: {e}")
+    except Exception:
+        return HttpResponseBadRequest("Errore durante il download del biglietto.")
+
+
+# =========================
+# Account: profilo
+# =========================
+@require_http_methods(["GET", "POST"])
+def account_profile_view(request):
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    token = request.session.get(SESSION_TOKEN_KEY)
+
+    # ---- POST
+    if request.method == "POST":
+        action = request.POST.get("action") or ""
+        try:
+            if action == "update_profile":
+                first_name = (request.POST.get("first_name") or "").strip()
+                last_name  = (request.POST.get("last_name") or "").strip()
+                phone      = (request.POST.get("phone") or "").strip()
+                marketing  = bool(request.POST.get("marketing_ok"))
+
+                # --- NUOVI CAMPI SOCIAL
+                facebook_url  = (request.POST.get("facebook_url") or "").strip()
+                instagram_url = (request.POST.get("instagram_url") or "").strip()
+                tiktok_url    = (request.POST.get("tiktok_url") or "").strip()
+                x_url         = (request.POST.get("x_url") or "").strip()
+                website_url   = (request.POST.get("website_url") or "").strip()
+
+                payload = {
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "phone": phone,
+                    "marketing_ok": marketing,
+
+                    # social (chiavi allineate alle API)
+                    "facebook_url": facebook_url,
+                    "instagram_url": instagram_url,
+                    "tiktok_url": tiktok_url,
+                    "x_url": x_url,
+                    "website_url": website_url,
+                }
+
+                _api_request("PATCH", "profile/", json=payload, token=token, timeout=15,
+                             function="web.views_account.account_profile_view")
+                messages.success(request, "Profilo aggiornato ✅")
+                return redirect("account_profile")
+
+            elif action == "change_password":
+                old_pwd = request.POST.get("old_password") or ""
+                new_pwd = request.POST.get("new_password") or ""
+                rep_pwd = request.POST.get("new_password2") or ""
+                if not old_pwd or not new_pwd or not rep_pwd:
+                    messages.error(request, "Compila tutti i campi password.")
+                    return redirect("account_profile")
+                if new_pwd != rep_pwd:
+                    messages.error(request, "Le nuove password non coincidono.")
+                    return redirect("account_profile")
+
+                _api_request(
+                    "POST", "profile/change_password/",
+                    json={"old_password": old_pwd, "new_password": new_pwd},
+                    token=token, timeout=15, function="web.views_account.account_profile_view"
+                )
+                messages.success(request, "Password cambiata ✅")
+                return redirect("account_profile")
+
+            elif action == "delete_account":
+                # Se NON hai l’endpoint, lascia commentato:
+                # _api_request("DELETE", "profile/", token=token, timeout=15)
+                messages.error(request, "Eliminazione account non abilitata su questo ambiente.")
+                return redirect("account_profile")
+
+            else:
+                messages.error(request, "Azione non valida.")
+
+        except requests.HTTPError as e:
+            try:
+                err = e.response.json()
+                messages.error(request, err.get("detail") or str(e))
+            except Exception:
+                messages.error(request, str(e))
+        except Exception as e:
+            messages.error(request, f"Errore imprevisto: {e}")
+        return redirect("account_profile")
+
+    # ---- GET (carica profilo)
+    profilo = {}
+    try:
+        profilo = _api_request("GET", "profile/", token=token, timeout=10,
+                               function="web.views_account.account_profile_view") or {}
+    except Exception as e:
+        messages.error(request, f"Impossibile caricare il profilo: {e}")
+
+    # Flag visuali per “venditore verificato” (HOME richiede: telefono + almeno 1 social)
+    phone_val = (profilo.get("phone") or "").strip()
+    has_phone = bool(phone_val)
+
+    socials = [
+        (profilo.get("facebook_url") or "").strip(),
+        (profilo.get("instagram_url") or "").strip(),
+        (profilo.get("tiktok_url") or "").strip(),
+        (profilo.get("x_url") or "").strip(),
+        (profilo.get("website_url") or "").strip(),
+    ]
+    has_any_social = any(bool(s) for s in socials)
+    is_verified_visual = has_phone and has_any_social
+
+    ctx = {
+        "profilo": profilo,
+        "user_email": profilo.get("email") or "",
+        "user_fullname": (profilo.get("first_name") or "") + (" " if profilo.get("last_name") else "") + (profilo.get("last_name") or ""),
+
+        # variabili per il template (badge verifica)
+        "has_phone": has_phone,
+        "has_any_social": has_any_social,
+        "is_verified_visual": is_verified_visual,
+
+        # se il backend espone questi boolean, li puoi mostrare come badge read-only
+        "phone_verified": bool(profilo.get("phone_verified")),
+        "socials_verified": bool(profilo.get("socials_verified")),
+    }
+    return render(request, "web/account/profile.html", ctx)
+
+
+# =========================
+# Job in background (attivazione PRO, upload, ticket)
+# =========================
+@require_GET
+def job_status(request, job_id):
+    """
+    Stato di un job in background (attivazione PRO, upload, ticket).
+    - ?format=json: {status, attempts, error, redirect} per il polling della pagina
+    - HTML: pagina d'attesa; a job concluso mostra l'esito e reindirizza
+    """
+    if not jobs.owns(request, job_id):
+        return HttpResponseNotFound("Job non trovato")
+    job = Job.objects.filter(id=job_id).first()
+    if job is None:
+        return HttpResponseNotFound("Job non trovato")
+
+    error = jobs.describe_error(job) if job.status == Job.FAILED else ""
+    if request.GET.get("format") == "json":
+        return JsonResponse({
+            "status": job.status,
+            "attempts": job.attempts,
+            "error": error,
+            "redirect": (job.result or {}).get("redirect") if job.status == Job.DONE else None,
+        })
+
+    if job.status == Job.DONE:
+        result = job.result or {}
+        if result.get("message"):
+            messages.success(request, result["message"])
+        return redirect(result.get("redirect") or "home")
+
+    return render(request, "web/account/job_status.html", {"job": job, "error": error})
@@ -0,0 +1,225 @@
+# web/views_pro.py
+# -----------------------------------------------------------------------------
+# Abbonamento PRO: scelta del piano, carrello, pagamento (simulato) e conferma.
+# L'attivazione vera e propria gira in background (web.jobs "pro_activation").
+# Caricato al primo uso (web.lazy_views): vedi web/urls.py.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.contrib import messages
+from django.shortcuts import redirect, render
+from django.urls import reverse
+
+from . import jobs
+from .views import SESSION_TOKEN_KEY, _require_api_login
+
+
+# Flag di flusso PRO
+SESSION_PRO_CHECKOUT = "pro_checkout"
+PRO_SESSION_KEY = "pro_flow"
+SIMULATED_PRO_PAYMENTS = True  # quando avremo Stripe/PayPal mettiamo False
+
+# Prezzi/Fee
+PREZZO_MESE = Decimal("6.99")
+
+# --- Piani PRO: unica fonte di verità, allineata alla tabella AlertPlan del backend ---
+# La chiave è il valore "periodo" inviato dal form. "plan_id" = AlertPlan.id sul backend.
+# Questo elimina alla radice il bug plan=NULL: alla creazione passiamo SEMPRE plan_id.
+# NB: se in futuro i piani cambiano lato backend, aggiornare questa mappa (o esporre
+# un endpoint /plans/ e leggerli dinamicamente).
+PRO_PLANS = {
+    "1m":     {"plan_id": 15, "label": "1 mese",          "mesi": 1,  "giorni": 30,  "prezzo": Decimal("6.99")},
+    "3m":     {"plan_id": 4,  "label": "3 mesi",          "mesi": 3,  "giorni": 90,  "prezzo": Decimal("20.97")},
+    "6m":     {"plan_id": 7,  "label": "6 mesi",          "mesi": 6,  "giorni": 180, "prezzo": Decimal("41.94")},
+    "12m":    {"plan_id": 13, "label": "12 mesi",         "mesi": 12, "giorni": 360, "prezzo": Decimal("83.88")},
+    "evento": {"plan_id": 14, "label": "Fino all'evento", "mesi": 0,  "giorni": 60,  "prezzo": Decimal("6.99")},
+}
+# Ordine di visualizzazione nella UI
+PRO_PLANS_ORDER = ["1m", "3m", "6m", "12m", "evento"]
+
+
+def _get_pro_plan(periodo: str):
+    """Ritorna il dict del piano PRO per il 'periodo' dato, o None se non valido."""
+    return PRO_PLANS.get((periodo or "").strip().lower())
+
+
+# =========================
+# PRO (monitoraggi)
+# =========================
+def attiva_pro(request):
+    """
+    GET: mostra selezione mesi (attiva_pro.html)
+    POST: valida la scelta e manda al carrello (pro_cart) salvando in sessione
+    """
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    try:
+        event_id = int(request.GET.get("event") or 0)
+    except (TypeError, ValueError):
+        event_id = 0
+
+    if request.method == "POST":
+        periodo = request.POST.get("periodo")  # '1m'|'3m'|'6m'|'12m'|'evento'
+        plan = _get_pro_plan(periodo)
+        if not plan:
+            messages.error(request, "Piano non valido. Scegli una delle durate disponibili.")
+            return redirect(request.get_full_path())
+
+        request.session[PRO_SESSION_KEY] = {
+            "event_id": event_id,
+            "periodo": periodo,
+            "plan_id": plan["plan_id"],
+            "giorni": plan["giorni"],
+            "prezzo": str(plan["prezzo"]),
+            "next": request.GET.get("next") or request.META.get("HTTP_REFERER") or reverse("home"),
+        }
+        request.session.modified = True
+        return redirect(reverse("pro_cart"))
+
+    # Solo i piani realmente esistenti lato backend (allineati ad AlertPlan)
+    plans = [dict(periodo=k, **PRO_PLANS[k]) for k in PRO_PLANS_ORDER]
+    ctx = {
+        "event_id": event_id,
+        "prezzo_mese": PREZZO_MESE,
+        "plans": plans,
+        "next": request.GET.get("next") or reverse("home"),
+    }
+    return render(request, "web/attiva_pro.html", ctx)
+
+
+def _calc_pro_plan(periodo: str, *, prezzo_mese: Decimal = PREZZO_MESE):
+    """
+    periodo: '1m'..'12m' oppure 'evento'
+    ritorna: mesi, giorni, prezzo_tot
+    """
+    periodo = (periodo or "1m").strip().lower()
+    if periodo.endswith("m"):
+        try:
+            mesi = int(periodo[:-1])
+            mesi = max(1, min(12, mesi))
+        except Exception:
+            mesi = 1
+        giorni = 30 * mesi
+        prezzo = (prezzo_mese * mesi).quantize(Decimal("0.01"))
+        return mesi, giorni, prezzo
+    # 'evento' -> flat 6.99, durata default 60 gg
+    return 0, 60, prezzo_mese.quantize(Decimal("0.01"))
+
+
+def pro_cart(request):
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    data = request.session.get(PRO_SESSION_KEY)
+    if not data:
+        messages.error(request, "Carrello PRO vuoto o scaduto.")
+        return redirect("attiva_pro")
+
+    event_id = data.get("event_id")
+    periodo = (data.get("periodo") or "1m").strip().lower()
+    plan = _get_pro_plan(periodo)
+    if not plan:
+        messages.error(request, "Carrello PRO non valido o scaduto.")
+        return redirect("attiva_pro")
+
+    plan_id = data.get("plan_id") or plan["plan_id"]
+    giorni = int(data.get("giorni") or plan["giorni"])
+    prezzo = data.get("prezzo") or str(plan["prezzo"])
+    next_url = data.get("next") or reverse("home")
+    mesi = plan["mesi"]
+
+    if request.method == "POST":
+        request.session[SESSION_PRO_CHECKOUT] = {
+            "event_id": event_id,
+            "periodo": periodo,
+            "plan_id": plan_id,
+            "mesi": mesi,
+            "giorni": giorni,
+            "prezzo": prezzo,
+            "next": next_url,
+        }
+        request.session.modified = True
+        return redirect("pro_pagamento")
+
+    ctx = {
+        "event_id": event_id,
+        "periodo": periodo,
+        "mesi": mesi,
+        "giorni": giorni,
+        "prezzo": prezzo,
+        "prezzo_mese": PREZZO_MESE,
+        "next": next_url,
+    }
+    return render(request, "web/pro_cart.html", ctx)
+
+
+def pro_pagamento(request):
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    data = request.session.get(SESSION_PRO_CHECKOUT)
+    if not data:
+        messages.error(request, "Carrello PRO vuoto o scaduto.")
+        return redirect("home")
+
+    event_id = data.get("event_id")
+    periodo = data.get("periodo")
+    mesi = data.get("mesi")
+    giorni = int(data.get("giorni") or 30)
+    prezzo = data.get("prezzo")
+    next_url = data.get("next") or reverse("home")
+
+    # plan_id dalla sessione; fallback robusto risolvendo dal periodo (mai None)
+    plan = _get_pro_plan(periodo)
+    plan_id = data.get("plan_id") or (plan["plan_id"] if plan else None)
+
+    if request.method == "POST":
+        token = request.session.get(SESSION_TOKEN_KEY)
+        try:
+            if not SIMULATED_PRO_PAYMENTS:
+                messages.error(request, "Pagamento reale non configurato.")
+                return redirect(request.path)
+
+            if not plan_id:
+                messages.error(request, "Piano non valido. Ricomincia la scelta dell'abbonamento.")
+                return redirect("attiva_pro")
+
+            # abbonamento + monitoraggio in background: la pagina di stato fa polling
+            sep = "&" if "?" in next_url else "?"
+            payload = {"plan_id": plan_id, "prezzo": str(prezzo), "giorni": giorni, "event_id": event_id}
+            job = jobs.enqueue(
+                request, "pro_activation",
+                {**payload, "redirect": f"{next_url}{sep}pro=ok#alerts"},
+                key=jobs.make_key("pro_activation", token, payload), token=token,
+            )
+            request.session.pop(SESSION_PRO_CHECKOUT, None)
+            return redirect("job_status", job_id=job.id)
+        except Exception as e:
+            messages.error(request, f"Errore attivazione PRO: {e}")
+
+    ctx = {
+        "event_id": event_id,
+        "periodo": periodo,
+        "mesi": mesi,
+        "giorni": giorni,
+        "prezzo": prezzo,
+        "prezzo_mese": PREZZO_MESE,
+        "next": next_url,
+        "simulated": SIMULATED_PRO_PAYMENTS,
+    }
+    return render(request, "web/pro_payment.html", ctx)
+
+
+def pro_done(request):
+    next_url = request.GET.get("next")
+    if next_url:
+        messages.success(request, "✅ Abbonamento PRO attivato!")
+        return redirect(next_url)
+    return render(request, "web/pro_done.html", {})
@@ -0,0 +1,237 @@
+# web/views_resales.py
+# -----------------------------------------------------------------------------
+# Area account - rivendita: elenco rivendite, upload biglietto (in background)
+# e creazione annuncio dalla review dell'upload.
+# Caricato al primo uso (web.lazy_views): vedi web/urls.py.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib import messages
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_http_methods
+
+from . import invalidation, jobs
+from .services.tixy_api import search_performances, _api_request
+from .views import SESSION_TOKEN_KEY, _fmt_iso_dmy_hm, _require_api_login
+
+
+@require_GET
+def account_resales_view(request):
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard: return guard
+
+    token = request.session.get(SESSION_TOKEN_KEY)
+    page = max(1, int(request.GET.get("page") or 1))
+    per_page = 12
+
+    # chiama l’endpoint backend già presente (TicketUploadViewSet/MyResalesView)
+    try:
+        data = _api_request("GET", "my/resales/", params={
+            "page": page, "page_size": per_page, "ordering": "-created_at"
+        }, token=token, function="web.views_resales.account_resales_view") or {}
+    except Exception as e:
+        messages.error(request, f"Impossibile caricare le rivendite: {e}")
+        data = {"results": [], "count": 0}
+
+    rows = data.get("results", []) or []
+    items = []
+    for r in rows:
+        perf = (r.get("performance_info") or {})
+        starts_iso = perf.get("starts_at_utc") or perf.get("starts_at") or ""
+        # stato venduto
+        sold_qty = int(r.get("sold_qty") or 0)
+        qty = int(r.get("qty") or 0)
+        is_sold = (sold_qty >= qty and qty > 0)
+
+        # download PDF (se presente)
+        download_url = r.get("download_url")
+
+        items.append({
+            "id": r.get("id"),
+            "created_fmt": _fmt_iso_dmy_hm(r.get("created_at") or ""),
+            "price_each": r.get("price_each"),
+            "currency": r.get("currency") or "EUR",
+            "qty": qty,
+            "sold_qty": sold_qty,
+            "is_sold": is_sold,
+            "notes": r.get("notes") or "",
+            "perf_name": (perf.get("evento_nome") or ""),
+            "venue": (perf.get("luogo_nome") or ""),
+            "starts_fmt": _fmt_iso_dmy_hm(starts_iso),
+            "download_url": download_url,  # può essere None
+        })
+
+    return render(request, "web/account/resales.html", {
+        "items": items,
+        "count": int(data.get("count") or len(items)),
+        "page": page,
+        "page_size": per_page,
+    })
+
+
+@require_http_methods(["GET", "POST"])
+def resales_upload(request):
+    """
+    Upload biglietto (solo eventi/performances presenti sul portale).
+    - GET: mostra form con select eventi futuri (performance future)
+    - POST: invia a API tickets/upload/ con:
+        performance, qty, price_each, face_value_price, min_price, is_top,
+        delivery_method (dedotto), ticket_file (pdf) O ticket_url
+    """
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+    token = request.session.get(SESSION_TOKEN_KEY)
+
+    # ---- CARICA EVENTI/PERFORMANCE FUTURE DAL PORTALE ----
+    perfs = []
+    try:
+        # prendiamo parecchie righe e teniamo solo future
+        data = search_performances(q=None, date=None, city=None, page=1, ordering="starts_at_utc")
+        rows = data.get("results", data if isinstance(data, list) else []) or []
+    except Exception:
+        rows = []
+
+    utc_now = datetime.now(dt_timezone.utc)
+    for p in rows:
+        perf = p.get("performance_info") if isinstance(p, dict) and "performance_info" in p else p
+        perf = perf or {}
+        iso = perf.get("starts_at_utc") or perf.get("starts_at") or ""
+        try:
+            dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=dt_timezone.utc)
+        except Exception:
+            dt = None
+        if not dt or dt < utc_now:
+            continue
+
+        perfs.append({
+            "id": perf.get("id") or p.get("id"),
+            "evento": (perf.get("evento_nome") or "").strip(),
+            "venue": (perf.get("luogo_nome") or "").strip(),
+            "when_iso": iso,
+            "when_fmt": _fmt_iso_dmy_hm(iso),
+        })
+
+    # ordina per data ASC
+    perfs.sort(key=lambda x: x["when_iso"] or "")
+
+    # ---- SUBMIT ----
+    if request.method == "POST":
+        performance_id   = (request.POST.get("performance") or "").strip()
+        qty              = (request.POST.get("qty") or "1").strip()
+        price_each       = (request.POST.get("price_each") or "").strip()          # prezzo richiesto (iniziale)
+        face_value_price = (request.POST.get("face_value_price") or "").strip()    # MAX (valore facciale)
+        min_price        = (request.POST.get("min_price") or "").strip()           # MIN vendita
+        is_top           = True if request.POST.get("is_top") else False
+        ticket_url       = (request.POST.get("ticket_url") or "").strip()
+        file_obj         = request.FILES.get("ticket_file")
+
+        if not performance_id:
+            messages.error(request, "Seleziona l’evento/data (performance).")
+            return redirect(request.path)
+        if not (file_obj or ticket_url):
+            messages.error(request, "Carica un PDF oppure inserisci l’URL del biglietto digitale.")
+            return redirect(request.path)
+
+        # deduci delivery method
+        delivery = "PDF" if file_obj else "E_TICKET"
+
+        # payload per l’API (EUR fisso lato backend)
+        data = {
+            "performance": performance_id,
+            "qty": qty,
+            "price_each": price_each,               # prezzo richiesto
+            "face_value_price": face_value_price,   # prezzo facciale (MAX consentito)
+            "min_price": min_price,                 # prezzo minimo consentito
+            "is_top": is_top,                       # top -> 10% commissioni; altrimenti 2%
+            "delivery_method": delivery,
+        }
+        if ticket_url:
+            data["ticket_url"] = ticket_url
+
+        # upload (fino a 60s) in background: il file resta su disco finché il job non termina
+        try:
+            key = jobs.make_key("resale_upload", token, data,
+                                jobs.upload_digest(file_obj) if file_obj else None)
+            job = jobs.enqueue(
+                request, "resale_upload",
+                {"data": data, "redirect": reverse("account_resales")},
+                key=key, token=token, uploads=[file_obj] if file_obj else [],
+            )
+            return redirect("job_status", job_id=job.id)
+        except Exception as e:
+            messages.error(request, f"Errore upload: {e}")
+
+    return render(request, "web/account/resales_upload.html", {
+        "perfs": perfs,
+    })
+
+
+@require_http_methods(["GET","POST"])
+def resales_upload_review_view(request, upload_id: int):
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard: return guard
+    token = request.session.get(SESSION_TOKEN_KEY)
+
+    if request.method == "POST":
+        price_each = request.POST.get("price_each")
+        currency = request.POST.get("currency") or "EUR"
+        delivery = request.POST.get("delivery_method") or "PDF"
+        notes = request.POST.get("notes") or ""
+        change_req = request.POST.get("change_name_required") in ("1","true","on")
+        performance_id = request.POST.get("performance")  # OBBLIGATORIO (vedi patch backend)
+        sub_ids = request.POST.getlist("subitem_ids")
+
+        if not sub_ids:
+            messages.error(request, "Seleziona almeno un biglietto.")
+        elif not performance_id:
+            messages.error(request, "Seleziona la performance.")
+        else:
+            try:
+                payload = {
+                    "upload_id": int(upload_id),
+                    "subitem_ids": list(map(int, sub_ids)),
+                    "price_each": str(price_each),
+                    "currency": currency,
+                    "delivery_method": delivery,
+                    "change_name_required": change_req,
+                    "notes": notes,
+                    "performance": int(performance_id),
+                }
+                res = _api_request("POST", "listings/create-from-upload/", json=payload, token=token,
+                                   function="web.views_resales.resales_upload_review_view")
+                if res and res.get("listing_id"):
+                    invalidation.publish(
+                        invalidation.listing(res["listing_id"]),
+                        invalidation.perf(payload["performance"]),
+                        "listings",
+                    )
+                    messages.success(request, "Annuncio creato ✅")
+                    return redirect("account_resales")
+                messages.error(request, "Impossibile creare l’annuncio.")
+            except Exception as e:
+                messages.error(request, f"Errore: {e}")
+
+    # GET -> recupera review
+    try:
+        review = _api_request("GET", f"tickets/upload/{upload_id}/review/", token=token,
+                              function="web.views_resales.resales_upload_review_view") or {}
+    except Exception as e:
+        messages.error(request, f"Impossibile leggere i dettagli upload: {e}")
+        return redirect("account_resales")
+
+    # subitems per tabella
+    subs = review.get("subitems") or []
+    big = review.get("biglietto_info") or {}
+
+    return render(request, "web/account/resales_upload_review.html", {
+        "upload_id": upload_id,
+        "biglietto": big,
+        "subitems": subs,
+    })
@@ -0,0 +1,152 @@
+# web/views_reviews.py
+# -----------------------------------------------------------------------------
+# Recensioni venditore: pagina elenco + form e creazione.
+# Caricato al primo uso (web.lazy_views): vedi web/urls.py.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+from urllib.parse import urlencode
+
+import requests
+from django.conf import settings
+from django.contrib import messages
+from django.shortcuts import redirect, render
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.http import require_http_methods, require_POST
+
+from .views import SESSION_TOKEN_KEY, _require_api_login
+
+
+@require_http_methods(["GET"])
+def reviews_page(request):
+    """
+    Elenco recensioni + form invio (se loggato).
+    Richiede querystring ?venditore=<id>.
+    """
+    try:
+        venditore = int(request.GET.get("venditore") or 0)
+    except (TypeError, ValueError):
+        venditore = 0
+
+    if not venditore:
+        messages.error(request, "Venditore non specificato.")
+        return redirect("home")
+
+    try:
+        page = max(1, int(request.GET.get("page") or 1))
+    except Exception:
+        page = 1
+
+    reviews, stats, count = [], {"avg": 0, "count": 0}, 0
+    try:
+        from .services.tixy_api import api_reviews_list, api_reviews_stats
+        data = api_reviews_list(venditore, page=page) or {}
+        reviews = data.get("results", data if isinstance(data, list) else []) or []
+        count = int(data.get("count") or len(reviews))
+        stats = api_reviews_stats(venditore) or {"avg": 0, "count": 0}
+    except Exception as e:
+        messages.error(request, f"Impossibile caricare le recensioni: {e}")
+
+    venditore_name = ""
+    if reviews:
+        vi = (reviews[0].get("venditore_info") or {})
+        venditore_name = f"{vi.get('first_name','').strip()} {vi.get('last_name','').strip()}".strip()
+
+    if not venditore_name:
+        try:
+            base = settings.API_BASE_URL.rstrip("/")
+            r = requests.get(f"{base}/public/users/{venditore}/", timeout=5)
+            if r.status_code == 200:
+                u = r.json() or {}
+                venditore_name = f"{(u.get('first_name') or '').strip()} {(u.get('last_name') or '').strip()}".strip()
+        except Exception:
+            pass
+
+    per_page = len(reviews) if reviews else 10
+    pages = max(1, (count + max(per_page, 1) - 1) // max(per_page, 1))
+    page = min(max(1, page), pages)
+
+    ctx = {
+        "venditore": venditore,
+        "venditore_name": venditore_name or f"Venditore #{venditore}",
+        "reviews": reviews,
+        "stats": stats,
+        "page": page,
+        "pages": pages,
+        "has_prev": page > 1,
+        "has_next": page < pages,
+        "prev_qs": urlencode({"venditore": venditore, "page": page - 1}) if page > 1 else "",
+        "next_qs": urlencode({"venditore": venditore, "page": page + 1}) if page < pages else "",
+        "order_prefill": request.GET.get("order") or "",
+        "logged_in": bool(request.session.get(SESSION_TOKEN_KEY)),
+    }
+    return render(request, "web/reviews.html", ctx)
+
+
+@require_POST
+@csrf_protect
+def reviews_create(request):
+    """
+    Crea una recensione e torna alla pagina con i messaggi bootstrap (messages framework).
+    URL: /recensioni/crea/  (name='reviews_create')
+    """
+    venditore_qs = request.POST.get("venditore") or ""
+    back = f'{reverse("reviews")}?{urlencode({"venditore": venditore_qs})}'
+
+    guard = _require_api_login(request, next_url=back)
+    if guard:
+        return guard
+
+    token    = request.session.get(SESSION_TOKEN_KEY)
+    venditore = request.POST.get("venditore")
+    order     = request.POST.get("order")
+    rating    = request.POST.get("rating")
+    testo     = (request.POST.get("testo") or "").strip()
+
+    if not (venditore and order and rating and testo):
+        messages.error(request, "Compila tutti i campi (ordine, voto, recensione).")
+        return redirect(back + "#review-form")
+
+    try:
+        venditore_i = int(venditore)
+        order_i     = int(order)
+        rating_i    = int(rating)
+        if rating_i < 1 or rating_i > 5:
+            raise ValueError("rating fuori range")
+    except Exception:
+        messages.error(request, "Dati non validi.")
+        return redirect(back + "#review-form")
+
+    try:
+        from .services.tixy_api import api_review_create
+        api_review_create(token, venditore=venditore_i, order=order_i, rating=rating_i, testo=testo)
+        messages.success(request, "Recensione inviata ✅")
+    except requests.HTTPError as e:
+        messages.error(request, _msg_from_api_error(e))
+    except Exception:
+        messages.error(request, "Impossibile inviare la recensione. Riprova tra poco.")
+
+    return redirect(back + "#reviews")
+
+
+def _msg_from_api_error(exc: Exception) -> str:
+    data = None
+    resp = getattr(exc, "response", None)
+    if resp is not None:
+        try:
+            data = resp.json()
+        except Exception:
+            data = None
+
+    if isinstance(data, dict):
+        if "order" in data:
+            return "Numero d'ordine non corrispondente."
+        if "rating" in data:
+            return "Seleziona un voto valido (1–5)."
+        if "testo" in data:
+            return "Inserisci il testo della recensione."
+        if "detail" in data:
+            return str(data["detail"])
+    return "Impossibile inviare la recensione. Controlla i dati e riprova."
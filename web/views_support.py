@@ -0,0 +1,269 @@
+# web/views_support.py
+# -----------------------------------------------------------------------------
+# Area account - supporto: elenco ticket, apertura (in background) e dettaglio
+# con risposte.
+# Caricato al primo uso (web.lazy_views): vedi web/urls.py.
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+from django.contrib import messages
+from django.core.paginator import Paginator
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_http_methods
+
+from . import jobs
+from .services.tixy_api import _api_request
+from .views import SESSION_TOKEN_KEY, _fmt_iso_dmy_hm, _require_api_login
+
+
+@require_http_methods(["GET"])
+def account_support_list(request):
+    """
+    Elenco dei ticket dell'utente loggato, ordinati per data desc.
+    """
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    token = request.session.get(SESSION_TOKEN_KEY)
+    page = max(1, int(request.GET.get("page", 1)))
+    per_page = 12
+
+    data = {"results": [], "count": 0}
+    try:
+        data = _api_request(
+            "GET",
+            "support/tickets/",
+            params={"page": page, "page_size": per_page, "ordering": "-created_at"},
+            token=token,
+            timeout=10,
+            function="web.views_support.account_support_list",
+        ) or {}
+    except Exception as e:
+        messages.error(request, f"Impossibile caricare i ticket: {e}")
+
+    rows = data.get("results", []) or []
+    count = int(data.get("count") or len(rows))
+
+    # normalizza campi minimi per la lista
+    items = []
+    for t in rows:
+        items.append({
+            "id": t.get("id"),
+            "title": (t.get("title") or "").strip() or f"Ticket #{t.get('id')}",
+            "status": (t.get("status") or "").strip().title(),
+            "priority": (t.get("priority") or "").strip().title(),
+            "category": (t.get("category") or "").strip().title(),
+            "created_fmt": _fmt_iso_dmy_hm(t.get("created_at") or ""),
+            "updated_fmt": _fmt_iso_dmy_hm(t.get("updated_at") or ""),
+        })
+
+    # L'API è già paginata: mostriamo la pagina ricevuta come singola pagina UI
+    paginator = Paginator(items, per_page)
+    page_obj = paginator.get_page(1)
+
+    return render(request, "web/account/support_list.html", {
+        "page_obj": page_obj,
+        "count": count,
+        "page": page,
+    })
+
+
+@require_http_methods(["GET", "POST"])
+def account_support_new(request):
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    token = request.session.get(SESSION_TOKEN_KEY)
+
+    # Solo per UI (non spediamo questi valori alle API)
+    categories = [
+        {"value": "generale",  "label": "Generale"},
+        {"value": "pagamenti", "label": "Pagamenti"},
+        {"value": "download",  "label": "Download biglietti"},
+        {"value": "rivendita", "label": "Rivendita"},
+        {"value": "altro",     "label": "Altro"},
+    ]
+    priorities = [
+        {"value": "bassa",   "label": "Bassa"},
+        {"value": "media",   "label": "Media"},
+        {"value": "alta",    "label": "Alta"},
+        {"value": "critica", "label": "Critica"},
+    ]
+
+    if request.method == "POST":
+        title      = (request.POST.get("title") or "").strip()
+        message_   = (request.POST.get("message") or "").strip()
+        # UI only (non inviamo all'API)
+        category_ui = (request.POST.get("category_ui") or "generale").strip()
+        priority_ui = (request.POST.get("priority_ui") or "media").strip()
+        order_id   = (request.POST.get("order_id") or "").strip()
+        privacy    = bool(request.POST.get("privacy_ok"))
+
+        # Validazioni lato FE
+        if not title or not message_:
+            messages.error(request, "Titolo e Messaggio sono obbligatori.")
+            return render(request, "web/account/support_new.html", {
+                "categories": categories, "priorities": priorities,
+                "form": {"title": title, "message": message_, "category": category_ui,
+                         "priority": priority_ui, "order_id": order_id, "privacy_ok": privacy}
+            })
+        if not privacy:
+            messages.error(request, "Devi accettare la privacy per aprire un ticket.")
+            return render(request, "web/account/support_new.html", {
+                "categories": categories, "priorities": priorities,
+                "form": {"title": title, "message": message_, "category": category_ui,
+                         "priority": priority_ui, "order_id": order_id, "privacy_ok": privacy}
+            })
+
+        # Payload verso API: **NON** includiamo category/priority
+        base_fields = {
+            "title": title,
+            "message": message_,
+        }
+        if order_id:
+            # inviamo entrambe, nel dubbio
+            base_fields["order"] = order_id
+            base_fields["order_id"] = order_id
+
+        uploaded_files = request.FILES.getlist("attachments") or []
+        try:
+            key = jobs.make_key("support_ticket", token, base_fields,
+                                [jobs.upload_digest(f) for f in uploaded_files])
+            job = jobs.enqueue(
+                request, "support_ticket",
+                {"fields": base_fields},
+                key=key, token=token, uploads=uploaded_files,
+            )
+            return redirect("job_status", job_id=job.id)
+        except Exception as e:
+            messages.error(request, f"Errore imprevisto: {e}")
+
+        return render(request, "web/account/support_new.html", {
+            "categories": categories, "priorities": priorities,
+            "form": {"title": title, "message": message_, "category": category_ui,
+                     "priority": priority_ui, "order_id": order_id, "privacy_ok": privacy}
+        })
+
+    # GET
+    return render(request, "web/account/support_new.html", {
+        "categories": categories, "priorities": priorities,
+        "form": {"title": "", "message": "", "category": "generale",
+                 "priority": "media", "order_id": (request.GET.get("order") or ""), "privacy_ok": False}
+    })
+
+
+@require_http_methods(["GET", "POST"])
+def account_support_detail(request, ticket_id: int):
+    """
+    Dettaglio ticket:
+    - GET: mostra ticket + thread messaggi
+    - POST: aggiungi risposta con eventuali allegati
+    """
+    guard = _require_api_login(request, next_url=request.get_full_path())
+    if guard:
+        return guard
+
+    token = request.session.get(SESSION_TOKEN_KEY)
+
+    # ============== POST: invio risposta ==================
+    if request.method == "POST":
+        body = (request.POST.get("body") or "").strip()
+        if not body:
+            messages.error(request, "Scrivi un messaggio.")
+            return redirect(request.path)
+
+        files = request.FILES.getlist("files") or request.FILES.getlist("files[]")
+        try:
+            if files:
+                # multipart
+                files_payload = [("files", (f.name, f.read(), f.content_type or "application/octet-stream")) for f in files]
+                _api_request(
+                    "POST",
+                    f"support/tickets/{ticket_id}/messages/",
+                    data={"body": body},   # campi testuali
+                    files=files_payload,   # SOLO se la tua _api_request supporta 'files'
+                    token=token,
+                    timeout=60,
+                    function="web.views_support.account_support_detail",
+                )
+            else:
+                # JSON puro
+                _api_request(
+                    "POST",
+                    f"support/tickets/{ticket_id}/messages/",
+                    json={"body": body},
+                    token=token,
+                    timeout=60,
+                    function="web.views_support.account_support_detail",
+                )
+            messages.success(request, "Messaggio inviato ✅")
+            return redirect(request.path)
+        except TypeError as e:
+            # Se la tua _api_request NON supporta 'files', evita di passarlo
+            messages.error(request, f"Errore invio (upload non supportato dall'helper): {e}")
+            return redirect(request.path)
+        except Exception as e:
+            messages.error(request, f"Errore invio messaggio: {e}")
+            return redirect(request.path)
+
+    # ============== GET: dettaglio + messaggi ==============
+    try:
+        ticket = _api_request("GET", f"support/tickets/{ticket_id}/", token=token, timeout=10,
+                              function="web.views_support.account_support_detail") or {}
+        msgs_resp = _api_request("GET", f"support/tickets/{ticket_id}/messages/", token=token, timeout=10,
+                                 function="web.views_support.account_support_detail") or []
+        messages_rows = msgs_resp if isinstance(msgs_resp, list) else (msgs_resp.get("results") or [])
+    except Exception as e:
+        messages.error(request, f"Impossibile caricare il ticket: {e}")
+        return redirect("account_support_list")
+
+    # normalizza messaggi per il template
+    for m in messages_rows:
+        m["created_fmt"] = _fmt_iso_dmy_hm(m.get("created_at") or "")
+
+    # prova a ottenere una descrizione iniziale
+    initial_msg = None
+    if messages_rows:
+        m0 = messages_rows[0] or {}
+        initial_msg = m0.get("message") or m0.get("body") or m0.get("text")
+    else:
+        initial_msg = ticket.get("description") or ticket.get("message") or ticket.get("body")
+
+    # label "umane"
+    status_raw   = (ticket.get("status") or "").upper()
+    priority_raw = (ticket.get("priority") or "").upper()
+    category_raw = (ticket.get("category") or "").upper()
+
+    STATUS_LABEL = {"OPEN": "Aperto", "PENDING": "In attesa", "CLOSED": "Chiuso"}
+    PRIO_LABEL   = {"LOW": "Bassa", "NORMAL": "Media", "HIGH": "Alta", "CRITICAL": "Critica"}
+    CAT_LABEL    = {
+        "GENERAL": "Generale", "PAYMENTS": "Pagamenti", "DOWNLOAD": "Download biglietti",
+        "RESALE": "Rivendita", "OTHER": "Other"
+    }
+
+    ctx = {
+        "t": ticket,
+        "msgs": messages_rows,
+
+        "status_label": STATUS_LABEL.get(status_raw, status_raw.title() or "Open"),
+        "priority_label": PRIO_LABEL.get(priority_raw, priority_raw.title() or "Media"),
+        "category_label": CAT_LABEL.get(category_raw, category_raw.title() or "Other"),
+
+        "created_fmt": _fmt_iso_dmy_hm(ticket.get("created_at") or ""),
+        "updated_fmt": _fmt_iso_dmy_hm(ticket.get("updated_at") or ""),
+
+        "order_id":    ticket.get("order")       or ticket.get("order_id"),
+        "listing_id":  ticket.get("listing")     or ticket.get("listing_id"),
+        "biglietto_id": ticket.get("biglietto")  or ticket.get("ticket_upload"),
+
+        "description": initial_msg,
+    }
+
+    # alias per template (compat)
+    ctx["ticket"] = ctx["t"]
+    ctx["posts"]  = ctx["msgs"]
+
+    return render(request, "web/account/support_detail.html", ctx)
@@ -0,0 +1,159 @@
+# web/warmup.py
+# -----------------------------------------------------------------------------
+# Cache warmer: pre-renderizza le pagine calde per riempire cache API,
+# fragment cache delle card e snapshot catalogo prima che arrivi traffico.
+# - Pagine: quelle più richieste dal hit log (web.hitlog) oppure, se il log
+#   è vuoto, le pagine fisse (home, eventi, top, rivendita) + le performance
+#   più vicine dallo snapshot catalogo.
+# - In-process (default): le pagine passano dal WSGIHandler del processo
+#   corrente, come una richiesta vera (Host = WARMUP_HOST o il primo di
+#   ALLOWED_HOSTS), quindi scaldano le cache di *questo* processo (o quelle
+#   condivise, se CACHES punta a Redis/file). Con base_url si fanno invece GET
+#   HTTP verso un'istanza già avviata.
+# - Le richieste in-process hanno nell'environ WSGI la chiave WARMUP_ENVIRON_KEY
+#   (non impostabile da un client via header): hit log, metriche e rate limit
+#   le ignorano (is_warmup), così il warm-up non alimenta da solo le pagine calde.
+# - Concorrenza limitata (WARMUP_CONCURRENCY thread).
+# -----------------------------------------------------------------------------
+
+from __future__ import annotations
+
+import io
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import requests
+from django.conf import settings
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+FIXED_PAGES = ("home", "events_index", "top", "rivendita")
+WARMUP_ENVIRON_KEY = "tixy.warmup"
+
+
+def is_warmup(request) -> bool:
+    """Richiesta generata dal cache warmer in-process."""
+    return bool(request.META.get(WARMUP_ENVIRON_KEY))
+
+
+@dataclass(frozen=True)
+class WarmResult:
+    path: str
+    status: int
+    ms: float
+    error: str = ""
+
+
+def catalog_paths(limit: int) -> list[str]:
+    """Pagine fisse + pagine evento delle `limit` performance più vicine."""
+    from .services import calendar_index, catalog
+
+    paths = [reverse(name) for name in FIXED_PAGES]
+    if catalog.get_snapshot() is None:
+        catalog.refresh()
+    cal = calendar_index.get_index()
+    for row in (cal.upcoming(limit) if cal else []):
+        paths.append(reverse("event-listings", args=[row["id"]]))
+    return paths
+
+
+def hit_paths(limit: int) -> list[str]:
+    from . import hitlog
+
+    return [path for path, _ in hitlog.top_paths(limit)]
+
+
+def select_paths(source: str = "auto", limit: int | None = None) -> list[str]:
+    """source: "hits", "catalog" oppure "auto" (hit log se presente, altrimenti catalogo)."""
+    limit = limit or int(getattr(settings, "WARMUP_MAX_PAGES", 30))
+    paths = hit_paths(limit) if source in ("hits", "auto") else []
+    if not paths and source in ("catalog", "auto"):
+        paths = catalog_paths(limit)
+    # le pagine fisse comunque in testa (una volta sola)
+    fixed = [reverse(name) for name in FIXED_PAGES]
+    return list(dict.fromkeys(fixed + paths))[:max(limit, len(fixed))]
+
+
+def _host() -> str:
+    host = getattr(settings, "WARMUP_HOST", "")
+    if host:
+        return host
+    for allowed in settings.ALLOWED_HOSTS:
+        if allowed != "*":
+            return allowed.lstrip(".")
+    return "localhost"
+
+
+def _environ(path: str, host: str) -> dict:
+    path, _, query = path.partition("?")
+    secure = getattr(settings, "SECURE_SSL_REDIRECT", False)
+    return {
+        "REQUEST_METHOD": "GET",
+        "SCRIPT_NAME": "",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+        "SERVER_NAME": host,
+        "SERVER_PORT": "443" if secure else "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": host,
+        "REMOTE_ADDR": "127.0.0.1",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": "https" if secure else "http",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        WARMUP_ENVIRON_KEY: True,
+    }
+
+
+def _warm_local(paths: list[str], concurrency: int) -> list[WarmResult]:
+    from django.core.handlers.wsgi import WSGIHandler
+
+    handler = WSGIHandler()
+    host = _host()
+
+    def get(path: str) -> WarmResult:
+        status = []
+        t0 = time.perf_counter()
+        try:
+            response = handler(_environ(path, host), lambda s, headers, exc_info=None: status.append(int(s[:3])))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()  # request_finished, come con un server vero
+        except Exception as e:
+            return WarmResult(path, 0, (time.perf_counter() - t0) * 1000, repr(e))
+        return WarmResult(path, status[0] if status else 0, (time.perf_counter() - t0) * 1000)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="warmup") as pool:
+        return list(pool.map(get, paths))
+
+
+def _warm_http(paths: list[str], concurrency: int, base_url: str) -> list[WarmResult]:
+    base = base_url.rstrip("/")
+    timeout = float(getattr(settings, "WARMUP_TIMEOUT", 30))
+
+    def get(path: str) -> WarmResult:
+        t0 = time.perf_counter()
+        try:
+            status = requests.get(base + path, timeout=timeout).status_code
+        except requests.RequestException as e:
+            return WarmResult(path, 0, (time.perf_counter() - t0) * 1000, repr(e))
+        return WarmResult(path, status, (time.perf_counter() - t0) * 1000)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="warmup") as pool:
+        return list(pool.map(get, paths))
+
+
+def warm(paths: list[str], *, concurrency: int | None = None, base_url: str | None = None) -> list[WarmResult]:
+    concurrency = max(1, concurrency or int(getattr(settings, "WARMUP_CONCURRENCY", 4)))
+    if base_url:
+        return _warm_http(paths, concurrency, base_url)
+    return _warm_local(paths, concurrency)